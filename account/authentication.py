@@ -0,0 +1,44 @@
+import copy
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from account.services.auth_service import ISSUED_AT_MS_CLAIM, TokenService
+from account.services.user_service import UserService
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication resolving the token subject through `UserService.fetch_auth_user`'s
+    short lived cache instead of a query per request. Entries are dropped by
+    `UserService.clear_temp_cache`, which runs on every change to a user.
+    Tokens issued before the user's last logout are rejected from the cache alone.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if TokenService(None).is_token_revoked(
+                user_id, validated_token.get("iat"), validated_token.get(ISSUED_AT_MS_CLAIM)
+        ):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        user, _error = UserService(None).fetch_auth_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        # cached instances are shared between requests of this process, views may modify theirs
+        return copy.copy(user)
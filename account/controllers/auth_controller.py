@@ -1,5 +1,3 @@
-from django.utils.decorators import method_decorator
-from django_ratelimit.decorators import ratelimit
 from drf_spectacular.utils import extend_schema
 from rest_framework.generics import CreateAPIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -7,6 +5,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from account.serializers.auth_serializer import LoginSerializer, RegisterSerializer, ForgotPasswordRequestSerializer
 from account.services.auth_service import AuthService
 from crm.serializers.others_serializer import EmptySerializer
+from services.rate_limit import rate_limit
 from services.util import CustomApiRequestProcessorBase
 
 class LoginView(TokenObtainPairView, CustomApiRequestProcessorBase):
@@ -15,7 +14,7 @@ class LoginView(TokenObtainPairView, CustomApiRequestProcessorBase):
     serializer_class = LoginSerializer
 
     @extend_schema(tags=["Auth"])
-    @method_decorator(ratelimit(key='ip', rate='5/m'))
+    @rate_limit('5/m', key='ip', fail_closed=True)
     def post(self, request, *args, **kwargs):
         service = AuthService(request)
         return self.process_request(request, service.login)
@@ -27,7 +26,7 @@ class RegisterView(CreateAPIView, CustomApiRequestProcessorBase):
     serializer_class = RegisterSerializer
 
     @extend_schema(tags=["Auth"])
-    @method_decorator(ratelimit(key='ip', rate='5/m'))
+    @rate_limit('5/m', key='ip', fail_closed=True)
     def post(self, request, *args, **kwargs):
         service = AuthService(request)
         return self.process_request(request, service.register)
@@ -45,7 +44,7 @@ class AppTokenRefreshView(CreateAPIView, TokenRefreshView):
     serializer_class = EmptySerializer
 
     @extend_schema(tags=["Auth"])
-    @method_decorator(ratelimit(key='ip', rate='5/m'))
+    @rate_limit('5/m', key='ip', fail_closed=True)
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
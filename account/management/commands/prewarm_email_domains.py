@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Value
+from django.db.models.functions import Lower, StrIndex, Substr
+
+from account.models import User
+from services.email_deliverability import COMMON_EMAIL_DOMAINS, UNDELIVERABLE, get_deliverability_checker
+
+
+class Command(BaseCommand):
+    help = "Resolve and cache the deliverability of the most common email domains before signups need them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=200, help="Number of top domains among registered users")
+
+    def handle(self, *args, **options):
+        top_domains = (
+            User.objects.annotate(domain=Lower(Substr("email", StrIndex("email", Value("@")) + 1)))
+            .values("domain")
+            .annotate(count=Count("id"))
+            .order_by("-count")
+            .values_list("domain", flat=True)[:options["limit"]]
+        )
+
+        results = get_deliverability_checker().prewarm([*COMMON_EMAIL_DOMAINS, *top_domains])
+
+        undeliverable = sorted(domain for domain, status in results.items() if status == UNDELIVERABLE)
+        unknown = sorted(domain for domain, status in results.items() if status is None)
+        if undeliverable:
+            self.stdout.write(f"Undeliverable: {', '.join(undeliverable)}")
+        if unknown:
+            self.stdout.write(self.style.WARNING(f"Not resolved: {', '.join(unknown)}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Resolved {len(results) - len(unknown)} of {len(results)} uncached domains"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from account.models import User
+from account.services.user_service import registered_email_filter
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Bloom filter of registered emails used to skip lookups of unknown emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        emails = User.objects.annotate(email_lower=Lower("email")).values_list("email_lower", flat=True)
+
+        count = registered_email_filter.rebuild(emails.iterator(chunk_size=options["chunk_size"]), options["chunk_size"])
+
+        # users registered while the filter was being built went to the replaced bitmap
+        registered_email_filter.add(*emails.filter(created_at__gte=started_at))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} emails in {registered_email_filter.size} bits with {registered_email_filter.hash_count} hashes"
+        ))
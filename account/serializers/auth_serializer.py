@@ -6,10 +6,11 @@ from email_validator import validate_email
 from password_validator import PasswordValidator
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from account.models import User
+from account.services.auth_service import AppRefreshToken
 from account.services.user_service import UserService
+from services.email_deliverability import UNDELIVERABLE, get_deliverability_checker
 from services.log import AppLogger
 from services.util import render_template_to_text
 
@@ -18,7 +19,7 @@ from services.util import render_template_to_text
 class LoginSerializer(TokenObtainSerializer):
     email = serializers.EmailField(required=True)
     password = serializers.CharField(required=True)
-    token_class = RefreshToken
+    token_class = AppRefreshToken
 
     def validate(self, attrs):
         email = attrs.get("email").lower()
@@ -77,11 +78,15 @@ class RegisterSerializer(serializers.Serializer):
             raise serializers.ValidationError("Password is too weak", "password")
 
         try:
-            email_info = validate_email(email, check_deliverability=True)
+            email_info = validate_email(email, check_deliverability=False)
             email = email_info.normalized
         except Exception as e:
             raise serializers.ValidationError("Invalid email provided", "email")
 
+        # domains that cannot be checked in time are let through, as email_validator does on DNS timeouts
+        if get_deliverability_checker().check(email_info.ascii_domain) == UNDELIVERABLE:
+            raise serializers.ValidationError("Invalid email provided", "email")
+
         request = self.context.get("request", None)
         user_service = UserService(request)
         user, _ = user_service.find_user_by_email(email)
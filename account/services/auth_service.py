@@ -1,14 +1,33 @@
 
+import time
+
 from django.contrib.auth.models import update_last_login
 
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from account.services.user_service import UserService
+from services.encryption_util import md5_str
 from services.log import AppLogger
 from services.util import CustomAPIRequestUtil
 
 
+ISSUED_AT_MS_CLAIM = "iat_ms"
+
+
+class AppRefreshToken(RefreshToken):
+    """
+    Refresh token also carrying its issue time in milliseconds, copied to the access tokens made
+    from it. `iat` has whole seconds only, too coarse to tell a login apart from a logout just before it.
+    """
+
+    def set_iat(self, claim="iat", at_time=None):
+        super().set_iat(claim, at_time)
+        if claim == "iat":
+            self[ISSUED_AT_MS_CLAIM] = int((at_time or self.current_time).timestamp() * 1000)
+
+
 class AuthService(CustomAPIRequestUtil):
 
     def __init__(self, request):
@@ -59,8 +78,9 @@ class AuthService(CustomAPIRequestUtil):
 
             user = self.auth_user
 
-            for token in OutstandingToken.objects.filter(user=user):
-                _, _ = BlacklistedToken.objects.get_or_create(token=token)
+            token_service = TokenService(self.request)
+            token_service.revoke_user_tokens(user)
+            token_service.blacklist_outstanding_tokens(user)
 
             return {"message": "Logout successful"}, None
 
@@ -74,9 +94,45 @@ class AuthService(CustomAPIRequestUtil):
 class TokenService(CustomAPIRequestUtil):
 
     def create_access_token(self, user, expiry=None):
-        token = RefreshToken.for_user(user)
+        token = AppRefreshToken.for_user(user)
 
         if expiry is not None:
             token.set_exp(f"{expiry}")
 
         return str(token.access_token)
+
+    def revoke_user_tokens(self, user):
+        """
+        Invalidates every token issued to the user so far with a single Redis write,
+        kept until the longest lived of those tokens would have expired anyway.
+        """
+        lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+        cache_key = self.revoked_before_key(user.email)
+        # evicts the previous timestamp from every worker's local cache before writing the new one
+        self.clear_cache(cache_key)
+        self.set_cache_value(cache_key, time.time(), timeout=int(lifetime.total_seconds()))
+
+    def is_token_revoked(self, subject, issued_at, issued_at_ms=None):
+        """
+        Compares the issue time of tokens carrying one at millisecond precision. Tokens with `iat` only
+        are revoked when issued in the same second as the revocation too.
+        """
+        revoked_before, _ = self.get_cache_value_or_default(self.revoked_before_key(subject))
+        if revoked_before is None:
+            return False
+
+        if issued_at_ms is not None:
+            return issued_at_ms < int(revoked_before * 1000)
+        return issued_at is None or issued_at <= int(revoked_before)
+
+    def blacklist_outstanding_tokens(self, user):
+        """Blacklists every outstanding refresh token of the user in one set-based insert"""
+        token_ids = OutstandingToken.objects.filter(
+            user=user, blacklistedtoken__isnull=True
+        ).order_by().values_list("id", flat=True)
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token_id=token_id) for token_id in token_ids], batch_size=1000, ignore_conflicts=True
+        )
+
+    def revoked_before_key(self, subject):
+        return self.generate_cache_key("tokens_revoked_before", md5_str(subject))
@@ -1,12 +1,24 @@
 
+from django.conf import settings
 from django.db.models import Q, QuerySet
 from django.utils import timezone
 
 from account.models import User
 from account.serializers.user_serializer import UserSerializer
 from crm.models import ActivityType
+from services.bloom_filter import RedisBloomFilter
+from services.encryption_util import md5_str
 from services.util import CustomAPIRequestUtil, compare_password
 
+USER_EMAIL_MISS_TIMEOUT = 60
+AUTH_USER_CACHE_TIMEOUT = 60
+
+registered_email_filter = RedisBloomFilter(
+    "registered_emails",
+    capacity=getattr(settings, "USER_EMAIL_FILTER_CAPACITY", 1000000),
+    error_rate=getattr(settings, "USER_EMAIL_FILTER_ERROR_RATE", 0.001),
+)
+
 
 class UserService(CustomAPIRequestUtil):
     serializer_class = UserSerializer
@@ -97,13 +109,36 @@ class UserService(CustomAPIRequestUtil):
 
     def find_user_by_email(self, email):
         def __fetch():
-            user = self.__get_base_query().filter(email__iexact=email).first()
+            return self.__get_base_query().filter(email__iexact=email).first(), None
+
+        # the filter and the short lived miss cache answer unregistered emails without the database
+        user = None
+        if registered_email_filter.might_contain(email.lower()):
+            cache_key = self.generate_cache_key("user_email", email.lower(), tags=[self.model_tag(User)])
+            user, _ = self.get_cache_value_or_default(cache_key, __fetch, miss_timeout=USER_EMAIL_MISS_TIMEOUT)
+
+        if not user:
+            return None, self.make_404(f"User with email '{email}' not found")
+        return user, None
+
+    def fetch_auth_user(self, email):
+        """
+        The user a token subject resolves to, inactive ones included so authentication can reject them.
+        Cached briefly under a digest of the exact email, slugified emails are not unique.
+        """
+        def __fetch():
+            user = self.__get_base_query().filter(email=email).first()
             if not user:
-                return None, self.make_404(f"User with email '{email}' not found")
+                return None, self.make_404("User not found")
             return user, None
 
-        cache_key = self.generate_cache_key("user_email", email.lower())
-        return self.get_cache_value_or_default(cache_key, __fetch)
+        cache_key = self.__auth_user_cache_key(email)
+        return self.get_cache_value_or_default(cache_key, __fetch, timeout=AUTH_USER_CACHE_TIMEOUT)
+
+    def remember_email(self, email):
+        """Registers a new email in the filter and drops any cached miss for it"""
+        registered_email_filter.add(email.lower())
+        self.clear_cache(self.generate_cache_key("user_email", email.lower(), tags=[self.model_tag(User)]))
 
     def change_password(self, payload):
         user = self.auth_user
@@ -128,9 +163,27 @@ class UserService(CustomAPIRequestUtil):
 
             return user, None
 
-        cache_key = self.generate_cache_key("user_id", user_id)
+        cache_key = self.generate_cache_key("user_id", user_id, tags=self.__user_tags(user_id))
         return self.get_cache_value_or_default(cache_key, __fetch)
 
+    def fetch_many_by_ids(self, user_ids):
+        """Users of the given ids in request order, unknown ids are skipped"""
+        try:
+            user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+        except (TypeError, ValueError):
+            return None, self.make_error("Invalid user ID provided")
+
+        if not self.is_super_admin:
+            user_ids = [user_id for user_id in user_ids if self.auth_user and user_id == self.auth_user.pk]
+
+        def __load(ids):
+            return self.__get_base_query().in_bulk(ids)
+
+        cache_keys = self.generate_cache_keys({user_id: ("user_id", user_id) for user_id in user_ids}, self.__user_tags)
+        users = self.get_many_or_default(cache_keys, __load)
+
+        return [users[user_id] for user_id in user_ids if user_id in users], None
+
     def fetch_list(self, filter_params) -> QuerySet:
         self.page_size = filter_params.get("page_size", 100)
         filter_keyword = filter_params.get("keyword")
@@ -149,6 +202,15 @@ class UserService(CustomAPIRequestUtil):
     def __get_base_query(cls):
         return User.available_objects
 
+    def __user_tags(self, user_id):
+        return [self.model_tag(User), self.user_tag(user_id)]
+
+    def __auth_user_cache_key(self, email):
+        return self.generate_cache_key("auth_user", md5_str(email))
+
     def clear_temp_cache(self, user):
-        self.clear_cache(self.generate_cache_key("user_id", user.id))
-        self.clear_cache(self.generate_cache_key("user_email", user.email.lower()))
+        self.invalidate_tags(self.user_tag(user.id))
+        self.clear_cache(
+            self.generate_cache_key("user_email", user.email.lower(), tags=[self.model_tag(User)]),
+            self.__auth_user_cache_key(user.email),
+        )
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from account.models import User
+from account.services.user_service import UserService
+
+
+@receiver(post_save, sender=User)
+def remember_registered_email(sender, instance, created, **kwargs):
+    if created:
+        UserService(None).remember_email(instance.email)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def clear_user_cache(sender, instance, created=False, **kwargs):
+    # covers deactivation, password changes and deletes made outside UserService too
+    if not created:
+        UserService(None).clear_temp_cache(instance)
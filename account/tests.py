@@ -1,3 +1,423 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.authentication import CachedJWTAuthentication
+from account.models import User
+from account.serializers.auth_serializer import RegisterSerializer
+from account.services.auth_service import AppRefreshToken, TokenService
+
+from services.bloom_filter import RedisBloomFilter
+from services.cache_util import CacheEntry, CacheUtil
+from services.email_deliverability import DELIVERABLE, UNDELIVERABLE, EmailDeliverabilityChecker
+from services.encryption_util import AESCipher
+from services.local_cache import get_local_cache
+from services.log import AppLogger, LogType, configure_logging
+from services.rate_limit import RateLimiter
+from services.util import CursorDirection, decode_cursor, encode_cursor
+from spt.exceptions.exception_handler import RateLimitException
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("jwt@example.com", "password", first_name="Ada")
+        token = RefreshToken.for_user(self.user).access_token
+        self.request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def authenticate(self):
+        user, _ = CachedJWTAuthentication().authenticate(self.request)
+        return user
+
+    def test_cached_user_needs_no_query(self):
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+
+    def test_updated_user_is_read_again(self):
+        self.authenticate()
+        self.user.first_name = "Grace"
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().first_name, "Grace")
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_revoked_token_is_rejected_without_a_query(self):
+        self.authenticate()
+        TokenService(None).revoke_user_tokens(self.user)
+
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+    def test_login_right_after_logout_is_accepted(self):
+        revoked = AppRefreshToken.for_user(self.user).access_token
+        # tokens from the very millisecond of the logout still pass
+        time.sleep(0.002)
+        TokenService(None).revoke_user_tokens(self.user)
+        issued = AppRefreshToken.for_user(self.user).access_token
+
+        # usually within the same second, which `iat` alone cannot tell apart
+        self.request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {issued}")
+        self.assertEqual(self.authenticate().pk, self.user.pk)
+
+        self.request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {revoked}")
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class CacheRecomputationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def slow_callback(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return {"id": 1}, None
+
+    def read_concurrently(self, count=8):
+        results = []
+
+        def read():
+            results.append(CacheUtil.get_cache_value_or_default("user:1", self.slow_callback, timeout=60))
+
+        threads = [threading.Thread(target=read) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cold_key_is_computed_once(self):
+        results = self.read_concurrently()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [({"id": 1}, None)] * 8)
+
+    def test_waiters_stop_waiting_when_the_recompute_finds_nothing(self):
+        def missing_callback():
+            self.calls += 1
+            time.sleep(0.2)
+            return None, "User not found"
+
+        results = []
+
+        def read():
+            results.append(CacheUtil.get_cache_value_or_default("user:1", missing_callback, timeout=60))
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        started_at = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLess(time.monotonic() - started_at, 1)
+        self.assertEqual(results, [(None, "User not found")] * 4)
+
+    def test_expired_key_is_recomputed_once_while_the_stale_value_is_served(self):
+        cache.set("user:1", CacheEntry({"id": 0}, time.time() - 1).dumps(), timeout=60)
+
+        results = self.read_concurrently()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(value["id"] for value, _ in results), [0] * 7 + [1])
+        self.assertEqual(CacheUtil.get_cache_value_or_default("user:1")[0], {"id": 1})
+
+    def test_key_close_to_expiry_is_refreshed_early(self):
+        cache.set("user:1", CacheEntry({"id": 0}, time.time() + 1, delta=1).dumps(), timeout=60)
+
+        with mock.patch("services.cache_util.random.random", return_value=0.99):
+            value, _ = CacheUtil.get_cache_value_or_default("user:1", self.slow_callback, timeout=60)
+
+        self.assertEqual((value, self.calls), ({"id": 1}, 1))
+
+    def test_key_far_from_expiry_is_not_refreshed(self):
+        cache.set("user:1", CacheEntry({"id": 0}, time.time() + 3600, delta=1).dumps(), timeout=60)
+
+        with mock.patch("services.cache_util.random.random", return_value=0.99):
+            value, _ = CacheUtil.get_cache_value_or_default("user:1", self.slow_callback, timeout=60)
+
+        self.assertEqual((value, self.calls), ({"id": 0}, 0))
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=True)
+class LocalCacheTests(TestCase):
+
+    def setUp(self):
+        get_local_cache().clear()
+
+    def test_l1_hits_return_their_own_instances(self):
+        CacheUtil.set_cache_value("profile:1", {"name": "Ada", "roles": ["admin"]}, timeout=60)
+
+        first, _ = CacheUtil.get_cache_value_or_default("profile:1")
+        first["roles"].append("intruder")
+        second, _ = CacheUtil.get_cache_value_or_default("profile:1")
+
+        self.assertEqual(second, {"name": "Ada", "roles": ["admin"]})
+        self.assertEqual(get_local_cache().stats()["hits"], 2)
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class CacheKeyTests(TestCase):
+
+    def test_batch_keys_match_single_keys(self):
+        CacheUtil.invalidate_tags(CacheUtil.user_tag(2))
+
+        def tags(user_id):
+            return ["users", CacheUtil.user_tag(user_id)]
+
+        self.assertEqual(
+            CacheUtil.generate_cache_keys({user_id: ("user_id", user_id) for user_id in [1, 2]}, tags),
+            {CacheUtil.generate_cache_key("user_id", user_id, tags=tags(user_id)): user_id for user_id in [1, 2]},
+        )
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class RedisBloomFilterTests(TestCase):
+
+    def setUp(self):
+        self.filter = RedisBloomFilter("emails", capacity=100, error_rate=0.01)
+
+    def test_every_item_might_exist_without_redis(self):
+        with mock.patch("services.bloom_filter.AppLogger.report") as report:
+            self.filter.add("known@example.com")
+            self.assertTrue(self.filter.might_contain("unknown@example.com"))
+
+        report.assert_not_called()
+
+    def test_failed_add_marks_the_filter_as_not_built(self):
+        client = mock.Mock()
+        client.pipeline.return_value.execute.side_effect = ConnectionError
+
+        with mock.patch("services.bloom_filter.get_redis_client", return_value=client), \
+                mock.patch("services.bloom_filter.AppLogger.report"):
+            self.filter.add("new@example.com")
+
+        client.delete.assert_called_once_with(self.filter.ready_key)
+
+    @override_settings(CACHES={"default": dict(LOCAL_CACHES["default"], KEY_PREFIX="spt", VERSION=2)})
+    def test_keys_are_namespaced_like_the_cache(self):
+        self.assertEqual(
+            [self.filter.key, self.filter.ready_key, self.filter.building_key],
+            ["spt:2:emails", "spt:2:emails:ready", "spt:2:emails:building"],
+        )
+
+
+class AESCipherTests(TestCase):
+
+    def setUp(self):
+        self.cipher = AESCipher("k" * 32, "v" * 16)
+
+    def test_nested_values_round_trip(self):
+        body = {"user": {"email": "ada@example.com", "roles": ["admin", "staff"]}, "count": 2}
+
+        self.assertEqual(
+            self.cipher.decrypt_body(self.cipher.encrypt_nested(body)),
+            {"user": {"email": "ada@example.com", "roles": ["admin", "staff"]}, "count": "2"},
+        )
+
+    def test_undecryptable_body_is_none(self):
+        self.assertIsNone(self.cipher.decrypt_body({"email": "not encrypted"}))
+
+
+class AppLoggerTests(TestCase):
+
+    def test_print_is_written_at_info(self):
+        with self.assertLogs("app", level="INFO") as logs:
+            AppLogger.print("Notification outbox batch", {"sent": 1})
+            AppLogger.print("not written", log_type=LogType.debug)
+
+        self.assertEqual(logs.output, ["INFO:app.account.tests:Notification outbox batch {'sent': 1}"])
+
+    def test_reconfiguring_keeps_other_handlers(self):
+        with self.assertLogs("app", level="INFO") as logs:
+            configure_logging(level="INFO")
+            AppLogger.info("written after reconfiguring")
+
+        configure_logging()
+        self.assertEqual(logs.output, ["INFO:app.account.tests:written after reconfiguring"])
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class EmailDeliverabilityCheckerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.lookups = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def resolve(self, domain):
+        self.lookups.append(domain)
+        self.release.wait(5)
+        return UNDELIVERABLE if domain.startswith("nowhere") else DELIVERABLE
+
+    def make_checker(self, timeout=2):
+        return EmailDeliverabilityChecker(
+            self.resolve, timeout=timeout, deliverable_timeout=60, undeliverable_timeout=60,
+            max_workers=2, max_pending=10,
+        )
+
+    def test_domains_are_resolved_once(self):
+        checker = self.make_checker()
+
+        self.assertEqual(checker.check("Gmail.com"), DELIVERABLE)
+        self.assertEqual(checker.check("gmail.com"), DELIVERABLE)
+        self.assertEqual(checker.check("nowhere-mail.com"), UNDELIVERABLE)
+        self.assertEqual(self.lookups, ["gmail.com", "nowhere-mail.com"])
+
+    def test_slow_lookup_is_let_through_and_cached_for_the_next_check(self):
+        checker = self.make_checker(timeout=0.05)
+        self.release.clear()
+
+        self.assertIsNone(checker.check("nowhere-mail.com"))
+        self.release.set()
+        checker.prewarm(["nowhere-mail.com"])
+
+        self.assertEqual(checker.check("nowhere-mail.com"), UNDELIVERABLE)
+        self.assertEqual(self.lookups, ["nowhere-mail.com"])
+
+    def test_registration_with_an_undeliverable_domain_is_rejected(self):
+        payload = {"email": "ada@nowhere-mail.com", "password": "Str0ng!Password"}
+
+        with mock.patch("account.serializers.auth_serializer.get_deliverability_checker", self.make_checker):
+            serializer = RegisterSerializer(data=payload)
+            self.assertFalse(serializer.is_valid())
+
+        self.assertEqual(serializer.errors["non_field_errors"], ["Invalid email provided"])
+        self.assertEqual(self.lookups, ["nowhere-mail.com"])
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        RateLimiter._denied.clear()
+
+    def test_login_over_the_limit_is_rejected(self):
+        payload = {"email": "nobody@example.com", "password": "wrong"}
+
+        statuses = [self.client.post("/api/v1/auth/login", payload).status_code for _ in range(6)]
+
+        self.assertNotIn(429, statuses[:5])
+        self.assertEqual(statuses[5], 429)
+
+    def test_limit_is_counted_per_client(self):
+        limiter = RateLimiter("1/m", key="ip", scope="test")
+        first = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")
+        second = RequestFactory().get("/", REMOTE_ADDR="10.0.0.2")
+
+        limiter.check(first)
+        limiter.check(second)
+        with self.assertRaises(RateLimitException):
+            limiter.check(first)
+
+    def test_fail_closed_limiter_rejects_when_requests_cannot_be_counted(self):
+        request = RequestFactory().get("/")
+
+        with mock.patch("services.rate_limit.cache.add", side_effect=ConnectionError), \
+                mock.patch("services.rate_limit.AppLogger.report"):
+            RateLimiter("5/m", scope="open").check(request)
+            with self.assertRaises(RateLimitException):
+                RateLimiter("5/m", scope="closed", fail_closed=True).check(request)
+
+
+    @override_settings(RATE_LIMIT_RULES=[("/api/v1/users/", "1/m", "user")])
+    def test_middleware_limits_bearer_tokens_per_user(self):
+        first, second = (
+            User.objects.create_superuser(f"{name}@example.com", "password") for name in ["first", "second"]
+        )
+
+        def fetch(user, address):
+            token = RefreshToken.for_user(user).access_token
+            return self.client.get("/api/v1/users/", HTTP_AUTHORIZATION=f"Bearer {token}", REMOTE_ADDR=address)
+
+        # one address shared by two users, then one user moving to another address
+        self.assertEqual(fetch(first, "10.0.0.1").status_code, 200)
+        self.assertEqual(fetch(second, "10.0.0.1").status_code, 200)
+        self.assertEqual(fetch(first, "10.0.0.2").status_code, 429)
+
+    @override_settings(CACHES={"default": dict(LOCAL_CACHES["default"], KEY_PREFIX="spt", VERSION=2)})
+    def test_sliding_window_key_is_namespaced_like_the_cache(self):
+        script = mock.Mock(return_value=[1, 0])
+        client = mock.Mock(**{"register_script.return_value": script})
+
+        with mock.patch("services.rate_limit.get_redis_client", return_value=client), \
+                mock.patch.object(RateLimiter, "_script", None):
+            RateLimiter("5/m", scope="test").check(RequestFactory().get("/", REMOTE_ADDR="10.0.0.1"))
+
+        self.assertEqual(script.call_args.kwargs["keys"], ["spt:2:ratelimit:test:10.0.0.1"])
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser("admin@example.com", "password"))
+
+        at = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        # three users share a timestamp, so only the id orders them
+        self.users = []
+        for index, created_at in enumerate([at + timedelta(days=1), at, at, at, at - timedelta(days=1)]):
+            user = User.objects.create_user(f"user{index}@example.com", "password")
+            User.objects.filter(pk=user.pk).update(created_at=created_at)
+            self.users.append(user.email)
+
+    def fetch(self, **params):
+        response = self.client.get("/api/v1/users/", {"page_size": 2, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_walk_forward_and_back_without_gaps(self):
+        pages, page = [], self.fetch(cursor="")
+        while True:
+            pages.append([user["email"] for user in page["data"]])
+            if not page["next_cursor"]:
+                break
+            page = self.fetch(cursor=page["next_cursor"])
+
+        self.assertEqual(pages, [self.users[0:2], self.users[2:4], self.users[4:]])
+        self.assertIsNone(page["total"])
+
+        previous = self.fetch(cursor=page["prev_cursor"])
+        self.assertEqual([user["email"] for user in previous["data"]], self.users[2:4])
+        previous = self.fetch(cursor=previous["prev_cursor"])
+        self.assertEqual([user["email"] for user in previous["data"]], self.users[0:2])
+        self.assertIsNone(previous["prev_cursor"])
+
+    def test_total_is_only_counted_on_request(self):
+        self.assertEqual(self.fetch(cursor="", with_total="true")["total"], 5)
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = encode_cursor(datetime(2024, 1, 1, tzinfo=dt_timezone.utc), 1, CursorDirection.next)
+
+        self.assertEqual(decode_cursor(cursor), (datetime(2024, 1, 1, tzinfo=dt_timezone.utc), 1, CursorDirection.next))
+        for invalid in [cursor[:-3], "not-a-cursor", encode_cursor(datetime(2024, 1, 1), 1, "x")]:
+            self.assertIsNone(decode_cursor(invalid))
+            self.assertEqual(self.client.get("/api/v1/users/", {"cursor": invalid}).status_code, 400)
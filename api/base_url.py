@@ -5,5 +5,7 @@ from django.urls import path, include
 urlpatterns = [
     path("auth/", include("api.urls.auth_url")),
     path('users/', include("api.urls.user_url")),
+    path('stocks/', include("api.urls.stock_url")),
+    path('performance/', include("api.urls.performance_url")),
 
 ]
\ No newline at end of file
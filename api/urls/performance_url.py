@@ -0,0 +1,7 @@
+from django.urls import path
+
+from crm.controllers.performance_controller import PerformanceMetricsApiView
+
+urlpatterns = [
+    path('', PerformanceMetricsApiView.as_view()),
+]
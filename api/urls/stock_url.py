@@ -0,0 +1,17 @@
+from django.urls import path
+
+from stock.controllers.stock_controller import (
+    QuoteListApiView, StockCandlesApiView, StockHistoryApiView, StockSearchApiView, StockSummaryApiView,
+    StreamTicketApiView,
+)
+from stock.controllers.stream_controller import price_stream_view
+
+urlpatterns = [
+    path('quotes', QuoteListApiView.as_view()),
+    path('stream', price_stream_view),
+    path('stream/ticket', StreamTicketApiView.as_view()),
+    path('search', StockSearchApiView.as_view()),
+    path('<str:symbol>/candles', StockCandlesApiView.as_view()),
+    path('<str:symbol>/history', StockHistoryApiView.as_view()),
+    path('<str:symbol>/summary', StockSummaryApiView.as_view()),
+]
@@ -0,0 +1,16 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework.generics import RetrieveAPIView
+
+from account.models import UserTypes
+from crm.services.performance_service import PerformanceService
+from services.util import CustomApiRequestProcessorBase, user_type_required
+
+
+class PerformanceMetricsApiView(RetrieveAPIView, CustomApiRequestProcessorBase):
+    wrap_response_in_data_object = True
+
+    @extend_schema(tags=["Performance"])
+    @user_type_required(UserTypes.super_admin)
+    def get(self, request, *args, **kwargs):
+        service = PerformanceService(request)
+        return self.process_request(request, service.fetch_metrics)
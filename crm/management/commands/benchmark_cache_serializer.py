@@ -0,0 +1,48 @@
+import pickle
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account.models import User
+from services.benchmark import time_per_call
+from services.cache_serializer import ModelCacheSerializer
+from stock.models import Stock
+
+
+class Command(BaseCommand):
+    help = "Compare payload size and encode/decode time of the model cache serializer against pickle"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=10000)
+        parser.add_argument("--list-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        user = User(id=42, first_name="Ada", last_name="Lovelace", email="ada@example.com", created_at=now)
+        user.set_unusable_password()
+        stock = Stock(id=7, symbol="AAPL", name="Apple Inc.", created_at=now)
+
+        samples = {
+            "user": user,
+            "stock": stock,
+            f"{options['list_size']} stocks": [
+                Stock(id=index, symbol=f"SYM{index}", name=f"Company {index}", created_at=now)
+                for index in range(options["list_size"])
+            ],
+        }
+
+        serializer = ModelCacheSerializer()
+        iterations = options["iterations"]
+        for name, value in samples.items():
+            pickled = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            compact = serializer.dumps(value)
+
+            pickle_dumps = time_per_call(lambda: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), iterations)
+            self.stdout.write(
+                f"{name}: pickle {len(pickled)}B "
+                f"dumps {pickle_dumps:.2f}us "
+                f"loads {time_per_call(lambda: pickle.loads(pickled), iterations):.2f}us | "
+                f"compact {len(compact)}B "
+                f"dumps {time_per_call(lambda: serializer.dumps(value), iterations):.2f}us "
+                f"loads {time_per_call(lambda: serializer.loads(compact), iterations):.2f}us"
+            )
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from services.benchmark import time_per_call
+from services.encryption_util import AESCipher
+
+
+class Command(BaseCommand):
+    help = "Compare per-response cost of the response encryption modes on a user list shaped payload"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--iterations", type=int, default=5)
+
+    def handle(self, *args, **options):
+        key, vector = "k" * 32, "v" * 16
+        now = timezone.now().isoformat()
+        payload = {
+            "count": options["rows"],
+            "data": [
+                {
+                    "id": index, "first_name": f"First{index}", "last_name": f"Last{index}",
+                    "email": f"user{index}@example.com", "phone_number": None, "is_active": True,
+                    "user_type": "Regular User", "balance": Decimal("1024.50"), "created_at": now,
+                }
+                for index in range(options["rows"])
+            ],
+        }
+
+        def per_leaf_cipher():
+            # the previous behaviour: a cipher per response and an AES-CBC object per leaf
+            cipher = AESCipher(key, vector)
+            return self.__encrypt_leaves(cipher, payload)
+
+        cipher = AESCipher(key, vector)
+        results = {
+            "per-leaf (previous)": time_per_call(per_leaf_cipher, options["iterations"]) / 1000,
+            "per-leaf (batched)": time_per_call(lambda: cipher.encrypt_nested(payload), options["iterations"]) / 1000,
+            "document": time_per_call(lambda: cipher.encrypt_document(payload), options["iterations"]) / 1000,
+        }
+
+        baseline = results["per-leaf (previous)"]
+        for name, elapsed in results.items():
+            self.stdout.write(f"{name}: {elapsed:.2f}ms per response ({baseline / elapsed:.1f}x)")
+
+    def __encrypt_leaves(self, cipher, ob):
+        if isinstance(ob, dict):
+            return {k: self.__encrypt_leaves(cipher, v) for k, v in ob.items()}
+        if isinstance(ob, list):
+            return [self.__encrypt_leaves(cipher, v) for v in ob]
+        return cipher.encrypt(str(ob))
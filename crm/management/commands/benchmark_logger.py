@@ -0,0 +1,51 @@
+import contextlib
+import io
+import logging
+from inspect import stack
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from services.benchmark import time_per_call
+from services.log import AppLogger, AppQueueHandler, configure_logging
+
+
+class Command(BaseCommand):
+    help = "Compare per-call cost of AppLogger against the previous inspect.stack() based logger at INFO"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        # records are formatted and handed to the listener as usual, the listener discards them
+        configure_logging(level="INFO", handlers=[logging.NullHandler()])
+
+        # the previous logger wrote enabled records to a handler too
+        previous_logger = logging.getLogger("benchmark_logger.previous")
+        previous_logger.handlers = [logging.NullHandler()]
+        previous_logger.setLevel(logging.INFO)
+        previous_logger.propagate = False
+
+        def previous_info():
+            previous_logger.getChild(stack()[1].filename).info("price %s", 42)
+
+        def previous_print():
+            print("{}::[{}]".format("Info", timezone.now()), "Request", 42, {"symbol": "AAPL"})
+
+        dropped = AppQueueHandler.dropped
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = [
+                ("info (previous)", time_per_call(previous_info, iterations)),
+                ("info", time_per_call(lambda: AppLogger.info("price %s", 42), iterations)),
+                ("print (previous)", time_per_call(previous_print, iterations)),
+                ("print", time_per_call(lambda: AppLogger.print("Request", 42, {"symbol": "AAPL"}), iterations)),
+            ]
+        dropped = AppQueueHandler.dropped - dropped
+
+        configure_logging()
+        for name, elapsed in results:
+            self.stdout.write(f"{name}: {elapsed:.2f}us per call")
+        if dropped:
+            # dropped records skip the queue, so the AppLogger timings above are optimistic
+            self.stdout.write(f"{dropped} records dropped by a full log queue, rerun with fewer --iterations")
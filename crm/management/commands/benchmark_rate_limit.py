@@ -0,0 +1,57 @@
+from itertools import cycle
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django_ratelimit.decorators import ratelimit
+
+from services.benchmark import time_per_call
+from services.rate_limit import rate_limit
+from spt.exceptions.exception_handler import RateLimitException
+
+
+class Command(BaseCommand):
+    help = "Compare per-request cost of the Lua sliding window limiter against django_ratelimit (needs Redis)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--clients", type=int, default=100)
+
+    def handle(self, *args, **options):
+        def view(request):
+            return HttpResponse("ok")
+
+        # the allowed path: a limit no client reaches
+        allowed = {
+            "django_ratelimit": ratelimit(key="ip", rate="1000000/m", group="benchmark-allowed")(view),
+            "rate_limit": rate_limit("1000000/m", key="ip", scope="benchmark-allowed")(view),
+        }
+        # the denied path: every client is over its limit after the first request
+        denied = {
+            "django_ratelimit": ratelimit(key="ip", rate="1/h", group="benchmark-denied")(view),
+            "rate_limit": rate_limit("1/h", key="ip", scope="benchmark-denied")(view),
+        }
+
+        factory = RequestFactory()
+        requests = [
+            factory.get("/", REMOTE_ADDR=f"10.0.{index // 256}.{index % 256}")
+            for index in range(options["clients"])
+        ]
+
+        for name in allowed:
+            self.stdout.write(
+                f"{name}: allowed {self.__time(allowed[name], requests, options['requests']):.1f}us, "
+                f"denied {self.__time(denied[name], requests, options['requests']):.1f}us per request"
+            )
+
+    @staticmethod
+    def __time(view, requests, count):
+        clients = cycle(requests)
+
+        def send():
+            try:
+                view(next(clients))
+            except RateLimitException:
+                pass
+
+        return time_per_call(send, count)
@@ -10,6 +10,12 @@ class ActivityType(TextChoices):
     hard_delete = "hard_delete"
 
 
+class NotificationStatus(TextChoices):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
+
+
 
 class AvailableManager(models.Manager):
     def get_queryset(self):
@@ -77,3 +83,40 @@ class ActivityLog(AppDbModel):
         return "{} by {} - {}".format(self.activity_type, self.user, self.note)
 
 
+class NotificationOutbox(AppDbModel):
+    user = models.ForeignKey(
+        "account.User",
+        on_delete=models.CASCADE,
+        related_name="notifications",
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=NotificationStatus.choices, default=NotificationStatus.pending)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="notification_outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return "{} to {} - {}".format(self.subject, self.user_id, self.status)
+
+
+class APIRequestLogging(AppDbModel):
+    ref_id = models.CharField(max_length=32, unique=True)
+    user_id = models.CharField(max_length=64, blank=True, default="")
+    view = models.CharField(max_length=500)
+    request_body = models.TextField(null=True, blank=True)
+    header = models.JSONField(default=dict, blank=True)
+    response_status = models.CharField(max_length=20, blank=True, default="")
+    response_body = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    responded_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return "{} {} - {}".format(self.ref_id, self.view, self.response_status)
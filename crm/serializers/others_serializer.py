@@ -13,6 +13,8 @@ class PaginatedResponseSerializer(serializers.Serializer):
     total = serializers.IntegerField(default=0)
     next_page_url = serializers.URLField(required=False, default=None)
     prev_page_url = serializers.URLField(required=False, default=None)
+    next_cursor = serializers.CharField(required=False, default=None)
+    prev_cursor = serializers.CharField(required=False, default=None)
 
     def get_data(self, obj) -> List[Any]:
         return obj.get("data") if isinstance(obj, dict) else obj.data
@@ -0,0 +1,156 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from crm.models import NotificationOutbox, NotificationStatus
+from services.log import AppLogger
+from services.util import CustomAPIRequestUtil
+
+DRAIN_BATCH_SIZE = 500
+CLAIM_LEASE_SECONDS = 5 * 60
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped at RETRY_MAX_SECONDS"""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+    return delay * (0.5 + random.random() / 2)
+
+
+class NotificationService(CustomAPIRequestUtil):
+    """
+    Notifications are written to an outbox and delivered by `drain`, which coalesces
+    pending notifications per user into a digest and sends a whole batch over one SMTP connection.
+    """
+
+    def queue(self, user_id, subject, body):
+        return self.queue_many([(user_id, subject, body)])
+
+    def queue_many(self, notifications):
+        """Queues (user_id, subject, body) notifications and schedules a drain"""
+        notifications = [
+            NotificationOutbox(user_id=user_id, subject=subject[:255], body=body)
+            for user_id, subject, body in notifications
+        ]
+        if not notifications:
+            return []
+
+        NotificationOutbox.objects.bulk_create(notifications)
+        transaction.on_commit(self.__schedule_drain)
+
+        return notifications
+
+    @staticmethod
+    def __schedule_drain():
+        from crm.tasks import drain_notification_outbox
+
+        # the periodic drain picks the rows up when the broker is unreachable
+        try:
+            drain_notification_outbox.delay()
+        except Exception as e:
+            AppLogger.report(e)
+
+    def drain(self, batch_size=DRAIN_BATCH_SIZE):
+        started_at = time.monotonic()
+        notifications = self.__claim(batch_size)
+
+        metrics = {
+            "claimed": len(notifications),
+            "messages": 0,
+            "sent": 0,
+            "failed": 0,
+            "dead": 0,
+        }
+        if not notifications:
+            return metrics
+
+        by_user = {}
+        for notification in notifications:
+            by_user.setdefault(notification.user_id, []).append(notification)
+
+        sent, failed = [], []
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+            for user_notifications in by_user.values():
+                try:
+                    connection.send_messages([self.__make_digest(user_notifications)])
+                    sent.extend(user_notifications)
+                    metrics["messages"] += 1
+                except Exception as e:
+                    failed.extend((notification, str(e)) for notification in user_notifications)
+        except Exception as e:
+            AppLogger.report(e)
+            delivered = {notification.pk for notification in sent}
+            failed.extend((notification, str(e)) for notification in notifications if notification.pk not in delivered)
+        finally:
+            try:
+                connection.close()
+            except Exception as e:
+                AppLogger.report(e)
+
+        now = timezone.now()
+        if sent:
+            for notification in sent:
+                notification.status = NotificationStatus.sent
+                notification.attempts += 1
+                notification.sent_at = now
+            NotificationOutbox.objects.bulk_update(sent, ["status", "attempts", "sent_at"])
+
+        if failed:
+            for notification, error in failed:
+                notification.attempts += 1
+                notification.last_error = error
+                if notification.attempts >= MAX_ATTEMPTS:
+                    notification.status = NotificationStatus.failed
+                    metrics["dead"] += 1
+                else:
+                    notification.next_attempt_at = now + timedelta(seconds=retry_delay(notification.attempts))
+            NotificationOutbox.objects.bulk_update(
+                [notification for notification, _ in failed],
+                ["status", "attempts", "last_error", "next_attempt_at"]
+            )
+
+        metrics["sent"] = len(sent)
+        metrics["failed"] = len(failed)
+        metrics["elapsed_ms"] = round((time.monotonic() - started_at) * 1000, 1)
+        AppLogger.print("Notification outbox batch", metrics)
+
+        return metrics
+
+    @staticmethod
+    def __claim(batch_size):
+        """
+        Locks a batch of due notifications and leases them by pushing `next_attempt_at` forward,
+        so concurrent workers skip them while the batch is being delivered outside the transaction.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            notifications = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True, of=("self",)).filter(
+                    status=NotificationStatus.pending, next_attempt_at__lte=now
+                ).select_related("user").order_by("next_attempt_at", "id")[:batch_size]
+            )
+            if notifications:
+                NotificationOutbox.objects.filter(pk__in=[notification.pk for notification in notifications]).update(
+                    next_attempt_at=now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+                )
+
+        return notifications
+
+    @staticmethod
+    def __make_digest(notifications):
+        user = notifications[0].user
+        if len(notifications) == 1:
+            subject, body = notifications[0].subject, notifications[0].body
+        else:
+            subject = f"You have {len(notifications)} new notifications"
+            body = "\n\n".join(f"{notification.subject}\n{notification.body}" for notification in notifications)
+
+        return EmailMessage(subject, body, None, [user.email])
@@ -0,0 +1,18 @@
+import os
+
+from services.cache_util import CacheUtil
+from services.perf import performance_registry
+from services.request_log import get_request_log_buffer
+from services.util import CustomAPIRequestUtil
+
+
+class PerformanceService(CustomAPIRequestUtil):
+
+    def fetch_metrics(self):
+        """Histograms and buffers of the worker process serving the request, every worker keeps its own"""
+        return dict(
+            process=os.getpid(),
+            views=performance_registry.snapshot(),
+            local_cache=CacheUtil.get_local_cache_stats(),
+            request_log=get_request_log_buffer().stats(),
+        ), None
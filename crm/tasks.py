@@ -1,36 +1,8 @@
 from celery import app
-from django.utils import timezone
 
-from crm.models import JitsiCallback
-from crm.services.callback_service import CallbackService
-from crm.services.user_points_service import UserPointService
-from notification.models import APIRequestLogging
 from services.log import AppLogger
 
 
-@app.shared_task
-def make_api_request_log(user_id, request_body, view, ref_id, headers, response_status=""):
-    AppLogger.print("Request", user_id, request_body, view, ref_id, headers)
-    APIRequestLogging.objects.create(
-        user_id=user_id if user_id else '', request_body=request_body,
-        view=view, ref_id=ref_id, response_status='',
-        header=headers
-    )
-
-
-@app.shared_task
-def update_api_request_log(ref_id, response_status, response_body="NA"):
-    if not isinstance(response_body, str):
-        response_body = str(response_body)
-
-    AppLogger.print("Response", ref_id, response_status, response_body)
-
-    d = APIRequestLogging.objects.get(ref_id=ref_id)
-    d.response_status = response_status
-    d.response_body = response_body
-    d.save()
-
-
 @app.shared_task
 def trigger_pull_organization_staffs(organization_id, user_id):
     from crm.services.organization_service import OrganizationService
@@ -60,9 +32,22 @@ def staff_upload_task_handler(organization_id, user_id, upload_id):
 
 @app.shared_task
 def record_user_action_point_task(tracking_id, user_id, action_type, description, time_of_action):
+    from crm.services.user_points_service import UserPointService
     UserPointService().record_action_point(tracking_id, user_id, action_type, description, time_of_action)
 
 
 @app.shared_task
 def log_jitsi_callback_data(data, created_at=None):
+    from crm.services.callback_service import CallbackService
     CallbackService().handle_jitsi_callback(data, created_at)
+
+
+@app.shared_task
+def drain_notification_outbox(max_batches=10):
+    from crm.services.notification_service import DRAIN_BATCH_SIZE, NotificationService
+
+    service = NotificationService(None)
+    for _ in range(max_batches):
+        metrics = service.drain(DRAIN_BATCH_SIZE)
+        if metrics["claimed"] < DRAIN_BATCH_SIZE:
+            break
@@ -1,3 +1,208 @@
-from django.test import TestCase
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from account.models import User
+from crm.models import APIRequestLogging, NotificationOutbox, NotificationStatus
+from crm.services.notification_service import NotificationService
+from crm.tasks import drain_notification_outbox
+from services.http_client import HttpClient
+from services.perf import performance_registry
+from services.request_log import RequestLogBuffer
+from spt.middleware import PerformanceMiddleware
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class NotificationOutboxTests(TestCase):
+
+    def test_drain_task_sends_queued_notifications(self):
+        first = User.objects.create_user("first@example.com", "password")
+        second = User.objects.create_user("second@example.com", "password")
+
+        NotificationService(None).queue_many([
+            (first.pk, "ACME price alert", "ACME has moved above 10."),
+            (first.pk, "ACME price update", "ACME is trading at 11."),
+            (second.pk, "ACME price alert", "ACME has moved below 5."),
+        ])
+
+        drain_notification_outbox()
+
+        self.assertEqual(
+            list(NotificationOutbox.objects.values_list("status", flat=True).distinct()), [NotificationStatus.sent]
+        )
+        # one digest per user
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ["first@example.com", "second@example.com"])
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers /fail with a 503 the first `failures` times, anything else with the path and client port"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path))
+        if self.path == "/fail" and self.server.failures:
+            self.server.failures -= 1
+            return self.respond(503, {})
+        self.respond(200, {"path": self.path, "port": self.client_address[1]})
+
+    def do_POST(self):
+        self.server.requests.append(("POST", self.path))
+        self.respond(503, {})
+
+    def respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server.requests, self.server.failures = [], 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.client = HttpClient(
+            timeout=(1, 2), retries=2, backoff_factor=0, backoff_jitter=0, pool_connections=2, pool_maxsize=4,
+        )
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_kept_alive(self):
+        first = self.client.request("GET", f"{self.url}/a").json()
+        second = self.client.request("GET", f"{self.url}/b").json()
+
+        self.assertEqual(first["port"], second["port"])
+
+    def test_idempotent_request_is_retried(self):
+        self.server.failures = 2
+
+        self.assertEqual(self.client.request("GET", f"{self.url}/fail").status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_post_is_sent_once(self):
+        self.assertEqual(self.client.request("POST", f"{self.url}/submit").status_code, 503)
+        self.assertEqual(self.server.requests, [("POST", "/submit")])
+
+    def test_fetch_many_keeps_the_request_order(self):
+        with mock.patch("services.http_client.AppLogger.report"):
+            results = self.client.fetch_many(
+                [{"method": "GET", "url": f"{self.url}/{index}"} for index in range(6)]
+                + [{"method": "GET", "url": "http://127.0.0.1:1/closed"}],
+                max_concurrency=3,
+            )
+
+        self.assertEqual([response.json()["path"] for response, _ in results[:6]], [f"/{index}" for index in range(6)])
+        response, error = results[6]
+        self.assertIsNone(response)
+        self.assertIsNotNone(error)
+
+
+class RequestLogBufferTests(TransactionTestCase):
+    # the writer closes stale connections after every batch, which needs autocommit outside a test transaction
+
+    def make_buffer(self, **kwargs):
+        return RequestLogBuffer(**{"max_size": 100, "batch_size": 10, "flush_interval": 1, **kwargs})
+
+    def test_records_are_dropped_when_the_buffer_is_full(self):
+        buffer = self.make_buffer(max_size=2)
+
+        for ref_id in ["1", "2", "3"]:
+            buffer.record_request(ref_id, "", "/api/v1/users/", None, {})
+
+        self.assertEqual(buffer.stats(), {"pending": 2, "written": 0, "dropped": 1, "failed": 0})
+
+    def test_records_are_written_in_bulk(self):
+        buffer = self.make_buffer()
+        buffer.record_request("1", "7", "/api/v1/users/", {"page": 1}, {})
+        buffer.flush()
+
+        for ref_id in ["2", "3"]:
+            buffer.record_request(ref_id, "", "/api/v1/stocks/quotes", None, {})
+        buffer.record_response("1", "Success", {"data": []})
+        buffer.record_response("3", "Failed", "Invalid")
+
+        # one insert with the folded response, a read and an update for the earlier request's response
+        with CaptureQueriesContext(connection) as queries:
+            buffer.flush()
+
+        statements = [query["sql"].split()[0] for query in queries.captured_queries]
+        self.assertEqual([sql for sql in statements if sql not in ["BEGIN", "COMMIT"]], ["INSERT", "SELECT", "UPDATE"])
+
+        logs = {log.ref_id: log for log in APIRequestLogging.objects.all()}
+        self.assertEqual((logs["1"].user_id, logs["1"].response_status), ("7", "Success"))
+        self.assertEqual((logs["2"].response_status, logs["3"].response_status), ("", "Failed"))
+        self.assertEqual(buffer.stats()["written"], 5)
+
+    def test_only_allowed_headers_are_kept(self):
+        buffer = self.make_buffer()
+        buffer.record_request("1", "", "/api/v1/users/", None, {
+            "HTTP_AUTHORIZATION": "Bearer secret", "HTTP_COOKIE": "session=secret", "HTTP_USER_AGENT": "tests",
+        })
+        buffer.flush()
+
+        self.assertEqual(APIRequestLogging.objects.get(ref_id="1").header, {"HTTP_USER_AGENT": "tests"})
+
+
+class PerformanceMiddlewareTests(TransactionTestCase):
+
+    def setUp(self):
+        performance_registry.reset()
+
+    @override_settings(PERF_SERVER_TIMING_ENABLED=True)
+    async def test_queries_of_sync_code_are_counted_under_asgi(self):
+        def count_users():
+            try:
+                return User.objects.count()
+            finally:
+                # the worker thread opened its own connection
+                connections.close_all()
+
+        async def view(request):
+            # what ASGI does with sync views: run them in a thread with their own connection
+            return HttpResponse(str(await sync_to_async(count_users, thread_sensitive=False)()))
+
+        response = await PerformanceMiddleware(view)(RequestFactory().get("/"))
+
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+        self.assertEqual(performance_registry.snapshot()["unresolved"]["sql"]["count"], 1)
+
+    def test_server_timing_is_off_unless_enabled(self):
+        response = PerformanceMiddleware(lambda request: HttpResponse())(RequestFactory().get("/"))
+
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    @override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+    def test_registry_is_served_to_super_admins_only(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("regular@example.com", "password"))
+        self.assertEqual(client.get("/api/v1/performance/").status_code, 403)
+
+        client.force_authenticate(User.objects.create_superuser("admin@example.com", "password"))
+        client.get("/api/v1/users/")
+        response = client.get("/api/v1/performance/")
+
+        views = response.json()["data"]["views"]
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("request", views["account.controllers.user_controller.ListCreateUsersApiView"])
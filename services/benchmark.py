@@ -0,0 +1,9 @@
+import time
+
+
+def time_per_call(callback, iterations):
+    """Mean wall time of `callback()` over `iterations` calls in microseconds, for the benchmark commands"""
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        callback()
+    return (time.perf_counter() - started_at) / iterations * 1000000
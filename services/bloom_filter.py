@@ -0,0 +1,106 @@
+import hashlib
+import math
+
+from django.core.cache import cache
+
+from services.log import AppLogger
+from services.redis_client import get_redis_client
+
+
+class RedisBloomFilter:
+    """
+    Bloom filter stored as a Redis bitmap, shared by every worker.
+    `might_contain` never gives a false negative once the filter is built, so a False
+    answer can skip the database. Items cannot be removed; rebuild to drop stale ones.
+    Until the filter has been built, and whenever Redis fails, every item "might" exist.
+    A failed `add` marks the filter as not built, so it cannot answer False for that item
+    before the next rebuild.
+    """
+
+    def __init__(self, name, capacity, error_rate):
+        self.name = name
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+
+    @property
+    def key(self):
+        # reached through the raw client, so namespaced like the cache's own keys
+        return cache.make_key(self.name)
+
+    @property
+    def ready_key(self):
+        return cache.make_key(f"{self.name}:ready")
+
+    @property
+    def building_key(self):
+        return cache.make_key(f"{self.name}:building")
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+    def add(self, *items):
+        try:
+            self.__set_bits(self.key, items)
+        except NotImplementedError:
+            # no Redis behind the cache, the filter is never built
+            pass
+        except Exception as e:
+            AppLogger.report(e)
+            self.__discard()
+
+    def might_contain(self, item):
+        try:
+            pipeline = get_redis_client().pipeline(transaction=False)
+            pipeline.exists(self.ready_key)
+            for position in self.positions(item):
+                pipeline.getbit(self.key, position)
+            ready, *bits = pipeline.execute()
+        except NotImplementedError:
+            return True
+        except Exception as e:
+            AppLogger.report(e)
+            return True
+
+        return not ready or all(bits)
+
+    def rebuild(self, items, chunk_size=5000):
+        """Fills a fresh bitmap from `items` and swaps it in atomically"""
+        building_key = self.building_key
+        redis_conn = get_redis_client()
+        redis_conn.delete(building_key)
+        # SETBIT on the last offset allocates the whole bitmap once
+        redis_conn.setbit(building_key, self.size - 1, 0)
+
+        count, chunk = 0, []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                self.__set_bits(building_key, chunk)
+                count, chunk = count + len(chunk), []
+        self.__set_bits(building_key, chunk)
+        count += len(chunk)
+
+        pipeline = redis_conn.pipeline()
+        pipeline.rename(building_key, self.key)
+        pipeline.set(self.ready_key, 1)
+        pipeline.execute()
+
+        return count
+
+    def __discard(self):
+        try:
+            get_redis_client().delete(self.ready_key)
+        except Exception as e:
+            AppLogger.report(e)
+
+    def __set_bits(self, key, items):
+        if not items:
+            return
+
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for item in items:
+            for position in self.positions(item):
+                pipeline.setbit(key, position, 1)
+        pipeline.execute()
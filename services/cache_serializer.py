@@ -0,0 +1,152 @@
+import hashlib
+import pickle
+import zlib
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models
+from django.utils.module_loading import import_string
+
+FORMAT_PICKLE = 0
+FORMAT_MODEL = 1
+FORMAT_MODEL_LIST = 2
+FLAG_COMPRESSED = 0x80
+
+FINGERPRINT_SIZE = 8
+
+DEFAULT_COMPRESS_THRESHOLD = 1024
+COMPRESSION_LEVEL = 1
+
+
+class StaleCachePayloadError(ValueError):
+    """A cached model payload written for another version of the model's fields, read as a miss"""
+
+
+class CacheSerializer:
+    """Turns cached values into bytes and back. Subclasses only need `dumps` and `loads`."""
+
+    def dumps(self, value):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+
+class PickleCacheSerializer(CacheSerializer):
+
+    def dumps(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+
+class ModelCacheSerializer(CacheSerializer):
+    """
+    Stores model instances, and lists of instances of one model, as their concrete field
+    values only, without `_state` or related object caches, and rebuilds them with `Model.from_db`.
+    Anything else is pickled. Payloads above `compress_threshold` bytes are zlib compressed.
+    The first byte holds the format and the compression flag; model payloads follow it with a
+    fingerprint of the model's label and fields, so a value cached before a schema change is
+    never loaded into the wrong fields.
+    """
+
+    def __init__(self, compress_threshold=None):
+        if compress_threshold is None:
+            compress_threshold = getattr(settings, "CACHE_COMPRESS_THRESHOLD", DEFAULT_COMPRESS_THRESHOLD)
+        self.compress_threshold = compress_threshold
+
+    def dumps(self, value):
+        payload_format, model, payload = self.__encode(value)
+        fingerprint = self.fingerprint(model) if model is not None else b""
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+        if len(data) > self.compress_threshold:
+            compressed = zlib.compress(data, COMPRESSION_LEVEL)
+            if len(compressed) < len(data):
+                return bytes([payload_format | FLAG_COMPRESSED]) + fingerprint + compressed
+
+        return bytes([payload_format]) + fingerprint + data
+
+    def loads(self, data):
+        header, data = data[0], data[1:]
+        payload_format = header & ~FLAG_COMPRESSED
+
+        fingerprint = None
+        if payload_format in (FORMAT_MODEL, FORMAT_MODEL_LIST):
+            fingerprint, data = data[:FINGERPRINT_SIZE], data[FINGERPRINT_SIZE:]
+
+        if header & FLAG_COMPRESSED:
+            data = zlib.decompress(data)
+
+        payload = pickle.loads(data)
+        if payload_format == FORMAT_MODEL:
+            label, values = payload
+            return self.__make_instance(self.__get_model(label, fingerprint), values)
+
+        if payload_format == FORMAT_MODEL_LIST:
+            label, rows = payload
+            model = self.__get_model(label, fingerprint)
+            return [self.__make_instance(model, values) for values in rows]
+
+        return payload
+
+    @staticmethod
+    def fingerprint(model):
+        """Digest of the model's label and concrete fields, it changes with any migration of their columns"""
+        fingerprint = _fingerprints.get(model)
+        if fingerprint is None:
+            fields = [f"{field.attname}:{field.get_internal_type()}" for field in model._meta.concrete_fields]
+            schema = ";".join([model._meta.label] + fields)
+            fingerprint = _fingerprints[model] = hashlib.blake2b(schema.encode(), digest_size=FINGERPRINT_SIZE).digest()
+
+        return fingerprint
+
+    @classmethod
+    def __get_model(cls, label, fingerprint):
+        model = apps.get_model(label)
+        if cls.fingerprint(model) != fingerprint:
+            raise StaleCachePayloadError(f"Stale cache payload for {label}")
+
+        return model
+
+    @classmethod
+    def __encode(cls, value):
+        if isinstance(value, models.Model) and cls.__is_encodable(value):
+            return FORMAT_MODEL, type(value), (value._meta.label, cls.__field_values(value))
+
+        if isinstance(value, list) and value and isinstance(value[0], models.Model):
+            model = type(value[0])
+            if all(type(item) is model and cls.__is_encodable(item) for item in value):
+                return FORMAT_MODEL_LIST, model, (model._meta.label, [cls.__field_values(item) for item in value])
+
+        return FORMAT_PICKLE, None, value
+
+    @staticmethod
+    def __is_encodable(instance):
+        # deferred fields would be fetched on access, keep their original behaviour by pickling
+        return not instance.get_deferred_fields()
+
+    @staticmethod
+    def __field_values(instance):
+        return tuple(getattr(instance, field.attname) for field in instance._meta.concrete_fields)
+
+    @staticmethod
+    def __make_instance(model, values):
+        field_names = [field.attname for field in model._meta.concrete_fields]
+        return model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+
+_fingerprints = {}
+_serializer = None
+
+
+def get_cache_serializer():
+    """The serializer named by `settings.CACHE_SERIALIZER`, built once per process"""
+    global _serializer
+
+    if _serializer is None:
+        path = getattr(settings, "CACHE_SERIALIZER", "services.cache_serializer.ModelCacheSerializer")
+        _serializer = import_string(path)()
+
+    return _serializer
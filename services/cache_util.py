@@ -1,49 +1,366 @@
+import math
+import random
+import struct
+import time
+
 from django.core.cache import cache
 from django.utils.text import slugify
-from django_redis import get_redis_connection
+
+from services.cache_serializer import StaleCachePayloadError, get_cache_serializer
+from services.local_cache import get_local_cache, publish_invalidation
+from services.log import AppLogger
+from services.perf import record_cache_lookup
+from services.redis_client import get_redis_client
+
+DEFAULT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Entries outlive their logical expiry by this long so a stale value can be served while one worker recomputes
+STALE_GRACE_SECONDS = 60 * 5
+RECOMPUTE_LOCK_TIMEOUT = 10
+RECOMPUTE_WAIT_SECONDS = 2
+RECOMPUTE_POLL_SECONDS = 0.05
+EARLY_REFRESH_BETA = 1.0
+TAG_VERSION_PREFIX = "cache_tag"
+
+ENTRY_MAGIC = b"\xce\x01"
+ENTRY_HEADER = struct.Struct("<ddB")
+
+
+class CacheEntry:
+    """
+    Cached value with its logical expiry and the time it took to compute (for early refresh).
+    A `missing` entry records that the callback found nothing.
+    """
+    __slots__ = ["value", "expires_at", "delta", "missing"]
+
+    def __init__(self, value, expires_at, delta=0.0, missing=False):
+        self.value = value
+        self.expires_at = expires_at
+        self.delta = delta
+        self.missing = missing
+
+    @property
+    def is_stale(self):
+        return time.time() >= self.expires_at
+
+    def should_refresh_early(self, beta=EARLY_REFRESH_BETA):
+        """Probabilistic early expiration (XFetch): refreshes become likelier as expiry approaches"""
+        if not self.delta:
+            return False
+        return time.time() - self.delta * beta * math.log(1.0 - random.random()) >= self.expires_at
+
+    def dumps(self):
+        """Redis representation: magic, fixed header, then the value from the configured CacheSerializer"""
+        payload = b"" if self.missing else get_cache_serializer().dumps(self.value)
+        return ENTRY_MAGIC + ENTRY_HEADER.pack(self.expires_at, self.delta, self.missing) + payload
+
+    @classmethod
+    def loads(cls, data):
+        expires_at, delta, missing = ENTRY_HEADER.unpack_from(data, len(ENTRY_MAGIC))
+        payload = data[len(ENTRY_MAGIC) + ENTRY_HEADER.size:]
+        value = None if missing else get_cache_serializer().loads(payload)
+        return cls(value, expires_at, delta, bool(missing))
 
 
 class CacheUtil:
 
     @staticmethod
-    def get_cache_value_or_default(cache_key, value_callback=None, require_fresh_data=False, timeout=None):
-        cached_data = None
-        error_details = None
+    def get_cache_value_or_default(
+            cache_key, value_callback=None, require_fresh_data=False, timeout=None, miss_timeout=None
+    ):
+        """
+        Returns (value, error), calling `value_callback` on a miss.
+        Recomputation is single-flight: one worker takes a short Redis lock and recomputes,
+        the others serve the stale value when there is one or wait briefly for the fresh one.
+        With `miss_timeout`, empty results are cached too and come back as (None, None)
+        until they expire, so callers build their own not found error.
+        """
+        entry = None if require_fresh_data else CacheUtil.__get_entry(cache_key)
+        if entry is not None:
+            record_cache_lookup(hits=1)
+        else:
+            record_cache_lookup(misses=1)
+
+        if entry is not None and not entry.is_stale and not entry.should_refresh_early():
+            return entry.value, None
+
+        if value_callback is None:
+            return (entry.value if entry is not None else None), None
+
+        if require_fresh_data:
+            return CacheUtil.__recompute(cache_key, value_callback, timeout, miss_timeout)
+
+        lock_key = f"{cache_key}:lock"
+        if cache.add(lock_key, 1, timeout=RECOMPUTE_LOCK_TIMEOUT):
+            try:
+                return CacheUtil.__recompute(cache_key, value_callback, timeout, miss_timeout)
+            finally:
+                cache.delete(lock_key)
+
+        if entry is not None:
+            return entry.value, None
+
+        deadline = time.monotonic() + RECOMPUTE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(RECOMPUTE_POLL_SECONDS)
+            entry = CacheUtil.__get_entry(cache_key, use_local_cache=False)
+            if entry is not None:
+                return entry.value, None
+
+            # released without a value: the holder got a miss or an error, there is nothing to wait for
+            if not cache.has_key(lock_key):
+                break
 
-        if not require_fresh_data:
-            cached_data = cache.get(cache_key)
+        return CacheUtil.__recompute(cache_key, value_callback, timeout, miss_timeout)
 
-        if not cached_data:
-            if value_callback is not None:
-                cached_data, error_details = value_callback()
-                if cached_data:
-                    CacheUtil.set_cache_value(cache_key, cached_data, timeout=timeout)
+    @staticmethod
+    def __recompute(cache_key, value_callback, timeout, miss_timeout=None):
+        started_at = time.monotonic()
+        cached_data, error_details = value_callback()
+        if cached_data:
+            CacheUtil.set_cache_value(cache_key, cached_data, timeout=timeout, delta=time.monotonic() - started_at)
+        elif miss_timeout:
+            CacheUtil.set_cache_miss(cache_key, miss_timeout)
 
         return cached_data, error_details
 
     @staticmethod
-    def set_cache_value(cache_key, cached_data, timeout=None):
+    def __get_entry(cache_key, use_local_cache=True):
+        local_cache = get_local_cache() if use_local_cache else None
+
+        entry = CacheUtil.__get_local_entry(local_cache, cache_key)
+        if entry is None:
+            data = cache.get(cache_key)
+            entry = CacheUtil.__unwrap(data)
+            if entry is None:
+                return None
+
+            if not entry.is_stale:
+                CacheUtil.__set_local_entry(local_cache, cache_key, entry, entry.expires_at - time.time(), data)
+
+        if entry.missing:
+            # misses are never served stale, the value may have been created since
+            return None if entry.is_stale else entry
+
+        return entry if entry.value else None
+
+    @staticmethod
+    def __get_local_entry(local_cache, cache_key):
+        """L1 holds serialized entries, so every caller gets its own instance to mutate"""
+        data = local_cache.get(cache_key, None) if local_cache is not None else None
+        return CacheUtil.__unwrap(data) if data is not None else None
+
+    @staticmethod
+    def __set_local_entry(local_cache, cache_key, entry, timeout, data=None):
+        if local_cache is None:
+            return
+
+        if not (isinstance(data, bytes) and data.startswith(ENTRY_MAGIC)):
+            data = entry.dumps()
+        local_cache.set(cache_key, data, timeout=timeout)
+
+    @staticmethod
+    def __unwrap(entry):
+        if isinstance(entry, bytes) and entry.startswith(ENTRY_MAGIC):
+            try:
+                return CacheEntry.loads(entry)
+            except StaleCachePayloadError:
+                return None
+            except Exception as e:
+                AppLogger.report(e)
+                return None
+
+        if entry is None or isinstance(entry, CacheEntry):
+            return entry
+
+        # values written before entries were wrapped
+        return CacheEntry(entry, time.time() + STALE_GRACE_SECONDS)
+
+    @staticmethod
+    def get_many_or_default(cache_keys, batch_loader=None, timeout=None):
+        """
+        Bulk counterpart of `get_cache_value_or_default`. `cache_keys` maps every cache key to the
+        identifier the loader understands, and {identifier: value} is returned for the values found.
+        Redis is read with one MGET, all misses go to a single `batch_loader(identifiers)` call
+        returning {identifier: value}, and the loaded values are written back in one pipelined MSET.
+        """
+        found, remaining = {}, {}
+        local_cache = get_local_cache()
+
+        for cache_key, identifier in cache_keys.items():
+            entry = CacheUtil.__get_local_entry(local_cache, cache_key)
+            if entry is not None and not entry.is_stale:
+                if not entry.missing:
+                    found[identifier] = entry.value
+            else:
+                remaining[cache_key] = identifier
+
+        if remaining:
+            for cache_key, data in cache.get_many(list(remaining)).items():
+                entry = CacheUtil.__unwrap(data)
+                if entry is None or entry.is_stale or not (entry.value or entry.missing):
+                    continue
+
+                identifier = remaining.pop(cache_key)
+                if not entry.missing:
+                    found[identifier] = entry.value
+                CacheUtil.__set_local_entry(local_cache, cache_key, entry, entry.expires_at - time.time(), data)
+
+        record_cache_lookup(hits=len(found), misses=len(remaining))
+        if not remaining or batch_loader is None:
+            return found
+
+        loaded = batch_loader(list(remaining.values())) or {}
+        if not timeout:
+            timeout = DEFAULT_CACHE_TIMEOUT
+
+        entries = {}
+        for cache_key, identifier in remaining.items():
+            value = loaded.get(identifier)
+            if value:
+                found[identifier] = value
+                entries[cache_key] = CacheEntry(value, time.time() + timeout)
+
+        if entries:
+            serialized = {cache_key: entry.dumps() for cache_key, entry in entries.items()}
+            cache.set_many(serialized, timeout=timeout + min(timeout, STALE_GRACE_SECONDS))
+            for cache_key, entry in entries.items():
+                CacheUtil.__set_local_entry(local_cache, cache_key, entry, timeout, serialized[cache_key])
+
+        return found
+
+    @staticmethod
+    def set_cache_value(cache_key, cached_data, timeout=None, delta=0.0):
         if not timeout:
-            timeout = 60 * 60 * 24 * 7
-        cache.set(cache_key, cached_data, timeout=timeout)
+            timeout = DEFAULT_CACHE_TIMEOUT
+
+        entry = CacheEntry(cached_data, time.time() + timeout, delta)
+        data = entry.dumps()
+        cache.set(cache_key, data, timeout=timeout + min(timeout, STALE_GRACE_SECONDS))
+        CacheUtil.__set_local_entry(get_local_cache(), cache_key, entry, timeout, data)
+
+    @staticmethod
+    def set_cache_miss(cache_key, timeout):
+        entry = CacheEntry(None, time.time() + timeout, missing=True)
+        data = entry.dumps()
+        cache.set(cache_key, data, timeout=timeout)
+        CacheUtil.__set_local_entry(get_local_cache(), cache_key, entry, timeout, data)
 
     @staticmethod
     def clear_cache(*cache_keys):
         cache.delete_many(list(cache_keys))
 
+        local_cache = get_local_cache()
+        if local_cache is not None:
+            local_cache.delete_many(cache_keys)
+            publish_invalidation(keys=cache_keys)
+
+    @staticmethod
+    def model_tag(model):
+        return f"model:{model._meta.label_lower}"
+
+    @staticmethod
+    def user_tag(user_id):
+        return f"user:{user_id}"
+
+    @staticmethod
+    def get_tag_versions(*tags):
+        """Current version of every tag, read through the L1 cache and a single MGET"""
+        local_cache = get_local_cache()
+
+        versions, missing = {}, {}
+        for tag in tags:
+            version_key = f"{TAG_VERSION_PREFIX}:{tag}"
+            version = local_cache.get(version_key, None) if local_cache is not None else None
+            if version is None:
+                missing[version_key] = tag
+            else:
+                versions[tag] = version
+
+        if missing:
+            stored = cache.get_many(list(missing))
+            for version_key, tag in missing.items():
+                version = stored.get(version_key)
+                if version is None:
+                    # seeded from the clock so a tag whose version was evicted never reuses an old version
+                    version = int(time.time() * 1000)
+                    if not cache.add(version_key, version, timeout=None):
+                        version = cache.get(version_key, version)
+
+                versions[tag] = version
+                if local_cache is not None:
+                    local_cache.set(version_key, version)
+
+        return [versions[tag] for tag in tags]
+
+    @staticmethod
+    def invalidate_tags(*tags):
+        """
+        Invalidates every key generated with one of `tags` by bumping the tag version,
+        one INCR per tag whatever the number of keys. Orphaned entries age out by TTL.
+        """
+        version_keys = [f"{TAG_VERSION_PREFIX}:{tag}" for tag in tags]
+        for version_key in version_keys:
+            try:
+                cache.incr(version_key)
+            except ValueError:
+                cache.add(version_key, int(time.time() * 1000), timeout=None)
+
+        local_cache = get_local_cache()
+        if local_cache is not None:
+            local_cache.delete_many(version_keys)
+            publish_invalidation(keys=version_keys)
+
+    @staticmethod
+    def get_local_cache_stats():
+        local_cache = get_local_cache()
+        return local_cache.stats() if local_cache is not None else None
+
+    @staticmethod
+    def get_hash_values(name, fields):
+        if not fields:
+            return []
+
+        return get_redis_client().hmget(name, list(fields))
+
+    @staticmethod
+    def set_hash_values(name, mapping):
+        if not mapping:
+            return
+
+        get_redis_client().hset(name, mapping=mapping)
+
+    @staticmethod
+    def publish_message(channel, message):
+        return get_redis_client().publish(channel, message)
+
+    @staticmethod
+    def generate_cache_key(*args, tags=None):
+        """Tagged keys fold in the current tag versions, so `invalidate_tags` moves them to fresh keys"""
+        return CacheUtil.__format_key(args, CacheUtil.get_tag_versions(*tags) if tags else None)
+
     @staticmethod
-    def clear_cache_by_pattern(prefix):
-        redis_conn = get_redis_connection('default')
+    def generate_cache_keys(args_by_identifier, tags=None):
+        """
+        {cache_key: identifier} with the `generate_cache_key(*args, tags=...)` of every identifier,
+        the versions of all their tags read in one go. `tags` is a list shared by every key,
+        or a callable returning the tags of an identifier.
+        """
+        tags_by_identifier = {
+            identifier: (tags(identifier) if callable(tags) else tags) or [] for identifier in args_by_identifier
+        }
+        unique_tags = list(dict.fromkeys(tag for item_tags in tags_by_identifier.values() for tag in item_tags))
+        versions = dict(zip(unique_tags, CacheUtil.get_tag_versions(*unique_tags))) if unique_tags else {}
 
-        cursor = '0'
-        while cursor != 0:
-            cursor, keys = redis_conn.scan(cursor=cursor, match=f'{prefix}*', count=100)
-            if keys:
-                redis_conn.delete(*keys)
+        return {
+            CacheUtil.__format_key(args, [versions[tag] for tag in tags_by_identifier[identifier]]): identifier
+            for identifier, args in args_by_identifier.items()
+        }
 
     @staticmethod
-    def generate_cache_key(*args):
-        if not args:
-            args = []
+    def __format_key(args, versions=None):
+        cache_key = ":".join(list(slugify(arg) for arg in args))
+        if versions:
+            cache_key = f"{cache_key}:v{'.'.join(str(version) for version in versions)}"
 
-        return ":".join(list(slugify(arg) for arg in args ))
+        return cache_key
@@ -0,0 +1,150 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+
+import dns.resolver
+from django.conf import settings
+from email_validator import EmailUndeliverableError
+from email_validator.deliverability import validate_email_deliverability
+
+from services.cache_util import CacheUtil
+from services.log import AppLogger
+from services.process_local import ProcessLocal
+
+DELIVERABLE = "deliverable"
+UNDELIVERABLE = "undeliverable"
+DELIVERABILITY_KEY_PREFIX = "email_domain"
+
+# prewarmed on top of the most common domains among registered users
+COMMON_EMAIL_DOMAINS = (
+    "gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com", "live.com", "aol.com",
+    "protonmail.com", "proton.me", "yandex.com", "mail.com", "gmx.com", "zoho.com", "msn.com", "me.com",
+)
+
+
+class DnsDomainResolver:
+    """
+    Default resolver: the MX lookup, with its A/AAAA fallback, done by email_validator.
+    Returns DELIVERABLE, UNDELIVERABLE, or None when DNS gave no answer in time.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._resolver = None
+
+    def __call__(self, domain):
+        if self._resolver is None:
+            # own resolver, email_validator would otherwise change the lifetime of dnspython's default one
+            resolver = dns.resolver.Resolver()
+            resolver.lifetime = self.timeout
+            self._resolver = resolver
+
+        try:
+            info = validate_email_deliverability(domain, domain, dns_resolver=self._resolver)
+        except EmailUndeliverableError:
+            return UNDELIVERABLE
+
+        return None if info.get("unknown-deliverability") else DELIVERABLE
+
+
+class EmailDeliverabilityChecker:
+    """
+    Deliverability of email domains, cached per domain in the L1 cache and Redis for
+    `deliverable_timeout` or `undeliverable_timeout` seconds. Unknown domains are resolved on a
+    bounded thread pool and waited for at most `timeout` seconds; a lookup that takes longer keeps
+    running and caches its answer for the next caller. `resolver` is any callable taking a domain
+    and returning DELIVERABLE, UNDELIVERABLE or None, so tests can stub DNS out.
+    """
+
+    def __init__(self, resolver, timeout, deliverable_timeout, undeliverable_timeout, max_workers, max_pending):
+        self.resolver = resolver
+        self.timeout = timeout
+        self.deliverable_timeout = deliverable_timeout
+        self.undeliverable_timeout = undeliverable_timeout
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="email-domain")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def check(self, domain):
+        """DELIVERABLE, UNDELIVERABLE, or None when it could not be told in time"""
+        domain = domain.lower()
+        status = self.get_cached(domain)
+        if status:
+            return status
+
+        future = self.__submit(domain)
+        if future is None:
+            return None
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            return None
+
+    def get_cached(self, domain):
+        try:
+            status, _ = CacheUtil.get_cache_value_or_default(self.cache_key(domain))
+            return status
+        except Exception as e:
+            AppLogger.report(e)
+            return None
+
+    def prewarm(self, domains):
+        """Resolves every domain not cached yet, waiting for all of them; returns {domain: status}"""
+        futures = {}
+        for domain in {domain.lower() for domain in domains if domain}:
+            if not self.get_cached(domain):
+                future = self.__submit(domain, bounded=False)
+                futures[domain] = future
+
+        wait(futures.values())
+        return {domain: future.result() for domain, future in futures.items()}
+
+    @staticmethod
+    def cache_key(domain):
+        return f"{DELIVERABILITY_KEY_PREFIX}:{domain}"
+
+    def __submit(self, domain, bounded=True):
+        """The lookup in flight for `domain`, or a new one; None when too many are already queued"""
+        with self._lock:
+            future = self._pending.get(domain)
+            if future is None:
+                if bounded and len(self._pending) >= self.max_pending:
+                    return None
+
+                future = self._pending[domain] = self._executor.submit(self.__resolve, domain)
+
+            return future
+
+    def __resolve(self, domain):
+        try:
+            status = self.resolver(domain)
+            if status:
+                timeout = self.deliverable_timeout if status == DELIVERABLE else self.undeliverable_timeout
+                CacheUtil.set_cache_value(self.cache_key(domain), status, timeout=timeout)
+            return status
+        except Exception as e:
+            AppLogger.report(e)
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(domain, None)
+
+
+def _create_deliverability_checker():
+    return EmailDeliverabilityChecker(
+        resolver=DnsDomainResolver(timeout=getattr(settings, "EMAIL_DELIVERABILITY_DNS_TIMEOUT", 5)),
+        timeout=getattr(settings, "EMAIL_DELIVERABILITY_TIMEOUT", 2),
+        deliverable_timeout=getattr(settings, "EMAIL_DELIVERABLE_TTL", 60 * 60 * 24),
+        undeliverable_timeout=getattr(settings, "EMAIL_UNDELIVERABLE_TTL", 60 * 60),
+        max_workers=getattr(settings, "EMAIL_DELIVERABILITY_WORKERS", 4),
+        max_pending=getattr(settings, "EMAIL_DELIVERABILITY_MAX_PENDING", 100),
+    )
+
+
+_checker = ProcessLocal(_create_deliverability_checker)
+
+
+def get_deliverability_checker():
+    """This process' checker, its thread pool is created on first use"""
+    return _checker.get()
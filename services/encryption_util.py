@@ -1,10 +1,20 @@
 import hashlib
+import json
 from base64 import b64decode, b64encode
-from decimal import Decimal
+from functools import lru_cache
 
 from Cryptodome.Cipher import AES
+from Cryptodome.Random import get_random_bytes
 from Cryptodome.Util.Padding import pad, unpad
 from django.db.models import QuerySet
+from rest_framework.utils.encoders import JSONEncoder
+
+ENCRYPTION_MODE_HEADER = "X-Encryption-Mode"
+ENCRYPTION_MODE_FIELDS = "fields"
+ENCRYPTION_MODE_DOCUMENT = "document"
+
+# PKCS#7 padding for every possible length of the last block, as `pad` would add it
+PKCS7_PADDING = [bytes([AES.block_size - length]) * (AES.block_size - length) for length in range(AES.block_size)]
 
 
 class AESCipher:
@@ -18,6 +28,8 @@ class AESCipher:
     def __init__(self, key, vector):
         self.key = bytes(key, 'ascii')
         self.vector = bytes(vector, 'ascii')
+        # ECB holds no chaining state, so one key schedule serves every leaf of encrypt_nested
+        self.block_cipher = AES.new(self.key, AES.MODE_ECB)
 
     def encrypt(self, raw):
         if raw == "" or raw is None:
@@ -34,20 +46,58 @@ class AESCipher:
         return unpad(cipher.decrypt(text), AES.block_size).decode('utf8')
 
     def encrypt_nested(self, ob):
-        if isinstance(ob, dict):
-            ret_obj = {}
-            for k, v in ob.items():
-                if isinstance(v, str) or isinstance(v, int) or isinstance(v, Decimal):
-                    ret_obj[k] = self.encrypt(str(v))
-                else:
-                    ret_obj[k] = self.encrypt_nested(v)
-        elif isinstance(ob, list) or isinstance(ob, QuerySet):
-            ret_obj = []
-            for v in ob:
-                ret_obj.append(self.encrypt_nested(v))
-        else:
-            ret_obj = self.encrypt(str(ob))
-        return ret_obj
+        """
+        Encrypts every leaf as `encrypt(str(leaf))` would. The structure is copied in one walk,
+        then the distinct leaves are encrypted together: CBC runs one block position at a time
+        across all of them, with a single ECB call per position instead of a new cipher per leaf.
+        """
+        root, slots = [None], []
+        self.__copy_structure(ob, root, 0, slots)
+
+        leaves = dict.fromkeys(value for _, _, value in slots)
+        encrypted = dict(zip(leaves, self.encrypt_many(list(leaves))))
+        for container, key, value in slots:
+            container[key] = encrypted[value]
+
+        return root[0]
+
+    def encrypt_many(self, values):
+        """Same output as `[self.encrypt(value) for value in values]` for non-empty strings"""
+        padded = [raw + PKCS7_PADDING[len(raw) % AES.block_size] for raw in (bytes(value, 'utf8') for value in values)]
+        encrypted = [[] for _ in padded]
+        chain = [self.vector] * len(padded)
+
+        pending, offset = list(range(len(padded))), 0
+        while pending:
+            blocks = b"".join(padded[index][offset:offset + AES.block_size] for index in pending)
+            vectors = b"".join(chain[index] for index in pending)
+            mixed = (int.from_bytes(blocks, "big") ^ int.from_bytes(vectors, "big")).to_bytes(len(blocks), "big")
+            output = self.block_cipher.encrypt(mixed)
+
+            for position, index in enumerate(pending):
+                block = output[position * AES.block_size:(position + 1) * AES.block_size]
+                encrypted[index].append(block)
+                chain[index] = block
+
+            offset += AES.block_size
+            pending = [index for index in pending if len(padded[index]) > offset]
+
+        return [b64encode(b"".join(blocks)).decode('utf8') for blocks in encrypted]
+
+    def encrypt_document(self, ob):
+        """
+        Serializes `ob` to JSON once and encrypts it in one pass under a random IV.
+        Returns base64 of the IV followed by the ciphertext.
+        """
+        raw = json.dumps(ob, cls=JSONEncoder, separators=(",", ":")).encode('utf8')
+        vector = get_random_bytes(AES.block_size)
+        cipher = AES.new(self.key, AES.MODE_CBC, iv=vector)
+        return b64encode(vector + cipher.encrypt(pad(raw, AES.block_size))).decode('utf8')
+
+    def decrypt_document(self, enc):
+        data = b64decode(enc)
+        cipher = AES.new(self.key, AES.MODE_CBC, iv=data[:AES.block_size])
+        return json.loads(unpad(cipher.decrypt(data[AES.block_size:]), AES.block_size))
 
     def decrypt_nested(self, ob):
         if isinstance(ob, dict):
@@ -69,6 +119,36 @@ class AESCipher:
         except:
             return None
 
+    def __copy_structure(self, ob, container, key, slots):
+        """Copies dicts and lists into `container[key]`, recording every non-empty leaf as a slot to encrypt"""
+        if isinstance(ob, dict):
+            copy, items = {}, ob.items()
+        elif isinstance(ob, list) or isinstance(ob, QuerySet):
+            copy = list(ob)
+            items = enumerate(copy)
+        else:
+            value = str(ob)
+            container[key] = value
+            if value:
+                slots.append((container, key, value))
+            return
+
+        container[key] = copy
+        for k, v in items:
+            if isinstance(v, dict) or isinstance(v, list) or isinstance(v, QuerySet):
+                self.__copy_structure(v, copy, k, slots)
+            else:
+                value = str(v)
+                copy[k] = value
+                if value:
+                    slots.append((copy, k, value))
+
+
+@lru_cache(maxsize=8)
+def get_cipher(key, vector):
+    """Shared AESCipher for a key pair, the ECB key schedule is built once per process"""
+    return AESCipher(key, vector)
+
 
 def md5_str(data):
     md5_hash = hashlib.md5()
@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.log import AppLogger
+from services.process_local import ProcessLocal
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+LOGGED_BODY_LENGTH = 2000
+
+
+class HttpClient:
+    """
+    Outgoing HTTP with keep-alive: one HTTPAdapter holds a connection pool per host and is shared
+    by a Session per thread, since Sessions are not thread safe but the pools are.
+    Every request gets `timeout`, a (connect, read) tuple, unless it passes its own.
+    Connection errors and RETRY_STATUSES are retried with jittered exponential backoff, for idempotent
+    methods only; a POST is never sent twice.
+    """
+
+    def __init__(self, timeout, retries, backoff_factor, backoff_jitter, pool_connections, pool_maxsize,
+                 log_response_body=False):
+        self.timeout = timeout
+        self.log_response_body = log_response_body
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                backoff_jitter=backoff_jitter,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                raise_on_status=False,
+            ),
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+        return session
+
+    def request(self, method, url, **kwargs):
+        """`requests.request` through the pooled session, raises on connection errors like it"""
+        kwargs.setdefault("timeout", self.timeout)
+        response = self.session.request(method, url, **kwargs)
+
+        if self.log_response_body:
+            AppLogger.debug("%s %s %s %s", method, url, response.status_code, response.text[:LOGGED_BODY_LENGTH])
+        else:
+            AppLogger.debug("%s %s %s", method, url, response.status_code)
+
+        return response
+
+    def fetch_many(self, requests_kwargs, max_concurrency=10):
+        """
+        Sends every request, given as `request` keyword arguments, with at most `max_concurrency`
+        in flight. Returns (response, error) pairs in the order of `requests_kwargs`.
+        """
+        requests_kwargs = list(requests_kwargs)
+        if not requests_kwargs:
+            return []
+
+        def send(kwargs):
+            try:
+                return self.request(**kwargs), None
+            except Exception as e:
+                AppLogger.report(e)
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(requests_kwargs))) as executor:
+            return list(executor.map(send, requests_kwargs))
+
+    def close(self):
+        self.adapter.close()
+
+
+def _create_http_client():
+    return HttpClient(
+        timeout=(
+            getattr(settings, "HTTP_CLIENT_CONNECT_TIMEOUT", 3.05),
+            getattr(settings, "HTTP_CLIENT_READ_TIMEOUT", 30),
+        ),
+        retries=getattr(settings, "HTTP_CLIENT_RETRIES", 3),
+        backoff_factor=getattr(settings, "HTTP_CLIENT_BACKOFF_FACTOR", 0.5),
+        backoff_jitter=getattr(settings, "HTTP_CLIENT_BACKOFF_JITTER", 0.5),
+        pool_connections=getattr(settings, "HTTP_CLIENT_POOL_CONNECTIONS", 20),
+        pool_maxsize=getattr(settings, "HTTP_CLIENT_POOL_MAXSIZE", 20),
+        log_response_body=getattr(settings, "HTTP_CLIENT_LOG_RESPONSE_BODY", False),
+    )
+
+
+_client = ProcessLocal(_create_http_client)
+
+
+def get_http_client():
+    """This process' HttpClient, so forked workers never share connections"""
+    return _client.get()
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from services.log import AppLogger
+from services.process_local import ProcessLocal
+from services.redis_client import get_redis_client
+
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+RECONNECT_DELAY_SECONDS = 1
+MAX_RECONNECT_DELAY_SECONDS = 30
+
+MISSING = object()
+
+
+class LocalCache:
+    """
+    Bounded, thread safe in-process LRU with a per entry TTL.
+    Values are shared between threads and must be treated as read-only.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = min(timeout, self.timeout) if timeout else self.timeout
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class CacheInvalidationListener(threading.Thread):
+    """
+    Evicts keys from this process' LocalCache when any worker publishes an invalidation.
+    The local cache is flushed on every (re)subscribe since messages may have been missed.
+    """
+
+    def __init__(self, local_cache):
+        super().__init__(name="cache-invalidation-listener", daemon=True)
+        self.local_cache = local_cache
+
+    def run(self):
+        delay = RECONNECT_DELAY_SECONDS
+        while True:
+            try:
+                pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                self.local_cache.clear()
+                delay = RECONNECT_DELAY_SECONDS
+
+                for message in pubsub.listen():
+                    self.handle_message(message["data"])
+            except NotImplementedError as e:
+                AppLogger.warning("L1 cache entries are not invalidated across processes: %s", e)
+                return
+            except Exception as e:
+                AppLogger.report(e)
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
+
+    def handle_message(self, data):
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError):
+            return
+
+        if payload.get("keys"):
+            self.local_cache.delete_many(payload["keys"])
+
+
+def publish_invalidation(keys):
+    try:
+        get_redis_client().publish(CACHE_INVALIDATION_CHANNEL, json.dumps({"keys": list(keys)}))
+    except NotImplementedError:
+        # no Redis to publish to, reported once by the listener
+        pass
+    except Exception as e:
+        AppLogger.report(e)
+
+
+def _create_local_cache():
+    local_cache = LocalCache(
+        max_size=getattr(settings, "CACHE_L1_MAX_SIZE", 10000),
+        timeout=getattr(settings, "CACHE_L1_TIMEOUT", 30),
+    )
+    CacheInvalidationListener(local_cache).start()
+    return local_cache
+
+
+_local_cache = ProcessLocal(_create_local_cache)
+
+
+def get_local_cache():
+    """Returns this process' L1 cache, or None when CACHE_L1_ENABLED is off"""
+    if not getattr(settings, "CACHE_L1_ENABLED", False):
+        return None
+
+    return _local_cache.get()
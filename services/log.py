@@ -1,10 +1,15 @@
-
+import atexit
+import json
 import logging
-import traceback
+import os
+import queue
+import sys
+import threading
 from enum import Enum
-from inspect import stack
+from logging.handlers import QueueHandler, QueueListener
 
-from django.utils import timezone
+APP_LOGGER_PREFIX = "app"
+LOG_QUEUE_SIZE = 10000
 
 
 class LogType(Enum):
@@ -16,53 +21,164 @@ class LogType(Enum):
     fatal = "Fatal"
 
 
+LOG_TYPE_LEVELS = {
+    LogType.info: logging.INFO,
+    LogType.debug: logging.DEBUG,
+    LogType.warning: logging.WARNING,
+    LogType.error: logging.ERROR,
+    LogType.critical: logging.CRITICAL,
+    LogType.fatal: logging.FATAL,
+}
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "file": record.pathname,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, default=str)
+
+    def formatTime(self, record, datefmt=None):
+        return f"{super().formatTime(record, '%Y-%m-%dT%H:%M:%S')}.{int(record.msecs):03d}"
+
+
+class AppQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without blocking: the message and traceback are
+    rendered here, since args may be mutated afterwards, and the record is dropped when the queue is full.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            AppQueueHandler.dropped += 1
+
+
+_loggers = {}
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def configure_logging(level=None, handlers=None):
+    """
+    Routes every AppLogger logger through a queue to a background listener writing JSON lines,
+    stderr unless other `handlers` are given. Runs at startup, and again on first use in a forked process.
+    """
+    global _listener, _listener_pid
+
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+
+        if level is None:
+            level = os.getenv("APP_LOG_LEVEL") or ("DEBUG" if os.getenv("DEBUG") else "INFO")
+
+        if handlers is None:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(JsonLogFormatter())
+            handlers = [handler]
+
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        root = logging.getLogger(APP_LOGGER_PREFIX)
+        # only our own handler is replaced, ones attached by others (e.g. assertLogs) keep receiving records
+        root.handlers = [handler for handler in root.handlers if not isinstance(handler, AppQueueHandler)]
+        root.addHandler(AppQueueHandler(log_queue))
+        root.setLevel(level)
+        root.propagate = False
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        if _listener_pid is None:
+            atexit.register(lambda: _listener.stop())
+        _listener_pid = os.getpid()
+
+
+def get_logger(depth=0):
+    """Logger named after the calling module, or the one `depth` frames further up, cached per module"""
+    if _listener_pid != os.getpid():
+        configure_logging()
+
+    module = sys._getframe(depth + 1).f_globals.get("__name__", "")
+    logger = _loggers.get(module)
+    if logger is None:
+        logger = _loggers[module] = logging.getLogger(f"{APP_LOGGER_PREFIX}.{module}")
+    return logger
+
+
+def _log(level, msg, args, kwargs):
+    logger = get_logger(2)
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, *args, stacklevel=3, **kwargs)
+
+
 class AppLogger:
 
     @staticmethod
     def debug(msg, *args, **kwargs):
-        get_logger(stack()).debug(msg, *args, **kwargs)
+        _log(logging.DEBUG, msg, args, kwargs)
 
     @staticmethod
     def info(msg, *args, **kwargs):
-        get_logger(stack()).info(msg, *args, **kwargs)
+        _log(logging.INFO, msg, args, kwargs)
 
     @staticmethod
     def warning(msg, *args, **kwargs):
-        get_logger(stack()).warning(msg, *args, **kwargs)
+        _log(logging.WARNING, msg, args, kwargs)
 
     @staticmethod
     def error(msg, *args, **kwargs):
-        get_logger(stack()).error(msg, *args, **kwargs)
+        _log(logging.ERROR, msg, args, kwargs)
 
     @staticmethod
     def exception(msg, *args, **kwargs):
-        get_logger(stack()).exception(msg, *args, exc_info=True, **kwargs)
+        _log(logging.ERROR, msg, args, dict(kwargs, exc_info=True))
 
     @staticmethod
     def critical(msg, *args, **kwargs):
-        get_logger(stack()).critical(msg, *args, exc_info=True, **kwargs)
+        _log(logging.CRITICAL, msg, args, dict(kwargs, exc_info=True))
 
     @staticmethod
     def fatal(msg, *args, **kwargs):
-        get_logger(stack()).fatal(msg, *args, exc_info=True, **kwargs)
+        _log(logging.FATAL, msg, args, dict(kwargs, exc_info=True))
 
     @staticmethod
     def log(msg, *args, **kwargs):
-        AppLogger.print(*args)
+        _log(logging.INFO, " ".join(["%s"] * (len(args) + 1)), (msg,) + args, {})
 
     @staticmethod
-    def print(*args, log_type=LogType.debug):
-        print("{}::[{}]".format(log_type, timezone.now()), *args)
+    def print(*args, log_type=LogType.info):
+        # written at INFO like the stdout prints it replaced, quiet call sites pass LogType.debug
+        # args are only joined when the level is enabled
+        _log(LOG_TYPE_LEVELS[log_type], " ".join(["%s"] * len(args)), args, {})
 
     @staticmethod
     def report(e=None, error=None):
         if e:
-            traceback.print_exc()
+            _log(logging.ERROR, "%s", (e,), {"exc_info": e if isinstance(e, BaseException) else True})
 
         if error:
-            AppLogger.print(error, log_type=LogType.error)
-
-
-
-def get_logger(s):
-    return logging.getLogger(s[1].filename)
+            _log(logging.ERROR, "%s", (error,), {})
@@ -0,0 +1,149 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# upper bounds in milliseconds, the last bucket catches everything slower
+HISTOGRAM_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current_metrics = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Costs collected while serving one request"""
+    __slots__ = ["started_at", "sql_count", "sql_time", "cache_hits", "cache_misses", "timings"]
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.timings = {}
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def add_timing(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        entries = [
+            f"app;dur={total * 1000:.1f}",
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} misses"',
+        ]
+        entries.extend(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items())
+        return ", ".join(entries)
+
+
+def start_request_metrics():
+    metrics = RequestMetrics()
+    return metrics, _current_metrics.set(metrics)
+
+
+def stop_request_metrics(token):
+    _current_metrics.reset(token)
+
+
+def record_sql(execute, sql, params, many, context):
+    """`connection.execute_wrapper` hook adding every query to the current request's metrics"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - started_at
+        metrics.sql_count += 1
+
+
+def install_sql_metrics(connection, **kwargs):
+    """
+    Adds `record_sql` to a connection once. Connected to `connection_created`, so the
+    connections of the threads ASGI runs sync code in are measured too.
+    """
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def record_cache_lookup(hits=0, misses=0):
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+@contextmanager
+def timed(name):
+    """Adds the time spent in the block to the current request's `name` timing, a no-op outside requests"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timing(name, time.perf_counter() - started_at)
+
+
+class Histogram:
+    """Fixed bucket latency histogram, cheap enough to observe on every request"""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+
+    def snapshot(self):
+        labels = [f"le_{bound}" for bound in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class PerformanceRegistry:
+    """In-process histograms of every view's request, SQL and named timings, in milliseconds"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe_request(self, view, metrics, total):
+        observations = [("request", total), ("sql", metrics.sql_time)]
+        observations.extend(metrics.timings.items())
+
+        with self._lock:
+            for name, seconds in observations:
+                histogram = self._histograms.get((view, name))
+                if histogram is None:
+                    histogram = self._histograms[(view, name)] = Histogram()
+                histogram.observe(seconds * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {}
+            for (view, name), histogram in sorted(self._histograms.items()):
+                snapshot.setdefault(view, {})[name] = histogram.snapshot()
+            return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+
+performance_registry = PerformanceRegistry()
@@ -0,0 +1,28 @@
+import os
+import threading
+
+
+class ProcessLocal:
+    """
+    Lazily built value owned by the current process. `factory` runs on first use in every
+    process, so a worker forked from a parent that already used the value gets its own
+    instead of sharing the parent's threads, pools and sockets.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._value
+
+        with self._lock:
+            if self._pid != pid:
+                self._value = self.factory()
+                self._pid = pid
+
+        return self._value
@@ -0,0 +1,217 @@
+import re
+import threading
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from services.encryption_util import md5_str
+from services.local_cache import LocalCache
+from services.log import AppLogger
+from services.redis_client import get_redis_client
+from spt.exceptions.exception_handler import RateLimitException
+
+RATE_LIMIT_PREFIX = "ratelimit"
+DENIED_CACHE_SIZE = 10000
+# how long a client is turned away by a fail closed limiter that could not count its request
+UNAVAILABLE_RETRY_MS = 1000
+
+RATE_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+RATE_PATTERN = re.compile(r"^(\d+)/(\d*)([smhd])$")
+
+# Sliding window log: every allowed hit is a sorted set member scored by its time, so the
+# window slides continuously instead of resetting at fixed edges. Returns {allowed, retry_after_ms}.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], window)
+    return {1, 0}
+end
+
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, tonumber(oldest[2]) + window - now}
+"""
+
+
+def parse_rate(rate):
+    """'5/m' or '100/15m' into (limit, window in seconds)"""
+    match = RATE_PATTERN.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate '{rate}'")
+
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * RATE_UNITS[unit]
+
+
+def client_ip_key(request):
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def user_key(request):
+    """
+    The authenticated user. Middleware runs before DRF authenticates the request, so there the
+    user of a valid bearer token is used. Anonymous requests fall back to their IP.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"user:{getattr(user, jwt_settings.USER_ID_FIELD)}"
+
+    user_id = get_bearer_user_id(request)
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{client_ip_key(request)}"
+
+
+def get_bearer_user_id(request):
+    """User id claim of the request's bearer token once its signature and expiry are verified, without a query"""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+
+    try:
+        return authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def token_key(request):
+    """The bearer token, before it is authenticated, so this also works in middleware"""
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    return f"token:{md5_str(authorization)}" if authorization else f"ip:{client_ip_key(request)}"
+
+
+RATE_LIMIT_KEYS = {
+    "ip": client_ip_key,
+    "user": user_key,
+    "token": token_key,
+}
+
+
+class RateLimiter:
+    """
+    Sliding window limit of `rate` hits per key, checked by one atomic Lua script per request.
+    Without Redis behind the cache, or when the script fails, a fixed window counter in the
+    cache is used instead. When that fails too, requests are let through unless `fail_closed`,
+    which login and other brute-forceable routes set.
+    Keys that were denied are remembered in-process until their retry time, so an abusive
+    client keeps being rejected without a Redis call.
+    """
+
+    _script = None
+    _script_lock = threading.Lock()
+    _denied = LocalCache(max_size=DENIED_CACHE_SIZE, timeout=60 * 60 * 24)
+
+    def __init__(self, rate, key="ip", scope=None, fail_closed=False):
+        self.limit, self.window = parse_rate(rate)
+        self.key_func = RATE_LIMIT_KEYS[key] if isinstance(key, str) else key
+        self.scope = scope or rate
+        self.fail_closed = fail_closed
+
+    def check(self, request):
+        """Raises RateLimitException when the request is over the limit"""
+        cache_key = f"{RATE_LIMIT_PREFIX}:{self.scope}:{self.key_func(request)}"
+        if RateLimiter._denied.get(cache_key, None) is not None:
+            raise RateLimitException()
+
+        try:
+            allowed, retry_after_ms = self.__check_sliding_window(cache_key)
+        except NotImplementedError:
+            allowed, retry_after_ms = self.__check_fixed_window(cache_key)
+        except Exception as e:
+            AppLogger.report(e)
+            allowed, retry_after_ms = self.__check_fixed_window(cache_key)
+
+        if not allowed:
+            RateLimiter._denied.set(cache_key, True, timeout=max(retry_after_ms, 1) / 1000)
+            raise RateLimitException()
+
+    def __check_sliding_window(self, cache_key):
+        # the script runs on the raw client, so the key is namespaced like the cache's own keys
+        return self.__get_script()(
+            keys=[cache.make_key(cache_key)], args=[int(time.time() * 1000), self.window * 1000, self.limit, uuid.uuid4().hex]
+        )
+
+    def __check_fixed_window(self, cache_key):
+        """(allowed, retry_after_ms) from a counter per window in the cache, as django_ratelimit counts"""
+        now = time.time()
+        window = int(now // self.window)
+        window_key = f"{cache_key}:{window}"
+
+        try:
+            cache.add(window_key, 0, timeout=self.window)
+            count = cache.incr(window_key)
+        except Exception as e:
+            AppLogger.report(e)
+            return not self.fail_closed, UNAVAILABLE_RETRY_MS
+
+        return count <= self.limit, int(((window + 1) * self.window - now) * 1000)
+
+    @classmethod
+    def __get_script(cls):
+        if cls._script is None:
+            with cls._script_lock:
+                if cls._script is None:
+                    # redis-py runs it with EVALSHA and reloads it when the server lost it
+                    cls._script = get_redis_client().register_script(SLIDING_WINDOW_SCRIPT)
+        return cls._script
+
+
+def rate_limit(rate, key="ip", scope=None, fail_closed=False):
+    """
+    View decorator, for view functions and view methods alike:
+
+        @rate_limit("5/m", key="ip", fail_closed=True)
+        def post(self, request, *args, **kwargs):
+    """
+    def decorator(view_func):
+        limiter = RateLimiter(
+            rate, key=key, scope=scope or f"{view_func.__module__}.{view_func.__qualname__}", fail_closed=fail_closed
+        )
+
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            request = args[0] if hasattr(args[0], "META") else args[1]
+            limiter.check(request)
+            return view_func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class RateLimitMiddleware:
+    """
+    Applies `settings.RATE_LIMIT_RULES`, a list of (path prefix, rate, key) tuples,
+    before the request reaches a view. Every matching rule is checked. "user" rules
+    verify the bearer token themselves, since DRF only authenticates in the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rules = [
+            (prefix, RateLimiter(rate, key=key, scope=f"path:{prefix}:{rate}"))
+            for prefix, rate, key in getattr(settings, "RATE_LIMIT_RULES", [])
+        ]
+
+    def __call__(self, request):
+        try:
+            for prefix, limiter in self.rules:
+                if request.path.startswith(prefix):
+                    limiter.check(request)
+        except RateLimitException as e:
+            return JsonResponse({"message": str(e.detail)}, status=e.status_code)
+
+        return self.get_response(request)
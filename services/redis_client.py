@@ -0,0 +1,22 @@
+from django.core.cache import caches
+
+
+def get_redis_client(alias="default"):
+    """
+    The redis-py client behind the `alias` cache, for commands the cache API has no call for.
+    Works with Django's RedisCache and django-redis. Other backends raise NotImplementedError,
+    which callers handle like Redis being unavailable.
+    """
+    backend = caches[alias]
+
+    # django.core.cache.backends.redis.RedisCache
+    client = getattr(backend, "_cache", None)
+    if hasattr(client, "get_client"):
+        return client.get_client(write=True)
+
+    # django_redis.cache.RedisCache
+    client = getattr(backend, "client", None)
+    if hasattr(client, "get_client"):
+        return client.get_client(write=True)
+
+    raise NotImplementedError(f"The '{alias}' cache is not backed by Redis")
@@ -0,0 +1,155 @@
+import atexit
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from services.log import AppLogger
+from services.process_local import ProcessLocal
+
+DEFAULT_LOG_HEADERS = (
+    "HTTP_USER_AGENT", "HTTP_X_FORWARDED_FOR", "HTTP_X_REQUEST_ID", "REMOTE_ADDR", "CONTENT_TYPE", "CONTENT_LENGTH",
+)
+DEFAULT_MAX_BODY_LENGTH = 10000
+
+RECORD_REQUEST = "request"
+RECORD_RESPONSE = "response"
+
+
+class RequestLogBuffer:
+    """
+    Bounded in-process buffer of API request/response log records, written by a background
+    thread in bulk_create/bulk_update batches. Recording never blocks: when the buffer is
+    full the record is dropped and counted.
+    """
+
+    def __init__(self, max_size, batch_size, flush_interval, headers=DEFAULT_LOG_HEADERS,
+                 max_body_length=DEFAULT_MAX_BODY_LENGTH):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.headers = tuple(headers)
+        self.max_body_length = max_body_length
+        self._queue = queue.Queue(maxsize=max_size)
+        self._flush_lock = threading.Lock()
+
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def record_request(self, ref_id, user_id, view, request_body, meta):
+        headers = {name: meta[name] for name in self.headers if name in meta}
+        self.__offer((RECORD_REQUEST, ref_id, timezone.now(), user_id, view, request_body, headers))
+
+    def record_response(self, ref_id, response_status, response_body):
+        self.__offer((RECORD_RESPONSE, ref_id, timezone.now(), response_status, response_body))
+
+    def run(self):
+        while True:
+            try:
+                records = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            self.flush(records)
+
+    def flush(self, records=None):
+        """Writes `records` plus whatever is buffered, one batch at a time"""
+        with self._flush_lock:
+            records = list(records or [])
+            while True:
+                while len(records) < self.batch_size:
+                    try:
+                        records.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                if not records:
+                    return
+
+                try:
+                    self.__write(records)
+                    self.written += len(records)
+                except Exception as e:
+                    self.failed += len(records)
+                    AppLogger.report(e)
+                finally:
+                    close_old_connections()
+
+                records = []
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def __offer(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def __write(self, records):
+        from crm.models import APIRequestLogging
+
+        created, responses = {}, {}
+        for record in records:
+            if record[0] == RECORD_REQUEST:
+                _, ref_id, created_at, user_id, view, request_body, headers = record
+                created[ref_id] = APIRequestLogging(
+                    ref_id=ref_id, user_id=user_id or "", view=view[:500], created_at=created_at,
+                    request_body=self.__truncate(request_body), header=headers,
+                )
+            else:
+                _, ref_id, responded_at, response_status, response_body = record
+                responses[ref_id] = (responded_at, response_status, self.__truncate(response_body))
+
+        # responses of requests from the same batch are folded into the insert
+        for ref_id in list(responses):
+            log = created.get(ref_id)
+            if log is not None:
+                log.responded_at, log.response_status, log.response_body = responses.pop(ref_id)
+
+        if created:
+            APIRequestLogging.objects.bulk_create(created.values(), batch_size=self.batch_size, ignore_conflicts=True)
+
+        if responses:
+            logs = list(APIRequestLogging.objects.filter(ref_id__in=list(responses)))
+            for log in logs:
+                log.responded_at, log.response_status, log.response_body = responses[log.ref_id]
+            APIRequestLogging.objects.bulk_update(
+                logs, ["responded_at", "response_status", "response_body"], batch_size=self.batch_size
+            )
+
+    def __truncate(self, body):
+        if body is None:
+            return None
+
+        if not isinstance(body, str):
+            body = str(body)
+        return body[:self.max_body_length]
+
+
+def _create_request_log_buffer():
+    buffer = RequestLogBuffer(
+        max_size=getattr(settings, "API_LOG_QUEUE_SIZE", 10000),
+        batch_size=getattr(settings, "API_LOG_BATCH_SIZE", 500),
+        flush_interval=getattr(settings, "API_LOG_FLUSH_INTERVAL", 1.0),
+        headers=getattr(settings, "API_LOG_HEADERS", DEFAULT_LOG_HEADERS),
+        max_body_length=getattr(settings, "API_LOG_MAX_BODY_LENGTH", DEFAULT_MAX_BODY_LENGTH),
+    )
+    threading.Thread(target=buffer.run, name="request-log-writer", daemon=True).start()
+    atexit.register(buffer.flush)
+    return buffer
+
+
+_buffer = ProcessLocal(_create_request_log_buffer)
+
+
+def get_request_log_buffer():
+    """This process' request log buffer, its writer thread is started on first use"""
+    return _buffer.get()
@@ -2,6 +2,7 @@ import decimal
 import json
 import random
 import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime, date
 from functools import wraps
 from math import ceil
@@ -9,15 +10,16 @@ from typing import Union, TypeVar
 from uuid import UUID, uuid4
 
 import phonenumbers
-import requests
 from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
 from django.contrib.auth.models import AnonymousUser
 from django.core.mail import send_mail
-from django.db.models import TextChoices
+from django.db.models import Q, TextChoices
 from django.template import Context, Template
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from django.utils.crypto import get_random_string
+from django.utils.dateparse import parse_datetime
 from django.utils.timezone import make_aware, is_aware
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
@@ -28,8 +30,11 @@ from account.models import User, UserTypes
 
 from spt.errors.app_errors import OperationError
 from services.cache_util import CacheUtil
-from services.encryption_util import AESCipher
+from services.encryption_util import ENCRYPTION_MODE_DOCUMENT, ENCRYPTION_MODE_HEADER, get_cipher
+from services.http_client import get_http_client
 from services.log import AppLogger
+from services.perf import timed
+from services.request_log import get_request_log_buffer
 
 T = TypeVar("T")
 
@@ -65,10 +70,23 @@ class CustomAPIResponseUtil:
         if not settings.APP_ENC_ENABLED:
             return Response(data, status=status_code)
 
-        cipher = AESCipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
-        encrypted_data = cipher.encrypt_nested(data)
+        # clients opt in to a single encrypted document, the others keep per-field encryption
+        cipher = get_cipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
+        request = getattr(self, "request", None)
+        document_mode = (
+            request is not None and request.headers.get(ENCRYPTION_MODE_HEADER, "").lower() == ENCRYPTION_MODE_DOCUMENT
+        )
+        with timed("encrypt"):
+            if document_mode:
+                response = Response(
+                    {"payload": cipher.encrypt_document(data)}, status=status_code,
+                    headers={ENCRYPTION_MODE_HEADER: ENCRYPTION_MODE_DOCUMENT}
+                )
+            else:
+                response = Response(cipher.encrypt_nested(data), status=status_code)
 
-        return Response(encrypted_data, status=status_code)
+        patch_vary_headers(response, [ENCRYPTION_MODE_HEADER])
+        return response
 
     def response_with_error(self, error_list, status_code=None):
         if not status_code:
@@ -176,8 +194,30 @@ def render_template_to_text(message, data=dict):
     return template.render(context)
 
 
+class CursorDirection(TextChoices):
+    next = "n"
+    prev = "p"
+
+
+def encode_cursor(created_at, pk, direction):
+    raw = json.dumps({"c": created_at.isoformat(), "i": pk, "d": direction})
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        created_at = parse_datetime(raw["c"])
+        if created_at is None or raw["d"] not in CursorDirection.values:
+            return None
+        return created_at, int(raw["i"]), raw["d"]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
 class CustomAPIRequestUtil(DefaultPagination, CacheUtil):
     serializer_class = None
+    cursor_pagination_enabled = False
 
     def __init__(self, request=None):
         self.request = request
@@ -242,7 +282,7 @@ class CustomAPIRequestUtil(DefaultPagination, CacheUtil):
         return data
 
     def get_request_filter_params(self, *additional_params):
-        general_params = ['keyword', 'filter', 'from_date', 'to_date', 'page', 'page_size']
+        general_params = ['keyword', 'filter', 'from_date', 'to_date', 'page', 'page_size', 'cursor', 'with_total']
 
         data = self.__extract_filter_params(general_params, self.request.query_params)
         data.update(self.get_specific_request_filter_params(*additional_params))
@@ -335,16 +375,93 @@ class CustomAPIRequestUtil(DefaultPagination, CacheUtil):
             "data": data
         }
 
+    def __make_cursor_pages(self, data, total, next_cursor, prev_cursor):
+        request_url = self.request.path
+
+        q_list = []
+        if next_cursor or prev_cursor:
+            query_list = self.request.query_params or {}
+            for key in query_list:
+                if key != "cursor":
+                    q_list.append(f"{key}={query_list[key]}")
+
+        def make_url(cursor):
+            if not cursor:
+                return None
+            return f"{request_url}?{'&'.join(q_list + ['cursor=' + cursor])}"
+
+        return {
+            "page_size": self.page_size,
+            "current_page": None,
+            "last_page": None,
+            "total": total,
+            "next_page_url": make_url(next_cursor),
+            "prev_page_url": make_url(prev_cursor),
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "data": data
+        }
+
     def fetch_list(self, filter_params):
         raise Exception("Not implemented")
 
     def fetch_paginated_list(self, filter_params):
         queryset = self.fetch_list(filter_params=filter_params)
+        if self.cursor_pagination_enabled or filter_params.get("cursor") is not None:
+            return self.fetch_cursor_paginated_list(queryset, filter_params)
+
         page = self.paginate_queryset(queryset, request=self.request)
         data = self.serializer_class(page, many=True).data
 
         return self.get_paginated_list_response(data, queryset.count())
 
+    def fetch_cursor_paginated_list(self, queryset, filter_params):
+        """
+        Keyset pagination over (-created_at, id): every page is a bounded index range scan
+        no matter how deep it is, and COUNT(*) only runs when `with_total=true` is requested.
+        """
+        page_size = min(max(int(self.page_size or 1), 1), self.max_page_size)
+
+        cursor = filter_params.get("cursor")
+        position = decode_cursor(cursor) if cursor else None
+        if cursor and position is None:
+            return None, self.make_error("Invalid pagination cursor")
+
+        direction = position[2] if position else CursorDirection.next
+        if direction == CursorDirection.next:
+            queryset = queryset.order_by("-created_at", "id")
+            if position:
+                created_at, pk, _ = position
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__gt=pk))
+        else:
+            created_at, pk, _ = position
+            queryset = queryset.order_by("created_at", "-id").filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if direction == CursorDirection.next:
+            has_next_page, has_prev_page = has_more, position is not None
+        else:
+            rows.reverse()
+            has_next_page, has_prev_page = True, has_more
+
+        next_cursor, prev_cursor = None, None
+        if rows and has_next_page:
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk, CursorDirection.next)
+        if rows and has_prev_page:
+            prev_cursor = encode_cursor(rows[0].created_at, rows[0].pk, CursorDirection.prev)
+
+        total = None
+        if str(filter_params.get("with_total") or "").lower() in ["true", "1"]:
+            total = self.fetch_list(filter_params=filter_params).count()
+
+        data = self.serializer_class(rows, many=True).data
+        return self.__make_cursor_pages(data, total, next_cursor, prev_cursor)
+
 
 class CustomApiRequestProcessorBase(CustomAPIRequestUtil, CustomAPIResponseUtil):
     permission_classes = [IsAuthenticated]
@@ -377,19 +494,18 @@ class CustomApiRequestProcessorBase(CustomAPIRequestUtil, CustomAPIResponseUtil)
     def process_request(self, request, target_function, **extra_args):
 
         if self.request_payload_requires_decryption:
-            encryption_util = AESCipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
-            request_data = encryption_util.decrypt(request.data)
+            encryption_util = get_cipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
+            with timed("encrypt"):
+                request_data = encryption_util.decrypt(request.data)
         else:
             request_data = request.data
 
         if self.logging_enabled:
             self.ref_id = Util.generate_digits(18)
             try:
-                from crm.tasks import make_api_request_log
-                make_api_request_log(
-                    request.user.id if request.user and not request.user.is_anonymous else "",
-                    request.data, request.get_full_path(), self.ref_id,
-                    headers={k: v for k, v in request.META.items() if k != 'HTTP_AUTHORIZATION'}
+                get_request_log_buffer().record_request(
+                    self.ref_id, request.user.id if request.user and not request.user.is_anonymous else "",
+                    request.get_full_path(), request.data, request.META
                 )
             except Exception as e:
                 AppLogger.log(e)
@@ -408,23 +524,24 @@ class CustomApiRequestProcessorBase(CustomAPIRequestUtil, CustomAPIResponseUtil)
                     many=self.request_serializer_requires_many
                 )
 
-                if serializer.is_valid():
-                    response_raw_data: Union[tuple, T] = target_function(serializer.validated_data, **extra_args)
+                with timed("serialize"):
+                    is_valid = serializer.is_valid()
+
+                if is_valid:
+                    with timed("service"):
+                        response_raw_data: Union[tuple, T] = target_function(serializer.validated_data, **extra_args)
                     return self.__handle_request_response(response_raw_data)
                 else:
                     return self.validation_error(serializer.errors)
             else:
-                response_raw_data: Union[tuple, T] = target_function(**extra_args)
+                with timed("service"):
+                    response_raw_data: Union[tuple, T] = target_function(**extra_args)
                 return self.__handle_request_response(response_raw_data)
         except Exception as e:
             AppLogger.report(e)
             response_data = {"error": str(e), "message": "Server error"}
             if self.ref_id:
-                try:
-                    from crm.tasks import update_api_request_log
-                    update_api_request_log.delay(self.ref_id, response_status="Success", response_body=response_data)
-                except Exception as e:
-                    AppLogger.report(e)
+                get_request_log_buffer().record_response(self.ref_id, "Success", response_data)
             return self.response_with_json(response_data, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def __handle_request_response(self, response_raw_data):
@@ -441,33 +558,28 @@ class CustomApiRequestProcessorBase(CustomAPIRequestUtil, CustomAPIResponseUtil)
                 error_detail = error_detail.get_message()
 
                 if self.ref_id:
-                    try:
-                        from crm.tasks import update_api_request_log
-                        update_api_request_log.delay(self.ref_id, response_status="Failed", response_body=error_detail)
-                    except Exception as e:
-                        AppLogger.report(e, error=error_detail)
+                    get_request_log_buffer().record_response(self.ref_id, "Failed", error_detail)
             if status_code and status_code in [400, 404, 500]:
                 return self.response_with_message(error_detail, status_code=status_code)
 
             return self.response_with_error(error_detail, status_code)
 
         if self.response_serializer is not None:
-            response_data = self.response_serializer(response_data, many=self.response_serializer_requires_many).data
+            with timed("serialize"):
+                response_data = self.response_serializer(
+                    response_data, many=self.response_serializer_requires_many
+                ).data
 
         if self.wrap_response_in_data_object:
             response_data = {"data": response_data}
 
         if self.ref_id:
-            try:
-                from crm.tasks import update_api_request_log
-                update_api_request_log.delay(self.ref_id, response_status="Success", response_body=response_data)
-            except Exception as e:
-                AppLogger.report(e)
-                AppLogger.print(response_data)
+            get_request_log_buffer().record_response(self.ref_id, "Success", response_data)
 
         if self.response_payload_requires_encryption:
-            encryption_util = AESCipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
-            response_data = encryption_util.encrypt_nested(response_data)
+            encryption_util = get_cipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
+            with timed("encrypt"):
+                response_data = encryption_util.encrypt_nested(response_data)
 
         return self.response_with_json(response_data)
 
@@ -511,25 +623,14 @@ def generate_ref_id(prefix="", length=5):
 
 
 def make_http_request(method, url, headers=None, data=None, json=None):
-    methods_dict = {
-        HTTPMethods.get: requests.get,
-        HTTPMethods.post: requests.post,
-        HTTPMethods.patch: requests.patch,
-        HTTPMethods.options: requests.options,
-        HTTPMethods.delete: requests.delete,
-    }
-
     try:
-        request_method = methods_dict.get(method.upper())
-        if not request_method:
+        if method.upper() not in HTTPMethods.values:
             return None, f"Unsupported method: {method}"
 
         if json is not None:
-            response = request_method(url, headers=headers, json=json)
+            response = get_http_client().request(method.upper(), url, headers=headers, json=json)
         else:
-            response = request_method(url, headers=headers, data=data)
-
-        AppLogger.print(response.text)
+            response = get_http_client().request(method.upper(), url, headers=headers, data=data)
 
         try:
             if response.ok:
@@ -2,6 +2,8 @@
 ASGI config for spt project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The price stream endpoint (api/v1/stocks/stream) holds connections open, so the
+app is served by gunicorn with uvicorn workers (see the Dockerfile).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
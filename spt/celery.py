@@ -5,7 +5,7 @@ from celery import Celery
 from django.apps import apps
 from django.conf import settings
 
-dotenv.read_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
+dotenv.load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spt.settings')
 
 app = Celery('spt', broker=settings.BROKER_URL)
@@ -18,6 +18,14 @@ app.conf.result_backend = settings.BROKER_URL + '/0'
 app.conf.redbeat_lock_key = None
 
 app.conf.beat_schedule = {
+    "dispatch-due-subscriptions": {
+        "task": "stock.tasks.dispatch_due_subscriptions",
+        "schedule": 60.0,
+    },
+    "drain-notification-outbox": {
+        "task": "crm.tasks.drain_notification_outbox",
+        "schedule": 30.0,
+    },
 }
 
 app.autodiscover_tasks(lambda: [n.name for n in apps.get_app_configs()])
@@ -0,0 +1,70 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from services.perf import install_sql_metrics, performance_registry, start_request_metrics, stop_request_metrics
+
+
+class PerformanceMiddleware:
+    """
+    Measures every request: wall time, SQL count and time, cache hits and misses and the named
+    timings recorded with `services.perf.timed`. Totals go into the per view histograms of
+    `performance_registry`, and into a Server-Timing header when PERF_SERVER_TIMING_ENABLED.
+    Every connection records its queries into the metrics of the request whose context it runs
+    in, so queries of sync code run in worker threads under ASGI are counted as well.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "PERF_METRICS_ENABLED", True)
+        self.server_timing_enabled = getattr(settings, "PERF_SERVER_TIMING_ENABLED", settings.DEBUG)
+        if self.enabled:
+            connection_created.connect(install_sql_metrics, dispatch_uid="perf_install_sql_metrics")
+
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall(request)
+
+        if not self.enabled:
+            return self.get_response(request)
+
+        # connections opened before the middleware was built did not get the wrapper
+        for alias in connections:
+            install_sql_metrics(connections[alias])
+
+        metrics, token = start_request_metrics()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_request_metrics(token)
+
+        return self.__finish(request, response, metrics)
+
+    async def __acall(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        metrics, token = start_request_metrics()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_request_metrics(token)
+
+        return self.__finish(request, response, metrics)
+
+    def __finish(self, request, response, metrics):
+        total = metrics.elapsed
+        match = getattr(request, "resolver_match", None)
+        performance_registry.observe_request(match.view_name if match else "unresolved", metrics, total)
+
+        if self.server_timing_enabled:
+            response["Server-Timing"] = metrics.server_timing(total)
+
+        return response
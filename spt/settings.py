@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'drf_spectacular',
 
     'account',
@@ -50,12 +51,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'spt.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'services.rate_limit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -137,6 +140,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = "account.User"
 
 RATELIMIT_EXCEPTION_CLASS = "spt.exceptions.exception_handler.RateLimitException"
+# (path prefix, rate, key) limits applied by RateLimitMiddleware to every request, e.g. ("/api/", "600/m", "token")
+RATE_LIMIT_RULES = []
 
 EXEMPTED_ORIGINS = os.getenv("EXEMPTED_ORIGINS", "").split(",")
 CSRF_TRUSTED_ORIGINS = os.getenv("CSRF_TRUSTED_ORIGINS", "").split(",")
@@ -161,7 +166,7 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
 
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "account.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PARSER_CLASSES": (
         "rest_framework.parsers.JSONParser",
@@ -214,6 +219,49 @@ CACHES = {
     }
 }
 
+# Optional in-process L1 cache in front of Redis, see services.local_cache
+CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "False").lower() == "true"
+CACHE_L1_MAX_SIZE = int(os.getenv("CACHE_L1_MAX_SIZE", 10000))
+CACHE_L1_TIMEOUT = int(os.getenv("CACHE_L1_TIMEOUT", 30))
+
+CACHE_SERIALIZER = os.getenv("CACHE_SERIALIZER", "services.cache_serializer.ModelCacheSerializer")
+CACHE_COMPRESS_THRESHOLD = int(os.getenv("CACHE_COMPRESS_THRESHOLD", 1024))
+
+# Symbols whose price history each process keeps in memory, see stock.services.price_history_service
+PRICE_HISTORY_MAX_SERIES = int(os.getenv("PRICE_HISTORY_MAX_SERIES", 256))
+
+USER_EMAIL_FILTER_CAPACITY = int(os.getenv("USER_EMAIL_FILTER_CAPACITY", 1000000))
+USER_EMAIL_FILTER_ERROR_RATE = float(os.getenv("USER_EMAIL_FILTER_ERROR_RATE", 0.001))
+
+# Registration checks email domains through services.email_deliverability, cached per domain
+EMAIL_DELIVERABILITY_TIMEOUT = float(os.getenv("EMAIL_DELIVERABILITY_TIMEOUT", 2))
+EMAIL_DELIVERABILITY_DNS_TIMEOUT = float(os.getenv("EMAIL_DELIVERABILITY_DNS_TIMEOUT", 5))
+EMAIL_DELIVERABLE_TTL = int(os.getenv("EMAIL_DELIVERABLE_TTL", 60 * 60 * 24))
+EMAIL_UNDELIVERABLE_TTL = int(os.getenv("EMAIL_UNDELIVERABLE_TTL", 60 * 60))
+EMAIL_DELIVERABILITY_WORKERS = int(os.getenv("EMAIL_DELIVERABILITY_WORKERS", 4))
+EMAIL_DELIVERABILITY_MAX_PENDING = int(os.getenv("EMAIL_DELIVERABILITY_MAX_PENDING", 100))
+
+# Outgoing requests, see services.http_client
+HTTP_CLIENT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", 3.05))
+HTTP_CLIENT_READ_TIMEOUT = float(os.getenv("HTTP_CLIENT_READ_TIMEOUT", 30))
+HTTP_CLIENT_RETRIES = int(os.getenv("HTTP_CLIENT_RETRIES", 3))
+HTTP_CLIENT_BACKOFF_FACTOR = float(os.getenv("HTTP_CLIENT_BACKOFF_FACTOR", 0.5))
+HTTP_CLIENT_BACKOFF_JITTER = float(os.getenv("HTTP_CLIENT_BACKOFF_JITTER", 0.5))
+HTTP_CLIENT_POOL_CONNECTIONS = int(os.getenv("HTTP_CLIENT_POOL_CONNECTIONS", 20))
+HTTP_CLIENT_POOL_MAXSIZE = int(os.getenv("HTTP_CLIENT_POOL_MAXSIZE", 20))
+HTTP_CLIENT_LOG_RESPONSE_BODY = os.getenv("HTTP_CLIENT_LOG_RESPONSE_BODY", "False").lower() == "true"
+
+PERF_METRICS_ENABLED = os.getenv("PERF_METRICS_ENABLED", "True").lower() == "true"
+# Server-Timing exposes per request SQL and cache counts to clients, so it is off unless debugging
+PERF_SERVER_TIMING_ENABLED = os.getenv("PERF_SERVER_TIMING_ENABLED", "True" if DEBUG else "False").lower() == "true"
+
+API_LOG_QUEUE_SIZE = int(os.getenv("API_LOG_QUEUE_SIZE", 10000))
+API_LOG_BATCH_SIZE = int(os.getenv("API_LOG_BATCH_SIZE", 500))
+API_LOG_FLUSH_INTERVAL = float(os.getenv("API_LOG_FLUSH_INTERVAL", 1.0))
+API_LOG_HEADERS = (
+    "HTTP_USER_AGENT", "HTTP_X_FORWARDED_FOR", "HTTP_X_REQUEST_ID", "REMOTE_ADDR", "CONTENT_TYPE", "CONTENT_LENGTH",
+)
+
 CELERY_BROKER_URL = BROKER_URL
 CELERY_RESULT_BACKEND = BROKER_URL
 CELERY_BACKEND_URL = BROKER_URL
@@ -0,0 +1,90 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveAPIView
+
+from services.util import CustomApiRequestProcessorBase
+from stock.serializers.stock_serializer import (
+    PriceCandleSerializer, PriceHistorySerializer, QuoteListSerializer, StockSearchResultSerializer,
+    StockSummarySerializer,
+)
+from stock.services.candle_service import CandleService
+from stock.services.price_history_service import PriceHistoryService
+from stock.services.price_stream_service import StreamTicketService
+from stock.services.quote_service import QuoteService
+from stock.services.search_service import StockSearchService
+
+
+class StockCandlesApiView(ListAPIView, CustomApiRequestProcessorBase):
+    serializer_class = PriceCandleSerializer
+    response_serializer = PriceCandleSerializer
+    response_serializer_requires_many = True
+    wrap_response_in_data_object = True
+
+    @extend_schema(tags=["Stocks"])
+    def get(self, request, *args, **kwargs):
+        filter_params = self.get_request_filter_params("interval")
+
+        service = CandleService(request)
+        return self.process_request(
+            request, service.fetch_chart, symbol=kwargs.get("symbol"), filter_params=filter_params
+        )
+
+
+class StockHistoryApiView(RetrieveAPIView, CustomApiRequestProcessorBase):
+    serializer_class = PriceHistorySerializer
+    response_serializer = PriceHistorySerializer
+    wrap_response_in_data_object = True
+
+    @extend_schema(tags=["Stocks"])
+    def get(self, request, *args, **kwargs):
+        filter_params = self.get_request_filter_params("step")
+
+        service = PriceHistoryService(request)
+        return self.process_request(
+            request, service.fetch_history, symbol=kwargs.get("symbol"), filter_params=filter_params
+        )
+
+
+class StockSummaryApiView(RetrieveAPIView, CustomApiRequestProcessorBase):
+    serializer_class = StockSummarySerializer
+    response_serializer = StockSummarySerializer
+    wrap_response_in_data_object = True
+
+    @extend_schema(tags=["Stocks"])
+    def get(self, request, *args, **kwargs):
+        service = CandleService(request)
+        return self.process_request(request, service.fetch_summary, symbol=kwargs.get("symbol"))
+
+
+class QuoteListApiView(ListAPIView, CustomApiRequestProcessorBase):
+    serializer_class = QuoteListSerializer
+    response_serializer = QuoteListSerializer
+
+    @extend_schema(tags=["Stocks"])
+    def get(self, request, *args, **kwargs):
+        filter_params = self.get_specific_request_filter_params("symbols")
+
+        service = QuoteService(request)
+        return self.process_request(request, service.fetch_quotes_from_params, filter_params=filter_params)
+
+
+class StockSearchApiView(ListAPIView, CustomApiRequestProcessorBase):
+    serializer_class = StockSearchResultSerializer
+    response_serializer = StockSearchResultSerializer
+    response_serializer_requires_many = True
+    wrap_response_in_data_object = True
+
+    @extend_schema(tags=["Stocks"])
+    def get(self, request, *args, **kwargs):
+        filter_params = self.get_specific_request_filter_params("keyword", "limit")
+
+        service = StockSearchService(request)
+        return self.process_request(request, service.search, filter_params=filter_params)
+
+
+class StreamTicketApiView(CreateAPIView, CustomApiRequestProcessorBase):
+    wrap_response_in_data_object = True
+
+    @extend_schema(tags=["Stocks"])
+    def post(self, request, *args, **kwargs):
+        service = StreamTicketService(request)
+        return self.process_request(request, service.issue_ticket)
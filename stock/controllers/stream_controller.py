@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from account.authentication import CachedJWTAuthentication
+from account.models import User
+from services.util import DecimalEncoder
+from stock.services.price_stream_service import StreamTicketService, price_broadcaster
+from stock.services.quote_service import MAX_QUOTE_SYMBOLS, QuoteService
+
+HEARTBEAT_SECONDS = 15
+
+
+def authenticate_stream_request(request):
+    """
+    Resolves the user from the JWT of the Authorization header, or from a single use
+    `ticket` query param since browsers' EventSource cannot send headers.
+    """
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        ticket = request.GET.get("ticket")
+        user_id = StreamTicketService.redeem_ticket(ticket) if ticket else None
+        return User.available_objects.filter(pk=user_id, is_active=True).first() if user_id is not None else None
+
+    raw_token = authentication.get_raw_token(header)
+    if not raw_token:
+        return None
+
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DecimalEncoder)}\n\n"
+
+
+async def price_stream_view(request):
+    """
+    Server-Sent Events stream of price updates for `?symbols=A,B,C`.
+    Runs entirely on the event loop under ASGI, an idle client costs a queue and a coroutine.
+    """
+    user = await sync_to_async(authenticate_stream_request)(request)
+    if user is None:
+        return JsonResponse({"message": "Request authorization failed"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    symbols = list(dict.fromkeys(
+        symbol.strip().upper() for symbol in request.GET.get("symbols", "").split(",") if symbol.strip()
+    ))
+    if not symbols or len(symbols) > MAX_QUOTE_SYMBOLS:
+        return JsonResponse(
+            {"message": f"Provide between 1 and {MAX_QUOTE_SYMBOLS} symbols"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    snapshot, _ = await sync_to_async(QuoteService(request).fetch_quotes)(symbols)
+    client = price_broadcaster.subscribe(symbols)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            for quote in (snapshot or {}).get("data", []):
+                yield format_event("price", quote)
+
+            while True:
+                try:
+                    quote = await asyncio.wait_for(client.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield format_event("price", quote)
+        finally:
+            price_broadcaster.unsubscribe(client)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
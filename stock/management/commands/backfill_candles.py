@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.models import PriceCandle, Stock, StockTracker
+from stock.services.candle_service import CandleService
+
+
+class Command(BaseCommand):
+    help = "Rebuild the 1m/1h/1d price candles from existing StockTracker ticks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--symbol", default=None, help="Only rebuild candles of this stock")
+        parser.add_argument("--chunk-size", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size must be positive")
+
+        ticks = StockTracker.available_objects.all()
+        candles = PriceCandle.objects.all()
+
+        symbol = options["symbol"]
+        if symbol:
+            stock_id = Stock.available_objects.filter(symbol__iexact=symbol).values_list("id", flat=True).first()
+            if stock_id is None:
+                raise CommandError(f"Stock with symbol '{symbol}' not found")
+            ticks = ticks.filter(stock_id=stock_id)
+            candles = candles.filter(stock_id=stock_id)
+
+        # Candles are merged additively, so the scope is rebuilt from scratch
+        deleted, _ = candles.delete()
+        self.stdout.write(f"Removed {deleted} existing candles")
+
+        service = CandleService(None)
+        last_id, processed = 0, 0
+        while True:
+            chunk = list(
+                ticks.filter(id__gt=last_id).order_by("id").values_list("id", "stock_id", "price", "created_at")[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            service.merge_ticks((stock_id, price, created_at) for _, stock_id, price, created_at in chunk)
+
+            last_id = chunk[-1][0]
+            processed += len(chunk)
+            self.stdout.write(f"{processed} ticks processed")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled candles from {processed} ticks"))
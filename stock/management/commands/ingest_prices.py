@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.services.price_ingest_service import DEFAULT_BATCH_SIZE, PriceIngestService
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV/JSONL dump of price ticks (symbol, price, timestamp) into StockTracker"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", dest="file_format", choices=["csv", "jsonl"], default=None)
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--progress-every", type=int, default=20, help="Report progress every N batches")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        progress_every = max(options["progress_every"], 1)
+
+        def report_progress(stats):
+            if stats.batches % progress_every == 0:
+                self.stdout.write(
+                    f"{stats.accepted} rows ingested, {stats.rejected} rejected "
+                    f"({stats.rows_per_second:.0f} rows/s)"
+                )
+
+        stats, error = PriceIngestService(None).ingest_file(
+            options["path"], file_format=options["file_format"], batch_size=batch_size,
+            progress_callback=report_progress
+        )
+        if error:
+            raise CommandError(error.get_message())
+
+        summary = stats.as_dict()
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {summary['accepted']} rows, rejected {summary['rejected']} "
+            f"in {summary['elapsed_seconds']}s ({summary['rows_per_second']} rows/s)"
+        ))
+        for reason, count in summary["rejections"].items():
+            self.stdout.write(f"  {reason}: {count}")
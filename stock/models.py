@@ -1,6 +1,6 @@
 from django.db import models
 
-from crm.models import BaseModel
+from crm.models import AppDbModel, BaseModel
 
 class Stock(BaseModel):
     symbol = models.CharField(max_length=10, unique=True)
@@ -9,9 +9,24 @@ class Stock(BaseModel):
     def __str__(self):
         return self.symbol
 
+class FrequencyDurationType(models.TextChoices):
+    minutes = "minutes"
+    hours = "hours"
+    days = "days"
+    weeks = "weeks"
+
+
+FREQUENCY_DURATION_SECONDS = {
+    FrequencyDurationType.minutes: 60,
+    FrequencyDurationType.hours: 60 * 60,
+    FrequencyDurationType.days: 60 * 60 * 24,
+    FrequencyDurationType.weeks: 60 * 60 * 24 * 7,
+}
+
+
 class Frequency(BaseModel):
     duration = models.IntegerField()
-    duration_type = models.CharField(max_length=255)
+    duration_type = models.CharField(max_length=255, choices=FrequencyDurationType.choices)
 
 
 class Subscription(BaseModel):
@@ -19,6 +34,12 @@ class Subscription(BaseModel):
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
     frequency = models.ManyToManyField("Frequency")
     active = models.BooleanField(default=False)
+    next_due_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["active", "next_due_at"], name="subscription_due_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.stock.symbol}"
@@ -32,15 +53,62 @@ class Alert(BaseModel):
         return f"{self.user.email}'s alert for {self.stock.symbol}"
 
 
+class TriggerDirection(models.TextChoices):
+    above = "above"
+    below = "below"
+
+
 class Trigger(BaseModel):
     alert = models.ForeignKey("Alert", on_delete=models.CASCADE)
     threshold_price = models.DecimalField(max_digits=10, decimal_places=2)
+    direction = models.CharField(max_length=10, choices=TriggerDirection.choices, default=TriggerDirection.above)
     triggered = models.BooleanField(default=False)
     triggered_at = models.DateTimeField(null=True, blank=True)
     notification_sent = models.BooleanField(default=False)
+    # last price seen on the far side of the threshold, the trigger fires once the price crosses back
+    reference_price = models.DecimalField(max_digits=20, decimal_places=3, null=True, blank=True)
 
 
 
 class StockTracker(BaseModel):
     stock = models.ForeignKey("Stock", on_delete=models.CASCADE)
-    price = models.DecimalField(default=0, max_digits=20, decimal_places=3)
\ No newline at end of file
+    price = models.DecimalField(default=0, max_digits=20, decimal_places=3)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["stock", "-created_at"], name="stock_tracker_latest_idx"),
+        ]
+
+
+class CandleResolution(models.TextChoices):
+    minute = "1m"
+    hour = "1h"
+    day = "1d"
+
+
+CANDLE_RESOLUTION_SECONDS = {
+    CandleResolution.minute: 60,
+    CandleResolution.hour: 60 * 60,
+    CandleResolution.day: 60 * 60 * 24,
+}
+
+
+class PriceCandle(AppDbModel):
+    stock = models.ForeignKey("Stock", on_delete=models.CASCADE, related_name="candles")
+    resolution = models.CharField(max_length=5, choices=CandleResolution.choices)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=20, decimal_places=3)
+    high = models.DecimalField(max_digits=20, decimal_places=3)
+    low = models.DecimalField(max_digits=20, decimal_places=3)
+    close = models.DecimalField(max_digits=20, decimal_places=3)
+    count = models.PositiveIntegerField(default=0)
+    opened_at = models.DateTimeField()
+    closed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["stock", "resolution", "bucket_start"], name="unique_price_candle_bucket")
+        ]
+
+    def __str__(self):
+        return f"{self.stock_id} {self.resolution} {self.bucket_start}"
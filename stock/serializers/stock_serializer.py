@@ -39,3 +39,50 @@ class UpdateStockSerializer(serializers.Serializer):
             data["symbol"] = data.get('symbol').strip()
 
         return data
+
+
+class PriceCandleSerializer(serializers.Serializer):
+    time = serializers.DateTimeField()
+    open = serializers.DecimalField(max_digits=20, decimal_places=3)
+    high = serializers.DecimalField(max_digits=20, decimal_places=3)
+    low = serializers.DecimalField(max_digits=20, decimal_places=3)
+    close = serializers.DecimalField(max_digits=20, decimal_places=3)
+    count = serializers.IntegerField()
+
+
+class StockSummarySerializer(serializers.Serializer):
+    symbol = serializers.CharField()
+    name = serializers.CharField()
+    last_price = serializers.DecimalField(max_digits=20, decimal_places=3, allow_null=True)
+    open = serializers.DecimalField(max_digits=20, decimal_places=3, required=False)
+    high = serializers.DecimalField(max_digits=20, decimal_places=3, required=False)
+    low = serializers.DecimalField(max_digits=20, decimal_places=3, required=False)
+    close = serializers.DecimalField(max_digits=20, decimal_places=3, required=False)
+    count = serializers.IntegerField(required=False)
+
+
+class PriceHistorySerializer(serializers.Serializer):
+    symbol = serializers.CharField()
+    step = serializers.IntegerField(allow_null=True)
+    points = serializers.SerializerMethodField()
+
+    def get_points(self, price_history):
+        return price_history.to_list()
+
+
+class QuoteSerializer(serializers.Serializer):
+    symbol = serializers.CharField()
+    price = serializers.DecimalField(max_digits=20, decimal_places=3)
+    priced_at = serializers.DateTimeField()
+
+
+class QuoteListSerializer(serializers.Serializer):
+    data = QuoteSerializer(many=True)
+    missing = serializers.ListField(child=serializers.CharField())
+
+
+class StockSearchResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    symbol = serializers.CharField()
+    name = serializers.CharField()
+    score = serializers.FloatField()
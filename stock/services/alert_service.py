@@ -0,0 +1,245 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from operator import itemgetter
+
+from django.db import transaction
+from django.utils import timezone
+
+from crm.services.notification_service import NotificationService
+from services.cache_util import CacheUtil
+from services.log import AppLogger
+from services.util import CustomAPIRequestUtil
+from stock.models import Trigger, TriggerDirection
+
+threshold_of = itemgetter(0)
+
+
+class StockTriggerIndex:
+    """
+    Untriggered thresholds of a single stock, kept as sorted (threshold, trigger_id) lists.
+    Triggers fire when the price crosses their threshold: an "above" trigger is armed while
+    the price it last saw was under the threshold and fires once the price reaches it, a
+    "below" trigger the other way round. Armed triggers crossed by a price are always a
+    prefix/suffix of their list, and so are the waiting triggers a price arms.
+    """
+
+    def __init__(self):
+        self.above = []
+        self.below = []
+        self.waiting_above = []
+        self.waiting_below = []
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, trigger_id, direction, threshold, reference_price=None):
+        self.remove(trigger_id)
+
+        if reference_price is None:
+            armed = True
+        elif direction == TriggerDirection.below:
+            armed = reference_price > threshold
+        else:
+            armed = reference_price < threshold
+
+        insort(self.__get_entries(direction, armed), (threshold, trigger_id))
+        self.entries[trigger_id] = (direction, threshold, armed)
+
+    def remove(self, trigger_id):
+        existing = self.entries.pop(trigger_id, None)
+        if existing is None:
+            return
+
+        direction, threshold, armed = existing
+        entries = self.__get_entries(direction, armed)
+        index = bisect_left(entries, (threshold, trigger_id))
+        if index < len(entries) and entries[index] == (threshold, trigger_id):
+            del entries[index]
+
+    def pop_crossed(self, low, high):
+        above_index = bisect_right(self.above, high, key=threshold_of)
+        below_index = bisect_left(self.below, low, key=threshold_of)
+
+        crossed = [trigger_id for _, trigger_id in self.above[:above_index]]
+        crossed.extend(trigger_id for _, trigger_id in self.below[below_index:])
+
+        del self.above[:above_index]
+        del self.below[below_index:]
+        for trigger_id in crossed:
+            self.entries.pop(trigger_id, None)
+
+        return crossed
+
+    def arm(self, low, high):
+        """Arms the waiting triggers that prices within [low, high] are on the far side of"""
+        above_index = bisect_right(self.waiting_above, low, key=threshold_of)
+        below_index = bisect_left(self.waiting_below, high, key=threshold_of)
+
+        armed = [(trigger_id, low) for _, trigger_id in self.waiting_above[above_index:]]
+        armed.extend((trigger_id, high) for _, trigger_id in self.waiting_below[:below_index])
+
+        for entry in self.waiting_above[above_index:]:
+            insort(self.above, entry)
+        for entry in self.waiting_below[:below_index]:
+            insort(self.below, entry)
+
+        del self.waiting_above[above_index:]
+        del self.waiting_below[:below_index]
+        for trigger_id, _ in armed:
+            direction, threshold, _ = self.entries[trigger_id]
+            self.entries[trigger_id] = (direction, threshold, True)
+
+        return armed
+
+    def __get_entries(self, direction, armed):
+        if direction == TriggerDirection.below:
+            return self.below if armed else self.waiting_below
+        return self.above if armed else self.waiting_above
+
+
+class TriggerIndex:
+    """
+    Process local index of untriggered triggers per stock, loaded lazily from the database.
+    Triggers change in the web workers while ticks are evaluated by the ingest process, so
+    every change bumps a per stock cache tag and `refresh` drops the stock indexes whose
+    tag moved since they were loaded.
+    """
+
+    def __init__(self):
+        self._stocks = {}
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    def evaluate(self, stock_id, low, high=None):
+        """
+        Removes and returns the ids of triggers crossed by prices within [low, high], along with
+        the (trigger_id, price) pairs of the triggers those prices armed. Triggers armed by a
+        range only fire on a later one, since the order of the prices within it is unknown.
+        """
+        if high is None:
+            high = low
+
+        with self._lock:
+            stock_index = self.__get_stock_index(stock_id)
+            return stock_index.pop_crossed(low, high), stock_index.arm(low, high)
+
+    def refresh(self, stock_ids):
+        """Reads the tag of every stock in one MGET; without them the indexes are reloaded"""
+        stock_ids = list(stock_ids)
+        try:
+            versions = CacheUtil.get_tag_versions(*(trigger_index_tag(stock_id) for stock_id in stock_ids))
+        except Exception as e:
+            AppLogger.report(e)
+            versions = [None] * len(stock_ids)
+
+        with self._lock:
+            for stock_id, version in zip(stock_ids, versions):
+                if version is None or self._versions.get(stock_id) != version:
+                    self._stocks.pop(stock_id, None)
+                    self._versions[stock_id] = version
+
+    def invalidate(self, stock_id):
+        """Called when a trigger or alert of `stock_id` changed, in any process"""
+        with self._lock:
+            self._stocks.pop(stock_id, None)
+
+        try:
+            CacheUtil.invalidate_tags(trigger_index_tag(stock_id))
+        except Exception as e:
+            AppLogger.report(e)
+
+    def discard(self, stock_id=None):
+        with self._lock:
+            if stock_id is None:
+                self._stocks.clear()
+                self._versions.clear()
+            else:
+                self._stocks.pop(stock_id, None)
+                self._versions.pop(stock_id, None)
+
+    def __get_stock_index(self, stock_id):
+        stock_index = self._stocks.get(stock_id)
+        if stock_index is None:
+            stock_index = StockTriggerIndex()
+            for trigger_id, direction, threshold, reference_price in get_pending_triggers_query(stock_id).values_list(
+                    "id", "direction", "threshold_price", "reference_price"
+            ):
+                stock_index.add(trigger_id, direction, threshold, reference_price)
+
+            self._stocks[stock_id] = stock_index
+
+        return stock_index
+
+
+def trigger_index_tag(stock_id):
+    return f"triggers:{stock_id}"
+
+
+def get_pending_triggers_query(stock_id):
+    return Trigger.available_objects.filter(
+        alert__stock_id=stock_id, alert__deleted_at__isnull=True, triggered=False
+    )
+
+
+trigger_index = TriggerIndex()
+
+
+class AlertService(CustomAPIRequestUtil):
+
+    def evaluate_price(self, stock_id, low, high=None):
+        return self.evaluate_prices({stock_id: (low, low if high is None else high)})
+
+    def evaluate_prices(self, price_ranges):
+        """
+        Fires every trigger crossed by the given {stock_id: (low, high)} price ranges
+        with a single bulk update and returns the fired trigger ids.
+        """
+        trigger_index.refresh(price_ranges)
+
+        crossed = []
+        for stock_id, (low, high) in price_ranges.items():
+            stock_crossed, stock_armed = trigger_index.evaluate(stock_id, low, high)
+            crossed.extend(stock_crossed)
+            if stock_armed:
+                self.__save_armed(stock_id, stock_armed)
+
+        if not crossed:
+            return []
+
+        now = timezone.now()
+        with transaction.atomic():
+            fired = list(
+                Trigger.objects.select_for_update(of=("self",)).filter(
+                    pk__in=crossed, triggered=False, deleted_at__isnull=True, alert__deleted_at__isnull=True
+                ).values_list(
+                    "id", "alert__user_id", "alert__stock__symbol", "threshold_price", "direction"
+                )
+            )
+            if not fired:
+                return []
+
+            fired_ids = [trigger_id for trigger_id, *_ in fired]
+            Trigger.objects.filter(pk__in=fired_ids).update(
+                triggered=True, triggered_at=now, notification_sent=True, updated_at=now
+            )
+
+            NotificationService(self.request).queue_many(
+                (user_id, f"{symbol} price alert", f"{symbol} has moved {direction} your alert price of {threshold}.")
+                for _, user_id, symbol, threshold, direction in fired
+            )
+
+        return fired_ids
+
+    @staticmethod
+    def __save_armed(stock_id, armed):
+        """Persists the price that armed triggers, so indexes reloaded by any process keep them armed"""
+        trigger_ids_by_price = defaultdict(list)
+        for trigger_id, price in armed:
+            trigger_ids_by_price[price].append(trigger_id)
+
+        for price, trigger_ids in trigger_ids_by_price.items():
+            Trigger.objects.filter(pk__in=trigger_ids).update(reference_price=price)
+
+        transaction.on_commit(lambda: trigger_index.invalidate(stock_id))
@@ -0,0 +1,221 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from services.util import CustomAPIRequestUtil, format_date
+from stock.models import CANDLE_RESOLUTION_SECONDS, CandleResolution, PriceCandle, Stock
+
+CANDLE_FIELDS = ["open", "high", "low", "close", "count", "opened_at", "closed_at"]
+INTERVAL_UNITS = {"m": 60, "h": 60 * 60, "d": 60 * 60 * 24, "w": 60 * 60 * 24 * 7}
+DEFAULT_CHART_POINTS = 500
+MAX_CHART_POINTS = 5000
+PERSIST_ATTEMPTS = 3
+
+
+def floor_to_bucket(created_at, seconds):
+    epoch = int(created_at.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+def parse_interval(interval):
+    """Parses intervals such as "15m", "4h" or "1d" into seconds"""
+    interval = (interval or "").strip().lower()
+    unit = INTERVAL_UNITS.get(interval[-1:])
+    if not unit or not interval[:-1].isdigit() or int(interval[:-1]) <= 0:
+        return None
+    return int(interval[:-1]) * unit
+
+
+def pick_resolution(seconds):
+    """Coarsest stored resolution whose buckets tile the requested interval"""
+    candidates = [
+        (resolution_seconds, resolution)
+        for resolution, resolution_seconds in CANDLE_RESOLUTION_SECONDS.items()
+        if resolution_seconds <= seconds and seconds % resolution_seconds == 0
+    ]
+    return max(candidates)[1] if candidates else CandleResolution.minute
+
+
+class Candle:
+    __slots__ = ["open", "high", "low", "close", "count", "opened_at", "closed_at"]
+
+    def __init__(self, open, high, low, close, count, opened_at, closed_at):
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.count = count
+        self.opened_at = opened_at
+        self.closed_at = closed_at
+
+    @classmethod
+    def from_tick(cls, price, created_at):
+        return cls(price, price, price, price, 1, created_at, created_at)
+
+    def merge(self, other):
+        """Merges another candle of the same bucket, order independent"""
+        if other.opened_at < self.opened_at:
+            self.open, self.opened_at = other.open, other.opened_at
+        if other.closed_at >= self.closed_at:
+            self.close, self.closed_at = other.close, other.closed_at
+
+        self.high = max(self.high, other.high)
+        self.low = min(self.low, other.low)
+        self.count += other.count
+        return self
+
+
+class CandleService(CustomAPIRequestUtil):
+
+    def merge_ticks(self, ticks):
+        """
+        Folds (stock_id, price, created_at) ticks into the open 1m/1h/1d buckets.
+        Ticks are aggregated in memory first, so each call costs one read and at most
+        one bulk update and one bulk insert regardless of the number of ticks.
+        When a concurrent ingest inserts one of the buckets first, the whole merge is retried.
+        """
+        partials = {}
+        for stock_id, price, created_at in ticks:
+            for resolution, seconds in CANDLE_RESOLUTION_SECONDS.items():
+                key = (stock_id, resolution, floor_to_bucket(created_at, seconds))
+                existing = partials.get(key)
+                if existing is None:
+                    partials[key] = Candle.from_tick(price, created_at)
+                else:
+                    existing.merge(Candle.from_tick(price, created_at))
+
+        if not partials:
+            return 0
+
+        for attempt in range(1, PERSIST_ATTEMPTS + 1):
+            try:
+                # __persist consumes the dict it is given
+                self.__persist(dict(partials))
+                return len(partials)
+            except IntegrityError:
+                # the unique bucket constraint, the next read sees the other ingest's row and merges into it
+                if attempt == PERSIST_ATTEMPTS:
+                    raise
+
+    def __persist(self, partials):
+        buckets = {}
+        for stock_id, resolution, bucket_start in partials:
+            buckets.setdefault((stock_id, resolution), []).append(bucket_start)
+
+        query = reduce(or_, (
+            Q(stock_id=stock_id, resolution=resolution, bucket_start__in=bucket_starts)
+            for (stock_id, resolution), bucket_starts in buckets.items()
+        ))
+
+        with transaction.atomic():
+            existing_candles = PriceCandle.objects.select_for_update().filter(query)
+
+            updated = []
+            for candle in existing_candles:
+                partial = partials.pop((candle.stock_id, candle.resolution, candle.bucket_start), None)
+                if partial is None:
+                    continue
+
+                merged = Candle(*(getattr(candle, field) for field in CANDLE_FIELDS)).merge(partial)
+                for field in CANDLE_FIELDS:
+                    setattr(candle, field, getattr(merged, field))
+                updated.append(candle)
+
+            if updated:
+                PriceCandle.objects.bulk_update(updated, CANDLE_FIELDS)
+
+            if partials:
+                PriceCandle.objects.bulk_create([
+                    PriceCandle(
+                        stock_id=stock_id, resolution=resolution, bucket_start=bucket_start,
+                        **{field: getattr(partial, field) for field in CANDLE_FIELDS}
+                    )
+                    for (stock_id, resolution, bucket_start), partial in partials.items()
+                ])
+
+    def fetch_candles(self, stock_id, interval_seconds, start, end):
+        resolution = pick_resolution(interval_seconds)
+        rows = PriceCandle.objects.filter(
+            stock_id=stock_id, resolution=resolution, bucket_start__gte=start, bucket_start__lt=end
+        ).order_by("bucket_start").values_list("bucket_start", *CANDLE_FIELDS)
+
+        if CANDLE_RESOLUTION_SECONDS[resolution] == interval_seconds:
+            return [self.__to_dict(bucket_start, Candle(*values)) for bucket_start, *values in rows]
+
+        candles = []
+        current_bucket, current = None, None
+        for bucket_start, *values in rows.iterator():
+            bucket = floor_to_bucket(bucket_start, interval_seconds)
+            if bucket != current_bucket:
+                if current is not None:
+                    candles.append(self.__to_dict(current_bucket, current))
+                current_bucket, current = bucket, Candle(*values)
+            else:
+                current.merge(Candle(*values))
+
+        if current is not None:
+            candles.append(self.__to_dict(current_bucket, current))
+
+        return candles
+
+    def fetch_chart(self, symbol, filter_params):
+        stock, error = self.__find_stock(symbol)
+        if error:
+            return None, error
+
+        interval_seconds = parse_interval(filter_params.get("interval") or CandleResolution.day)
+        if not interval_seconds:
+            return None, self.make_error("Invalid interval, use values such as 1m, 15m, 1h, 4h, 1d or 1w")
+
+        end = format_date(filter_params.get("to_date")) if filter_params.get("to_date") else None
+        end = end + timedelta(days=1) if end else timezone.now()
+
+        start = format_date(filter_params.get("from_date")) if filter_params.get("from_date") else None
+        start = start or end - timedelta(seconds=interval_seconds * DEFAULT_CHART_POINTS)
+
+        if start >= end:
+            return None, self.make_error("from_date must be before to_date")
+
+        if (end - start).total_seconds() / interval_seconds > MAX_CHART_POINTS:
+            return None, self.make_error(f"Requested range exceeds {MAX_CHART_POINTS} candles, use a larger interval")
+
+        return self.fetch_candles(stock.id, interval_seconds, start, end), None
+
+    def fetch_summary(self, symbol):
+        stock, error = self.__find_stock(symbol)
+        if error:
+            return None, error
+
+        seconds = CANDLE_RESOLUTION_SECONDS[CandleResolution.day]
+        day_start = floor_to_bucket(timezone.now(), seconds)
+
+        candles = self.fetch_candles(stock.id, seconds, day_start, day_start + timedelta(seconds=seconds))
+        latest = PriceCandle.objects.filter(
+            stock_id=stock.id, resolution=CandleResolution.day
+        ).order_by("-bucket_start").values_list("close", flat=True).first()
+
+        summary = candles[0] if candles else {}
+        summary.update({"symbol": stock.symbol, "name": stock.name, "last_price": latest})
+
+        return summary, None
+
+    def __find_stock(self, symbol):
+        stock = Stock.available_objects.filter(symbol__iexact=symbol).only("id", "symbol", "name").first()
+        if not stock:
+            return None, self.make_404(f"Stock with symbol '{symbol}' not found")
+        return stock, None
+
+    @staticmethod
+    def __to_dict(bucket_start, candle):
+        return {
+            "time": bucket_start,
+            "open": candle.open,
+            "high": candle.high,
+            "low": candle.low,
+            "close": candle.close,
+            "count": candle.count,
+        }
@@ -0,0 +1,311 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+
+from services.util import CustomAPIRequestUtil, format_date
+from stock.models import Stock, StockTracker
+
+SEGMENT_SIZE = 4096
+LOAD_CHUNK_SIZE = 10000
+SYNC_INTERVAL_SECONDS = 1
+# rows may commit out of created_at (and id) order, every sync re-reads this much of the tail
+SYNC_OVERLAP_SECONDS = 60
+# full reload, for rows committed later than the overlap
+RELOAD_INTERVAL_SECONDS = 60 * 10
+MAX_SERIES = 256
+
+
+def from_epoch_ms(value):
+    return datetime.fromtimestamp(value / 1000, tz=dt_timezone.utc)
+
+
+def to_epoch_ms(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+
+class PriceSegment:
+    """
+    Fixed capacity block of (timestamp, price) pairs.
+    Both arrays are allocated up front and filled in place, so views handed out to
+    readers never block appends (an array exporting a buffer cannot be resized).
+    """
+    __slots__ = ("timestamps", "prices", "length")
+
+    def __init__(self, size):
+        self.timestamps = array("q", bytes(8 * size))
+        self.prices = array("d", bytes(8 * size))
+        self.length = 0
+
+    @property
+    def is_full(self):
+        return self.length == len(self.timestamps)
+
+    @property
+    def first_timestamp(self):
+        return self.timestamps[0]
+
+    @property
+    def last_timestamp(self):
+        return self.timestamps[self.length - 1]
+
+    def append(self, timestamp, price):
+        self.timestamps[self.length] = timestamp
+        self.prices[self.length] = price
+        self.length += 1
+
+    def view(self, start=None, end=None):
+        """Zero-copy views over the points with start <= timestamp < end"""
+        timestamps = memoryview(self.timestamps)[:self.length]
+        lo = 0 if start is None else bisect_left(timestamps, start)
+        hi = self.length if end is None else bisect_left(timestamps, end)
+        return timestamps[lo:hi], memoryview(self.prices)[lo:hi]
+
+
+class PriceSeries:
+
+    def __init__(self, segment_size=SEGMENT_SIZE, stock_id=None):
+        self.segment_size = segment_size
+        self.stock_id = stock_id
+        self.segments = []
+        self.segment_starts = []
+        # catch up state, see PriceHistoryStore.get_series: the newest row, the rows within the
+        # sync overlap of the tail by id, and when the series was last synced and fully loaded
+        self.last_id = 0
+        self.recent_ids = {}
+        self.synced_at = 0.0
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return sum(segment.length for segment in self.segments)
+
+    @property
+    def last_timestamp(self):
+        return self.segments[-1].last_timestamp if self.segments else None
+
+    def forget_recent_before(self, timestamp):
+        self.recent_ids = {row_id: value for row_id, value in self.recent_ids.items() if value >= timestamp}
+
+    def append(self, timestamp, price):
+        """
+        Appends a point to the tail of the series.
+        Returns False when the point is older than the tail, the series must then be reloaded.
+        """
+        if self.segments and timestamp < self.segments[-1].last_timestamp:
+            return False
+
+        if not self.segments or self.segments[-1].is_full:
+            self.segments.append(PriceSegment(self.segment_size))
+            self.segment_starts.append(timestamp)
+
+        self.segments[-1].append(timestamp, float(price))
+        return True
+
+    def views(self, start=None, end=None):
+        if not self.segments:
+            return []
+
+        first = 0 if start is None else max(bisect_right(self.segment_starts, start) - 1, 0)
+        last = len(self.segments) if end is None else bisect_left(self.segment_starts, end)
+
+        return [
+            view for view in (segment.view(start, end) for segment in self.segments[first:last])
+            if len(view[0])
+        ]
+
+
+class PriceHistory:
+    """
+    Result of a history query.
+    `timestamps` (epoch milliseconds, int64) and `prices` (float64) support the buffer protocol,
+    so `numpy.frombuffer` wraps them without copying.
+    """
+
+    def __init__(self, symbol, timestamps, prices, step=None):
+        self.symbol = symbol
+        self.timestamps = timestamps
+        self.prices = prices
+        self.step = step
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def to_list(self):
+        return [[timestamp, price] for timestamp, price in zip(self.timestamps, self.prices)]
+
+
+class PriceHistoryStore:
+    """
+    Process local, lazily loaded per symbol price history, keeping the `max_series` most
+    recently read symbols. StockTracker remains the write of record, this is a read model
+    rebuilt from it on demand.
+    Ticks are ingested by other processes, so before a series is read, at most every
+    `sync_interval` seconds, it catches up on rows with a newer id or created within
+    `sync_overlap` of its tail, since rows do not commit in id order. A row older than the
+    tail drops the series, and every series is reloaded after `reload_interval` seconds.
+    """
+
+    def __init__(self, segment_size=SEGMENT_SIZE, sync_interval=SYNC_INTERVAL_SECONDS,
+                 sync_overlap=SYNC_OVERLAP_SECONDS, reload_interval=RELOAD_INTERVAL_SECONDS, max_series=None):
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+        self.sync_overlap_ms = int(sync_overlap * 1000)
+        self.reload_interval = reload_interval
+        if max_series is None:
+            max_series = getattr(settings, "PRICE_HISTORY_MAX_SERIES", MAX_SERIES)
+        self.max_series = max_series
+        self._series = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get_series(self, symbol):
+        key = symbol.upper()
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+                now = time.monotonic()
+                if now - series.loaded_at >= self.reload_interval:
+                    del self._series[key]
+                    series = None
+                elif now - series.synced_at >= self.sync_interval:
+                    series = self.__sync(key, series)
+
+            if series is None:
+                series = self.__load(key)
+                if series is not None:
+                    self._series[key] = series
+                    while len(self._series) > self.max_series:
+                        self._series.popitem(last=False)
+        return series
+
+    def discard(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._series.clear()
+            else:
+                self._series.pop(symbol.upper(), None)
+
+    def history(self, symbol, start=None, end=None, step=None):
+        series = self.get_series(symbol)
+        if series is None:
+            return None
+
+        start, end = to_epoch_ms(start), to_epoch_ms(end)
+        views = series.views(start, end)
+
+        if len(views) == 1:
+            timestamps, prices = views[0]
+        else:
+            timestamps, prices = array("q"), array("d")
+            for timestamp_view, price_view in views:
+                timestamps.frombytes(timestamp_view.cast("B"))
+                prices.frombytes(price_view.cast("B"))
+
+        if step:
+            timestamps, prices = self.__downsample(timestamps, prices, int(step * 1000))
+
+        return PriceHistory(symbol.upper(), timestamps, prices, step=step)
+
+    @staticmethod
+    def __downsample(timestamps, prices, step_ms):
+        """Keeps the last point of every `step_ms` bucket, jumping between buckets with a binary search"""
+        sampled_timestamps, sampled_prices = array("q"), array("d")
+        total = len(timestamps)
+
+        index = 0
+        while index < total:
+            bucket_end = (timestamps[index] // step_ms + 1) * step_ms
+            last = bisect_left(timestamps, bucket_end, lo=index) - 1
+
+            sampled_timestamps.append(timestamps[last])
+            sampled_prices.append(prices[last])
+            index = last + 1
+
+        return sampled_timestamps, sampled_prices
+
+    def __load(self, symbol):
+        stock_id = Stock.available_objects.filter(symbol__iexact=symbol).values_list("id", flat=True).first()
+        if stock_id is None:
+            return None
+
+        series = PriceSeries(self.segment_size, stock_id=stock_id)
+        rows = StockTracker.available_objects.filter(stock_id=stock_id).order_by(
+            "created_at", "id"
+        ).values_list("id", "created_at", "price").iterator(chunk_size=LOAD_CHUNK_SIZE)
+
+        self.__append_rows(series, rows)
+        return series
+
+    def __sync(self, symbol, series):
+        """Appends the rows inserted since the last sync, or drops the series when one lands before its tail"""
+        query = Q(id__gt=series.last_id)
+        if series.last_timestamp is not None:
+            query |= Q(created_at__gte=from_epoch_ms(series.last_timestamp - self.sync_overlap_ms))
+
+        rows = StockTracker.available_objects.filter(query, stock_id=series.stock_id).order_by(
+            "created_at", "id"
+        ).values_list("id", "created_at", "price")
+
+        if not self.__append_rows(series, (row for row in rows if row[0] not in series.recent_ids)):
+            self._series.pop(symbol, None)
+            return None
+
+        return series
+
+    def __append_rows(self, series, rows):
+        for count, (row_id, created_at, price) in enumerate(rows, 1):
+            timestamp = to_epoch_ms(created_at)
+            if not series.append(timestamp, price):
+                return False
+
+            series.last_id = max(series.last_id, row_id)
+            series.recent_ids[row_id] = timestamp
+            if count % LOAD_CHUNK_SIZE == 0:
+                series.forget_recent_before(timestamp - self.sync_overlap_ms)
+
+        if series.last_timestamp is not None:
+            series.forget_recent_before(series.last_timestamp - self.sync_overlap_ms)
+        series.synced_at = time.monotonic()
+        return True
+
+
+price_history_store = PriceHistoryStore()
+
+
+class PriceHistoryService(CustomAPIRequestUtil):
+
+    def fetch_history(self, symbol, filter_params):
+        """Days from `from_date` to `to_date` inclusive, optionally one point per `step` seconds"""
+        start = format_date(filter_params.get("from_date")) if filter_params.get("from_date") else None
+        end = format_date(filter_params.get("to_date")) if filter_params.get("to_date") else None
+        end = end + timedelta(days=1) if end else None
+
+        step = filter_params.get("step") or None
+        if step is not None:
+            if not str(step).isdigit() or int(step) == 0:
+                return None, self.make_error("step must be a positive number of seconds")
+            step = int(step)
+
+        if start and end and start >= end:
+            return None, self.make_error("from_date must be before to_date")
+
+        return self.history(symbol, start=start, end=end, step=step)
+
+    def history(self, symbol, start=None, end=None, step=None):
+        if not symbol:
+            return None, self.make_error("Stock symbol is required")
+
+        price_history = price_history_store.history(symbol, start=start, end=end, step=step)
+        if price_history is None:
+            return None, self.make_404(f"Stock with symbol '{symbol}' not found")
+
+        return price_history, None
@@ -0,0 +1,250 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from services.util import CustomAPIRequestUtil
+from stock.models import Stock, StockTracker
+from stock.services.alert_service import AlertService
+from stock.services.candle_service import CandleService
+from stock.services.price_stream_service import publish_quotes
+from stock.services.quote_service import QuoteService
+
+DEFAULT_BATCH_SIZE = 5000
+PRICE_QUANTUM = Decimal("0.001")
+MAX_PRICE = Decimal(10) ** 17
+
+FILE_FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "jsonl",
+}
+
+
+class RejectionReason:
+    malformed_row = "malformed_row"
+    unknown_symbol = "unknown_symbol"
+    invalid_price = "invalid_price"
+    invalid_timestamp = "invalid_timestamp"
+
+
+class IngestStats:
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.rejections = Counter()
+        self.started_at = time.monotonic()
+
+    def reject(self, reason):
+        self.rejected += 1
+        self.rejections[reason] += 1
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        return (self.accepted + self.rejected) / elapsed if elapsed > 0 else 0
+
+    def as_dict(self):
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "rejections": dict(self.rejections),
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+class PriceIngestService(CustomAPIRequestUtil):
+    """
+    Streams price ticks into StockTracker.
+    Rows flow through parse -> resolve -> validate -> batch generators, so memory is bounded
+    by `batch_size` regardless of the input size.
+    A tick is a (stock_id, symbol, price, created_at) tuple.
+    """
+
+    def ingest_file(self, path, file_format=None, batch_size=DEFAULT_BATCH_SIZE, progress_callback=None):
+        if not file_format:
+            file_format = FILE_FORMATS.get(os.path.splitext(path)[1].lower())
+
+        if file_format not in FILE_FORMATS.values():
+            return None, self.make_error(f"Unsupported file format for '{path}'")
+
+        try:
+            with open(path, newline="", encoding="utf-8") as file:
+                rows = self.__read_csv(file) if file_format == "csv" else self.__read_jsonl(file)
+                stats = self.ingest_rows(rows, batch_size=batch_size, progress_callback=progress_callback)
+        except OSError as e:
+            return None, self.make_error(f"Unable to read '{path}': {e}")
+
+        return stats, None
+
+    def ingest_rows(self, rows, batch_size=DEFAULT_BATCH_SIZE, progress_callback=None):
+        stats = IngestStats()
+        symbol_map = self.__load_symbol_map()
+
+        ticks = self.__validate(self.__resolve(rows, symbol_map, stats), stats)
+        for batch in self.__batched(ticks, batch_size):
+            self.insert_ticks(batch)
+            stats.accepted += len(batch)
+            stats.batches += 1
+
+            if progress_callback:
+                progress_callback(stats)
+
+        return stats
+
+    def record_tick(self, symbol, price, created_at=None):
+        stock_id = Stock.available_objects.filter(symbol__iexact=symbol).values_list("id", flat=True).first()
+        if stock_id is None:
+            return None, self.make_404(f"Stock with symbol '{symbol}' not found")
+
+        stats = IngestStats()
+        ticks = list(self.__validate([(stock_id, symbol.upper(), price, created_at)], stats))
+        if not ticks:
+            return None, self.make_error("Invalid price tick")
+
+        self.insert_ticks(ticks)
+        return ticks[0], None
+
+    def insert_ticks(self, ticks):
+        with transaction.atomic():
+            StockTracker.objects.bulk_create(
+                [StockTracker(stock_id=stock_id, price=price, created_at=created_at)
+                 for stock_id, _, price, created_at in ticks],
+                batch_size=len(ticks)
+            )
+
+        self.__after_insert(ticks)
+
+    def __after_insert(self, ticks):
+        price_ranges = {}
+        for stock_id, symbol, price, created_at in ticks:
+            low, high = price_ranges.get(stock_id, (price, price))
+            price_ranges[stock_id] = (min(low, price), max(high, price))
+
+        CandleService(self.request).merge_ticks(
+            (stock_id, price, created_at) for stock_id, _, price, created_at in ticks
+        )
+        latest_quotes = QuoteService(self.request).write_through(
+            (symbol, price, created_at) for _, symbol, price, created_at in ticks
+        )
+        publish_quotes(latest_quotes)
+        AlertService(self.request).evaluate_prices(price_ranges)
+
+    @staticmethod
+    def __load_symbol_map():
+        return {
+            symbol.upper(): stock_id
+            for symbol, stock_id in Stock.available_objects.values_list("symbol", "id").iterator()
+        }
+
+    @staticmethod
+    def __read_csv(file):
+        for row in csv.DictReader(file):
+            yield row.get("symbol"), row.get("price"), row.get("timestamp") or row.get("created_at")
+
+    @staticmethod
+    def __read_jsonl(file):
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+
+            if not isinstance(row, dict):
+                yield None
+                continue
+
+            yield row.get("symbol"), row.get("price"), row.get("timestamp") or row.get("created_at")
+
+    @staticmethod
+    def __resolve(rows, symbol_map, stats):
+        for row in rows:
+            if row is None:
+                stats.reject(RejectionReason.malformed_row)
+                continue
+
+            symbol, price, created_at = row
+            symbol = (symbol or "").strip().upper()
+
+            stock_id = symbol_map.get(symbol)
+            if stock_id is None:
+                stats.reject(RejectionReason.unknown_symbol)
+                continue
+
+            yield stock_id, symbol, price, created_at
+
+    @staticmethod
+    def __validate(ticks, stats):
+        for stock_id, symbol, price, created_at in ticks:
+            try:
+                price = Decimal(str(price).strip()).quantize(PRICE_QUANTUM)
+            except (InvalidOperation, ValueError):
+                stats.reject(RejectionReason.invalid_price)
+                continue
+
+            if not price.is_finite() or price <= 0 or price >= MAX_PRICE:
+                stats.reject(RejectionReason.invalid_price)
+                continue
+
+            created_at = parse_tick_timestamp(created_at)
+            if created_at is None:
+                stats.reject(RejectionReason.invalid_timestamp)
+                continue
+
+            yield stock_id, symbol, price, created_at
+
+    @staticmethod
+    def __batched(ticks, batch_size):
+        ticks = iter(ticks)
+        while True:
+            batch = list(islice(ticks, batch_size))
+            if not batch:
+                return
+            yield batch
+
+
+def parse_tick_timestamp(value):
+    if value is None or value == "":
+        return timezone.now()
+
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, (int, float)) or str(value).replace(".", "", 1).isdigit():
+        try:
+            return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    else:
+        try:
+            parsed = parse_datetime(str(value).strip())
+        except ValueError:
+            return None
+
+    if parsed is None:
+        return None
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+
+    return parsed
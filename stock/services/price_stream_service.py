@@ -0,0 +1,142 @@
+import asyncio
+import json
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from redis import asyncio as redis_asyncio
+
+from services.cache_util import CacheUtil
+from services.log import AppLogger
+from services.util import CustomAPIRequestUtil, DecimalEncoder
+
+PRICE_CHANNEL = "price_ticks"
+CLIENT_QUEUE_SIZE = 100
+RECONNECT_DELAY_SECONDS = 1
+MAX_RECONNECT_DELAY_SECONDS = 30
+STREAM_TICKET_PREFIX = "stream_ticket"
+STREAM_TICKET_TTL_SECONDS = 30
+
+
+def publish_quotes(quotes):
+    """Publishes a list of {"symbol", "price", "priced_at"} quotes to every streaming worker"""
+    if not quotes:
+        return
+
+    try:
+        CacheUtil.publish_message(PRICE_CHANNEL, json.dumps(quotes, cls=DecimalEncoder))
+    except Exception as e:
+        AppLogger.report(e)
+
+
+class StreamTicketService(CustomAPIRequestUtil):
+    """
+    Single use tickets opening one price stream. Browsers' EventSource cannot send headers,
+    so they pass a ticket in the query string rather than their long lived access token.
+    """
+
+    def issue_ticket(self):
+        if not self.auth_user:
+            return None, self.make_error("User is not authenticated")
+
+        ticket = secrets.token_urlsafe(32)
+        cache.set(f"{STREAM_TICKET_PREFIX}:{ticket}", self.auth_user.pk, timeout=STREAM_TICKET_TTL_SECONDS)
+
+        return dict(ticket=ticket, expires_in=STREAM_TICKET_TTL_SECONDS), None
+
+    @staticmethod
+    def redeem_ticket(ticket):
+        """Id of the user the ticket was issued to, None once it expired or was redeemed"""
+        key = f"{STREAM_TICKET_PREFIX}:{ticket}"
+        user_id = cache.get(key)
+
+        # only the request whose delete removed the ticket may use it
+        if user_id is None or not cache.delete(key):
+            return None
+
+        return user_id
+
+
+class PriceStreamClient:
+    """
+    A connected streaming client. Its queue is bounded: when a slow consumer falls behind,
+    the oldest pending update is dropped so memory per client stays constant.
+    """
+
+    def __init__(self, symbols, queue_size=CLIENT_QUEUE_SIZE):
+        self.symbols = set(symbols)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, quote):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(quote)
+
+
+class PriceBroadcaster:
+    """
+    One Redis pub/sub listener per worker process, fanning ticks out in memory
+    to the clients subscribed to each symbol.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._listener = None
+
+    @property
+    def client_count(self):
+        return len({client for clients in self._subscribers.values() for client in clients})
+
+    def subscribe(self, symbols, queue_size=CLIENT_QUEUE_SIZE):
+        client = PriceStreamClient(symbols, queue_size=queue_size)
+        for symbol in client.symbols:
+            self._subscribers.setdefault(symbol, set()).add(client)
+
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self.__listen())
+
+        return client
+
+    def unsubscribe(self, client):
+        for symbol in client.symbols:
+            clients = self._subscribers.get(symbol)
+            if clients is None:
+                continue
+
+            clients.discard(client)
+            if not clients:
+                self._subscribers.pop(symbol, None)
+
+    def dispatch(self, quotes):
+        for quote in quotes:
+            for client in self._subscribers.get(quote.get("symbol"), ()):
+                client.offer(quote)
+
+    async def __listen(self):
+        delay = RECONNECT_DELAY_SECONDS
+        while True:
+            connection = redis_asyncio.from_url(settings.BROKER_URL)
+            pubsub = connection.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(PRICE_CHANNEL)
+                delay = RECONNECT_DELAY_SECONDS
+
+                async for message in pubsub.listen():
+                    try:
+                        self.dispatch(json.loads(message["data"]))
+                    except (TypeError, ValueError) as e:
+                        AppLogger.report(e)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                AppLogger.report(e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
+            finally:
+                await pubsub.aclose()
+                await connection.aclose()
+
+
+price_broadcaster = PriceBroadcaster()
@@ -0,0 +1,129 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Upper
+
+from services.log import AppLogger
+from services.redis_client import get_redis_client
+from services.util import CustomAPIRequestUtil
+from stock.models import Stock, StockTracker
+
+MAX_QUOTE_SYMBOLS = 300
+
+# Sets every field whose stored quote is absent or not newer, so a late tick never replaces a
+# newer price. ARGV holds (symbol, encoded quote, epoch ms) triples; returns the symbols written.
+SET_NEWER_QUOTES_SCRIPT = """
+local written = {}
+for index = 1, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[index])
+    if not current or tonumber(string.match(current, '|(%-?%d+)$')) <= tonumber(ARGV[index + 2]) then
+        redis.call('HSET', KEYS[1], ARGV[index], ARGV[index + 1])
+        written[#written + 1] = ARGV[index]
+    end
+end
+return written
+"""
+
+
+def encode_quote(price, priced_at):
+    return f"{price}|{int(priced_at.timestamp() * 1000)}"
+
+
+def decode_quote(value):
+    if isinstance(value, bytes):
+        value = value.decode()
+
+    price, timestamp = value.split("|", 1)
+    return Decimal(price), datetime.fromtimestamp(int(timestamp) / 1000, tz=dt_timezone.utc)
+
+
+class QuoteService(CustomAPIRequestUtil):
+    """
+    Latest price per symbol, kept in a single Redis hash written through on ingest,
+    so a batch of symbols is answered with one HMGET.
+    """
+
+    @property
+    def latest_price_key(self):
+        # the hash is reached through the raw client, so it is namespaced like the cache's own keys
+        return cache.make_key(self.generate_cache_key("latest_price"))
+
+    def write_through(self, ticks):
+        """
+        Stores the newest of the given (symbol, price, priced_at) ticks for every symbol, unless Redis
+        already holds a newer one, and returns the quotes that were stored
+        """
+        latest = {}
+        for symbol, price, priced_at in ticks:
+            current = latest.get(symbol)
+            if current is None or priced_at >= current[1]:
+                latest[symbol] = (price, priced_at)
+
+        if not latest:
+            return []
+
+        args = []
+        for symbol, (price, priced_at) in latest.items():
+            args.extend((symbol, encode_quote(price, priced_at), int(priced_at.timestamp() * 1000)))
+
+        try:
+            script = get_redis_client().register_script(SET_NEWER_QUOTES_SCRIPT)
+            written = {symbol.decode() for symbol in script(keys=[self.latest_price_key], args=args)}
+        except Exception as e:
+            AppLogger.report(e)
+            written = latest
+
+        return [
+            {"symbol": symbol, "price": price, "priced_at": priced_at}
+            for symbol, (price, priced_at) in latest.items() if symbol in written
+        ]
+
+    def fetch_quotes(self, symbols):
+        symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol and symbol.strip()))
+        if not symbols:
+            return None, self.make_error("At least one symbol is required")
+
+        if len(symbols) > MAX_QUOTE_SYMBOLS:
+            return None, self.make_error(f"A maximum of {MAX_QUOTE_SYMBOLS} symbols can be requested at once")
+
+        quotes = {}
+        try:
+            for symbol, value in zip(symbols, self.get_hash_values(self.latest_price_key, symbols)):
+                if value is not None:
+                    quotes[symbol] = decode_quote(value)
+        except Exception as e:
+            AppLogger.report(e)
+
+        misses = [symbol for symbol in symbols if symbol not in quotes]
+        if misses:
+            found = self.__fetch_latest_prices(misses)
+            quotes.update(found)
+            self.write_through((symbol, price, priced_at) for symbol, (price, priced_at) in found.items())
+
+        data = [
+            {"symbol": symbol, "price": quotes[symbol][0], "priced_at": quotes[symbol][1]}
+            for symbol in symbols if symbol in quotes
+        ]
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+
+        return dict(data=data, missing=missing), None
+
+    def fetch_quotes_from_params(self, filter_params):
+        return self.fetch_quotes((filter_params.get("symbols") or "").split(","))
+
+    @staticmethod
+    def __fetch_latest_prices(symbols):
+        """Latest tick of every symbol in one grouped query"""
+        latest_tick = StockTracker.available_objects.filter(stock=OuterRef("pk")).order_by("-created_at", "-id")
+
+        rows = Stock.available_objects.annotate(upper_symbol=Upper("symbol")).filter(upper_symbol__in=symbols).annotate(
+            latest_price=Subquery(latest_tick.values("price")[:1]),
+            latest_priced_at=Subquery(latest_tick.values("created_at")[:1]),
+        ).values_list("symbol", "latest_price", "latest_priced_at")
+
+        return {
+            symbol.upper(): (price, priced_at)
+            for symbol, price, priced_at in rows if price is not None
+        }
@@ -0,0 +1,170 @@
+import math
+import threading
+from bisect import bisect_left
+
+from services.cache_util import CacheUtil
+from services.log import AppLogger
+from services.util import CustomAPIRequestUtil
+from stock.models import Stock
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 1000
+MIN_TRIGRAM_SCORE = 0.3
+MIN_NAME_QUERY_LENGTH = 3
+
+EXACT_SYMBOL_SCORE = 4.0
+SYMBOL_PREFIX_SCORE = 3.0
+NAME_PREFIX_SCORE = 2.0
+
+SEARCH_INDEX_TAG = "stock_search"
+
+
+def name_trigrams(text):
+    """Trigrams of every word, padded like pg_trgm so word starts weigh more"""
+    trigrams = set()
+    for word in text.lower().split():
+        padded = f"  {word} "
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+class StockSearchResult:
+    __slots__ = ["id", "symbol", "name", "score"]
+
+    def __init__(self, stock_id, symbol, name, score):
+        self.id = stock_id
+        self.symbol = symbol
+        self.name = name
+        self.score = score
+
+
+class StockSearchIndex:
+    """
+    Process local search index over listed stocks: a sorted symbol list answers prefix
+    queries with a binary search and trigram posting lists answer fuzzy name queries.
+    Stocks change in any worker, so every change bumps the SEARCH_INDEX_TAG cache tag
+    (see `stock.signals`) and the index is rebuilt when a search sees a version it was not built at.
+    """
+
+    def __init__(self):
+        self._symbols = []
+        self._stocks = {}
+        self._trigrams = {}
+        self._loaded = False
+        self._version = None
+        self._lock = threading.RLock()
+
+    def invalidate(self):
+        """Called after a stock changed, in any process"""
+        with self._lock:
+            self._loaded = False
+
+        try:
+            CacheUtil.invalidate_tags(SEARCH_INDEX_TAG)
+        except Exception as e:
+            AppLogger.report(e)
+
+    def reset(self):
+        with self._lock:
+            self._symbols, self._stocks, self._trigrams = [], {}, {}
+            self._loaded = False
+            self._version = None
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        query = (query or "").strip()
+        if not query:
+            return []
+
+        version = self.__get_version()
+        with self._lock:
+            if not self._loaded or version != self._version:
+                self.__load(version)
+
+            scores = {}
+            self.__match_symbols(query.upper(), scores)
+            if len(query) >= MIN_NAME_QUERY_LENGTH:
+                self.__match_names(query.lower(), scores)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], self._stocks[item[0]][0]))[:limit]
+            return [
+                StockSearchResult(stock_id, self._stocks[stock_id][0], self._stocks[stock_id][1], score)
+                for stock_id, score in ranked
+            ]
+
+    def __match_symbols(self, prefix, scores):
+        """Scores every symbol starting with `prefix`, the caller ranks and truncates"""
+        index = bisect_left(self._symbols, (prefix,))
+        while index < len(self._symbols):
+            symbol, stock_id = self._symbols[index]
+            if not symbol.startswith(prefix):
+                break
+
+            # shorter symbols are closer to the query
+            score = EXACT_SYMBOL_SCORE if symbol == prefix else SYMBOL_PREFIX_SCORE + len(prefix) / len(symbol) / 2
+            scores[stock_id] = max(scores.get(stock_id, 0), score)
+            index += 1
+
+    def __match_names(self, query, scores):
+        trigrams = name_trigrams(query)
+        if not trigrams:
+            return
+
+        # trigrams of typos are in no name, they lower the score but cannot select candidates
+        postings = sorted((self._trigrams[trigram] for trigram in trigrams if trigram in self._trigrams), key=len)
+        required = math.ceil(MIN_TRIGRAM_SCORE * len(trigrams))
+
+        # a stock sharing `required` of the postings is in at least one of the rarest len - required + 1
+        candidates = set()
+        for posting in postings[:max(len(postings) - required + 1, 1)]:
+            candidates.update(posting)
+
+        for stock_id in candidates:
+            name = self._stocks[stock_id][2]
+            if name.startswith(query):
+                score = NAME_PREFIX_SCORE
+            else:
+                score = sum(1 for posting in postings if stock_id in posting) / len(trigrams)
+                if score < MIN_TRIGRAM_SCORE:
+                    continue
+
+            if score > scores.get(stock_id, 0):
+                scores[stock_id] = score
+
+    def __get_version(self):
+        try:
+            return CacheUtil.get_tag_versions(SEARCH_INDEX_TAG)[0]
+        except Exception as e:
+            # keep serving the loaded index rather than rebuilding it on every search
+            AppLogger.report(e)
+            return self._version
+
+    def __load(self, version):
+        self._symbols, self._stocks, self._trigrams = [], {}, {}
+        for stock_id, symbol, name in Stock.available_objects.values_list("id", "symbol", "name").iterator():
+            symbol = symbol.upper()
+            self._stocks[stock_id] = (symbol, name, name.lower())
+            self._symbols.append((symbol, stock_id))
+            for trigram in name_trigrams(name):
+                self._trigrams.setdefault(trigram, set()).add(stock_id)
+
+        self._symbols.sort()
+        self._version = version
+        self._loaded = True
+
+
+stock_search_index = StockSearchIndex()
+
+
+class StockSearchService(CustomAPIRequestUtil):
+
+    def search(self, filter_params):
+        keyword = filter_params.get("keyword")
+        if not keyword:
+            return None, self.make_error("A search keyword is required")
+
+        try:
+            limit = min(max(int(filter_params.get("limit") or DEFAULT_SEARCH_LIMIT), 1), MAX_SEARCH_LIMIT)
+        except ValueError:
+            limit = DEFAULT_SEARCH_LIMIT
+
+        return stock_search_index.search(keyword, limit=limit), None
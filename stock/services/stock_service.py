@@ -1,106 +1,154 @@
-# from django.db.models import Q, QuerySet
-# from django.template.defaultfilters import default
-# from django.utils import timezone
-#
-# from crm.models import ActivityType
-# from services.util import CustomAPIRequestUtil
-# from stock.models import Stock
-# from stock.serializers.stock_serializer import StockSerializer
-#
-#
-# class StockService(CustomAPIRequestUtil):
-#     serializer_class = StockSerializer
-#
-#     def create_stock(self, payload):
-#         symbol = payload.get("symbol")
-#         name = payload.get("name")
-#
-#         stock, is_created = Stock.available_objects.get_or_create(
-#             symbol__iexact=symbol,
-#             name__iexact=name,
-#             defaults=dict(
-#                 created_at=timezone.now()
-#             )
-#
-#         )
-#
-#         stock.
-#         stock.save()
-#
-#         self.report_activity(ActivityType.create, stock)
-#
-#         return stock, None
-#
-#     def update_stock(self, payload, stock_id=None):
-#         if stock_id:
-#             stock, error = self.fetch_stock_by_id(stock_id)
-#             if error:
-#                 return None, error
-#         else:
-#             return None, self.make_error("Stock ID is required")
-#
-#         stock.name = payload.get("name") or stock.name
-#         stock.exchange = payload.get("exchange") or stock.exchange
-#         stock.updated_by = self.auth_user
-#         stock.updated_at = timezone.now()
-#         stock.save()
-#
-#         self.clear_temp_cache(stock)
-#         self.report_activity(ActivityType.update, stock)
-#
-#         return stock, None
-#
-#     def delete_stock(self, stock_id):
-#         stock, error = self.fetch_stock_by_id(stock_id)
-#         if error:
-#             return None, error
-#
-#         stock.deleted_at = timezone.now()
-#         stock.deleted_by = self.auth_user
-#         stock.save()
-#
-#         self.clear_temp_cache(stock)
-#         self.report_activity(ActivityType.delete, stock)
-#
-#         return stock, None
-#
-#     def hard_delete_stock(self, stock):
-#         stock.delete()
-#
-#         self.clear_temp_cache(stock)
-#         self.report_activity(ActivityType.delete, stock)
-#
-#         return stock, None
-#
-#     def find_stock_by_symbol(self, symbol):
-#         def __fetch():
-#             stock = self.__get_base_query().filter(symbol__iexact=symbol).first()
-#             if not stock:
-#                 return None, self.make_404(f"Stock with symbol '{symbol}' not found")
-#             return stock, None
-#
-#         cache_key = self.generate_cache_key("stock_symbol", symbol.lower())
-#         return self.get_cache_value_or_default(cache_key, __fetch)
-#
-#     def fetch_stock_by_id(self, stock_id=None):
-#         def __fetch():
-#             stock = self.__get_base_query().filter(pk=stock_id).first()
-#             if not stock:
-#                 return None, self.make_404("Stock not found")
-#             return stock, None
-#
-#         cache_key = self.generate_cache_key("stock_id", stock_id)
-#         return self.get_cache_value_or_default(cache_key, __fetch)
-#
-#     def fetch_stock_list(self, filter_params) -> QuerySet:
-#         self.page_size = filter_params.get("page_size", 100)
-#         filter_keyword = filter_params.get("keyword")
-#
-#         q = Q()
-#         if filter_keyword:
-#             q &= (Q(name__icontains=filter_keyword) | Q(symbol__icontains=filter_keyword))
-#
-#         return self.__get_base_query().filter(q).order_by("-created_at")
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from crm.models import ActivityType
+from services.util import CustomAPIRequestUtil
+from stock.models import Stock
+from stock.serializers.stock_serializer import StockSerializer
+from stock.services.search_service import MAX_SEARCH_LIMIT, stock_search_index
+
+
+class StockService(CustomAPIRequestUtil):
+    serializer_class = StockSerializer
+
+    def create_stock(self, payload):
+        symbol = payload.get("symbol")
+        name = payload.get("name")
+
+        stock, is_created = Stock.available_objects.get_or_create(
+            symbol__iexact=symbol,
+            defaults=dict(
+                symbol=symbol.upper(),
+                name=name,
+                created_at=timezone.now(),
+                created_by=self.auth_user,
+            )
+
+        )
+        if not is_created:
+            return None, self.make_error(f"Stock with symbol '{symbol}' already exists")
+
+        self.report_activity(ActivityType.create, stock)
+
+        return stock, None
+
+    def update_stock(self, payload, stock_id=None):
+        if stock_id:
+            stock, error = self.fetch_stock_by_id(stock_id)
+            if error:
+                return None, error
+        else:
+            return None, self.make_error("Stock ID is required")
+
+        self.clear_temp_cache(stock)
+
+        stock.name = payload.get("name") or stock.name
+        stock.symbol = (payload.get("symbol") or stock.symbol).upper()
+        stock.updated_by = self.auth_user
+        stock.updated_at = timezone.now()
+        stock.save()
+
+        self.clear_temp_cache(stock)
+        self.report_activity(ActivityType.update, stock)
+
+        return stock, None
+
+    def delete_stock(self, stock_id):
+        stock, error = self.fetch_stock_by_id(stock_id)
+        if error:
+            return None, error
+
+        stock.deleted_at = timezone.now()
+        stock.deleted_by = self.auth_user
+        stock.save()
+
+        self.clear_temp_cache(stock)
+        self.report_activity(ActivityType.delete, stock)
+
+        return stock, None
+
+    def hard_delete_stock(self, stock):
+        stock.delete()
+
+        self.clear_temp_cache(stock)
+        self.report_activity(ActivityType.delete, stock)
+
+        return stock, None
+
+    def find_stock_by_symbol(self, symbol):
+        def __fetch():
+            stock = self.__get_base_query().filter(symbol__iexact=symbol).first()
+            if not stock:
+                return None, self.make_404(f"Stock with symbol '{symbol}' not found")
+            return stock, None
+
+        cache_key = self.generate_cache_key("stock_symbol", symbol.lower(), tags=[self.model_tag(Stock)])
+        return self.get_cache_value_or_default(cache_key, __fetch)
+
+    def fetch_stock_by_id(self, stock_id=None):
+        def __fetch():
+            stock = self.__get_base_query().filter(pk=stock_id).first()
+            if not stock:
+                return None, self.make_404("Stock not found")
+            return stock, None
+
+        cache_key = self.generate_cache_key("stock_id", stock_id, tags=[self.model_tag(Stock)])
+        return self.get_cache_value_or_default(cache_key, __fetch)
+
+    def fetch_many_by_ids(self, stock_ids):
+        """Stocks of the given ids in request order, unknown ids are skipped"""
+        try:
+            stock_ids = list(dict.fromkeys(int(stock_id) for stock_id in stock_ids))
+        except (TypeError, ValueError):
+            return None, self.make_error("Invalid stock ID provided")
+
+        def __load(ids):
+            return self.__get_base_query().in_bulk(ids)
+
+        cache_keys = self.generate_cache_keys(
+            {stock_id: ("stock_id", stock_id) for stock_id in stock_ids}, [self.model_tag(Stock)]
+        )
+        stocks = self.get_many_or_default(cache_keys, __load)
+
+        return [stocks[stock_id] for stock_id in stock_ids if stock_id in stocks], None
+
+    def find_many_by_symbols(self, symbols):
+        """Stocks of the given symbols in request order, unknown symbols are skipped"""
+        symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol and symbol.strip()))
+
+        def __load(keys):
+            stocks = self.__get_base_query().annotate(upper_symbol=Upper("symbol")).filter(upper_symbol__in=keys)
+            return {stock.symbol.upper(): stock for stock in stocks}
+
+        cache_keys = self.generate_cache_keys(
+            {symbol: ("stock_symbol", symbol.lower()) for symbol in symbols}, [self.model_tag(Stock)]
+        )
+        stocks = self.get_many_or_default(cache_keys, __load)
+
+        return [stocks[symbol] for symbol in symbols if symbol in stocks], None
+
+    def fetch_list(self, filter_params) -> QuerySet:
+        self.page_size = filter_params.get("page_size", 100)
+        filter_keyword = filter_params.get("keyword")
+
+        q = Q()
+        if filter_keyword:
+            matches = stock_search_index.search(filter_keyword, limit=MAX_SEARCH_LIMIT)
+            q &= Q(pk__in=[match.id for match in matches])
+
+        return self.__get_base_query().filter(q).order_by("-created_at")
+
+    @classmethod
+    def __get_base_query(cls):
+        return Stock.available_objects.all()
+
+    def clear_temp_cache(self, stock):
+        self.clear_cache(self.generate_cache_key("stock_id", stock.id, tags=[self.model_tag(Stock)]))
+        self.clear_cache(self.generate_cache_key("stock_symbol", stock.symbol.lower(), tags=[self.model_tag(Stock)]))
+
+
+# Subscription and alert management is pending the Subscription/Alert API.
 #
 #     def create_subscription(self, payload):
 #         user = self.auth_user
@@ -201,12 +249,3 @@
 #
 #         cache_key = self.generate_cache_key("alert_id", alert_id)
 #         return self.get_cache_value_or_default(cache_key, __fetch)
-#
-#     @classmethod
-#     def __get_base_query(cls):
-#         return Stock.objects.all()
-#
-#     def clear_temp_cache(self, stock):
-#         self.clear_cache(self.generate_cache_key("stock_id", stock.id))
-#         self.clear_cache(self.generate_cache_key("stock_symbol", stock.symbol.lower()))
-#
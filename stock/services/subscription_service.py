@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from crm.services.notification_service import NotificationService
+from services.log import AppLogger
+from services.util import CustomAPIRequestUtil
+from stock.models import FREQUENCY_DURATION_SECONDS, Subscription
+from stock.services.quote_service import QuoteService
+
+DISPATCH_BATCH_SIZE = 1000
+DELIVERY_CHUNK_SIZE = 200
+
+
+def frequency_seconds(duration, duration_type):
+    unit = FREQUENCY_DURATION_SECONDS.get(duration_type)
+    if not unit or not duration or duration <= 0:
+        return None
+    return duration * unit
+
+
+class SubscriptionService(CustomAPIRequestUtil):
+    """
+    Subscriptions carry an indexed `next_due_at`, so each scheduler tick only reads the
+    subscriptions that are due and hands them to delivery tasks grouped by stock.
+    """
+
+    def dispatch_due(self, now=None):
+        from stock.tasks import deliver_subscription_updates
+
+        now = now or timezone.now()
+        dispatched = 0
+
+        while True:
+            with transaction.atomic():
+                due = list(
+                    Subscription.available_objects.select_for_update(skip_locked=True).filter(
+                        active=True, next_due_at__lte=now
+                    ).order_by("next_due_at").values_list("id", "stock_id")[:DISPATCH_BATCH_SIZE]
+                )
+                if not due:
+                    break
+
+                self.__reschedule([subscription_id for subscription_id, _ in due], now)
+
+            by_stock = {}
+            for subscription_id, stock_id in due:
+                by_stock.setdefault(stock_id, []).append(subscription_id)
+
+            for stock_id, subscription_ids in by_stock.items():
+                for index in range(0, len(subscription_ids), DELIVERY_CHUNK_SIZE):
+                    deliver_subscription_updates.delay(stock_id, subscription_ids[index:index + DELIVERY_CHUNK_SIZE])
+
+            dispatched += len(due)
+            if len(due) < DISPATCH_BATCH_SIZE:
+                break
+
+        return dispatched
+
+    @staticmethod
+    def schedule_unscheduled(subscription_ids=None, now=None):
+        """
+        Makes active subscriptions with a usable frequency but no `next_due_at` due now.
+        Rows saved before scheduling existed have none; this runs after every migrate.
+        """
+        unscheduled = Subscription.available_objects.all()
+        if subscription_ids is not None:
+            unscheduled = unscheduled.filter(pk__in=subscription_ids)
+
+        unscheduled = unscheduled.filter(
+            active=True,
+            next_due_at__isnull=True,
+            frequency__deleted_at__isnull=True,
+            frequency__duration__gt=0,
+            frequency__duration_type__in=list(FREQUENCY_DURATION_SECONDS),
+        ).values("id")
+
+        return Subscription.objects.filter(pk__in=unscheduled).update(next_due_at=now or timezone.now())
+
+    def deliver_updates(self, stock_id, subscription_ids):
+        subscriptions = list(
+            Subscription.available_objects.filter(pk__in=subscription_ids, active=True, stock_id=stock_id).values_list(
+                "stock__symbol", "user_id", "user__first_name"
+            )
+        )
+        if not subscriptions:
+            return 0
+
+        symbol = subscriptions[0][0]
+        quotes, error = QuoteService(self.request).fetch_quotes([symbol])
+        if error or not quotes["data"]:
+            AppLogger.print("No price available for subscription delivery", symbol, error)
+            return 0
+
+        quote = quotes["data"][0]
+        subject = f"{quote['symbol']} price update"
+
+        NotificationService(self.request).queue_many(
+            (user_id, subject,
+             f"Hi {first_name}, {quote['symbol']} is trading at {quote['price']} as of {quote['priced_at']:%Y-%m-%d %H:%M} UTC.")
+            for _, user_id, first_name in subscriptions
+        )
+
+        return len(subscriptions)
+
+    @staticmethod
+    def __reschedule(subscription_ids, now):
+        """Moves each subscription forward by its shortest frequency, unscheduling those without one"""
+        intervals = {}
+        frequencies = Subscription.frequency.through.objects.filter(
+            subscription_id__in=subscription_ids, frequency__deleted_at__isnull=True
+        ).values_list("subscription_id", "frequency__duration", "frequency__duration_type")
+
+        for subscription_id, duration, duration_type in frequencies:
+            seconds = frequency_seconds(duration, duration_type)
+            if not seconds:
+                AppLogger.warning(
+                    "Subscription %s has an unusable frequency of %s %s", subscription_id, duration, duration_type
+                )
+            elif seconds < intervals.get(subscription_id, seconds + 1):
+                intervals[subscription_id] = seconds
+
+        by_interval = {}
+        for subscription_id in subscription_ids:
+            by_interval.setdefault(intervals.get(subscription_id), []).append(subscription_id)
+
+        for seconds, ids in by_interval.items():
+            Subscription.objects.filter(pk__in=ids).update(
+                next_due_at=now + timedelta(seconds=seconds) if seconds else None
+            )
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from stock.models import Alert, Stock, StockTracker, Subscription, Trigger
+from stock.services.alert_service import trigger_index
+from stock.services.search_service import stock_search_index
+from stock.services.subscription_service import SubscriptionService
+
+
+@receiver(pre_save, sender=Trigger)
+def set_trigger_reference_price(sender, instance, **kwargs):
+    # a new trigger only fires once the price crosses its threshold from where it is now
+    if instance._state.adding and instance.reference_price is None:
+        instance.reference_price = StockTracker.available_objects.filter(
+            stock_id=instance.alert.stock_id
+        ).order_by("-created_at", "-id").values_list("price", flat=True).first()
+
+
+@receiver(post_save, sender=Trigger)
+@receiver(post_delete, sender=Trigger)
+def sync_trigger_index_on_trigger_change(sender, instance, **kwargs):
+    if Trigger.alert.is_cached(instance):
+        stock_id = instance.alert.stock_id
+    else:
+        stock_id = Alert.objects.filter(pk=instance.alert_id).values_list("stock_id", flat=True).first()
+
+    if stock_id is not None:
+        # after commit, so other processes reloading the index see the change
+        transaction.on_commit(lambda: trigger_index.invalidate(stock_id))
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def sync_trigger_index_on_alert_change(sender, instance, **kwargs):
+    transaction.on_commit(lambda: trigger_index.invalidate(instance.stock_id))
+
+
+@receiver(pre_save, sender=Subscription)
+def schedule_subscription(sender, instance, **kwargs):
+    if not instance.active or instance.deleted_at:
+        instance.next_due_at = None
+    elif instance.next_due_at is None:
+        instance.next_due_at = timezone.now()
+
+
+@receiver(m2m_changed, sender=Subscription.frequency.through)
+def schedule_subscription_on_frequency_change(sender, instance, action, **kwargs):
+    # subscriptions are saved before their frequencies are attached, and unscheduled when they had none
+    if action == "post_add" and isinstance(instance, Subscription) and instance.next_due_at is None:
+        SubscriptionService.schedule_unscheduled([instance.pk])
+
+
+@receiver(post_migrate)
+def schedule_existing_subscriptions(sender, **kwargs):
+    if sender.name == "stock":
+        SubscriptionService.schedule_unscheduled()
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def sync_search_index_on_stock_change(sender, instance, **kwargs):
+    transaction.on_commit(stock_search_index.invalidate)
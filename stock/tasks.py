@@ -0,0 +1,13 @@
+from celery import app
+
+from stock.services.subscription_service import SubscriptionService
+
+
+@app.shared_task
+def dispatch_due_subscriptions():
+    SubscriptionService(None).dispatch_due()
+
+
+@app.shared_task
+def deliver_subscription_updates(stock_id, subscription_ids):
+    SubscriptionService(None).deliver_updates(stock_id, subscription_ids)
@@ -1,3 +1,444 @@
-from django.test import TestCase
+import asyncio
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import User
+from services.cache_serializer import ModelCacheSerializer, StaleCachePayloadError
+from services.cache_util import CacheUtil
+from services.redis_client import get_redis_client
+from stock.controllers.stream_controller import authenticate_stream_request
+from stock.models import (
+    Alert, CandleResolution, Frequency, FrequencyDurationType, PriceCandle, Stock, StockTracker, Subscription, Trigger,
+    TriggerDirection,
+)
+from stock.services.alert_service import AlertService, trigger_index, trigger_index_tag
+from stock.services.candle_service import CandleService
+from stock.services.price_history_service import PriceHistoryStore
+from stock.services.price_ingest_service import PriceIngestService, RejectionReason
+from stock.services.price_stream_service import PriceBroadcaster, publish_quotes
+from stock.services.quote_service import QuoteService
+from stock.services.search_service import SEARCH_INDEX_TAG, stock_search_index
+from stock.services.stock_service import StockService
+from stock.services.subscription_service import SubscriptionService
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class PriceHistoryStoreTests(TestCase):
+
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol="ACME", name="Acme")
+        self.store = PriceHistoryStore(sync_interval=0)
+
+    def test_series_catches_up_with_rows_inserted_elsewhere(self):
+        StockTracker.objects.create(stock=self.stock, price=Decimal("1.5"))
+        self.assertEqual(len(self.store.history("acme")), 1)
+
+        StockTracker.objects.create(stock=self.stock, price=Decimal("2.5"))
+        self.assertEqual(list(self.store.history("acme").prices), [1.5, 2.5])
+
+    def test_late_row_reloads_the_series(self):
+        later = StockTracker.objects.create(stock=self.stock, price=Decimal("2"))
+        self.store.history("acme")
+
+        StockTracker.objects.create(stock=self.stock, price=Decimal("1"), created_at=later.created_at.replace(year=2000))
+        self.assertEqual(list(self.store.history("acme").prices), [1.0, 2.0])
+
+    def test_row_committed_after_a_newer_id_is_caught_up(self):
+        at = datetime(2024, 1, 1, 10, tzinfo=dt_timezone.utc)
+        StockTracker.objects.create(id=20, stock=self.stock, price=Decimal("1"), created_at=at)
+        self.store.history("acme")
+
+        # inserted before row 20 but committed after it was read
+        StockTracker.objects.create(id=10, stock=self.stock, price=Decimal("2"), created_at=at + timedelta(seconds=1))
+        self.assertEqual(list(self.store.history("acme").prices), [1.0, 2.0])
+
+    def test_least_recently_read_series_is_evicted(self):
+        Stock.objects.create(symbol="OTHER", name="Other")
+        store = PriceHistoryStore(sync_interval=0, max_series=1)
+
+        store.get_series("acme")
+        store.get_series("other")
+
+        self.assertEqual(list(store._series), ["OTHER"])
+
+    def test_history_endpoint(self):
+        StockTracker.objects.create(stock=self.stock, price=Decimal("1.5"))
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("history@example.com", "password"))
+
+        response = client.get("/api/v1/stocks/acme/history", {"step": 60})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["symbol"], "ACME")
+        self.assertEqual([price for _, price in response.json()["data"]["points"]], [1.5])
+        self.assertEqual(client.get("/api/v1/stocks/none/history").status_code, 404)
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class AlertServiceTests(TestCase):
+
+    def setUp(self):
+        trigger_index.discard()
+        user = User.objects.create_user("alerts@example.com", "password")
+        self.stock = Stock.objects.create(symbol="ACME", name="Acme")
+        self.alert = Alert.objects.create(user=user, stock=self.stock)
+
+    def test_trigger_of_soft_deleted_alert_does_not_fire(self):
+        trigger = Trigger.objects.create(alert=self.alert, threshold_price=10)
+        trigger_index.evaluate(self.stock.pk, 1)
+
+        # deleted without signals, the index still holds the trigger
+        Alert.objects.filter(pk=self.alert.pk).update(deleted_at=timezone.now())
+
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 11), [])
+        trigger.refresh_from_db()
+        self.assertFalse(trigger.triggered)
+
+    def test_trigger_created_by_another_process_fires(self):
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 1), [])
+
+        # what a web worker does: insert, then bump the stock's tag
+        trigger = Trigger.objects.bulk_create([Trigger(alert=self.alert, threshold_price=10)])[0]
+        CacheUtil.invalidate_tags(trigger_index_tag(self.stock.pk))
+
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 11), [trigger.pk])
+
+    def test_trigger_set_past_its_level_waits_for_a_crossing(self):
+        StockTracker.objects.create(stock=self.stock, price=12)
+        trigger = Trigger.objects.create(alert=self.alert, threshold_price=10)
+        self.assertEqual(trigger.reference_price, 12)
+
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 11), [])
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 9, 12), [])
+        trigger.refresh_from_db()
+        self.assertEqual(trigger.reference_price, 9)
+
+        # armed state is persisted, a reloaded index still fires on the next crossing
+        trigger_index.discard()
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 10), [trigger.pk])
+
+    def test_below_trigger_fires_on_a_downward_crossing(self):
+        StockTracker.objects.create(stock=self.stock, price=8)
+        trigger = Trigger.objects.create(alert=self.alert, threshold_price=10, direction=TriggerDirection.below)
+
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 9), [])
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 11), [])
+        self.assertEqual(AlertService(None).evaluate_price(self.stock.pk, 10), [trigger.pk])
+
+    def test_saving_a_trigger_does_not_query_its_alert_again(self):
+        with self.assertNumQueries(2):
+            # the reference price and the insert
+            Trigger.objects.create(alert=self.alert, threshold_price=10)
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class CandleServiceTests(TestCase):
+
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol="ACME", name="Acme")
+        self.at = datetime(2024, 1, 1, 10, 0, 30, tzinfo=dt_timezone.utc)
+
+    def test_bucket_created_concurrently_is_merged(self):
+        CandleService(None).merge_ticks([(self.stock.pk, Decimal("5"), self.at)])
+
+        select_for_update = PriceCandle.objects.select_for_update
+        reads = [PriceCandle.objects.none()]
+
+        def read(*args, **kwargs):
+            # the first read misses the buckets, as if another ingest inserted them right after it
+            return reads.pop() if reads else select_for_update(*args, **kwargs)
+
+        with mock.patch.object(PriceCandle.objects, "select_for_update", side_effect=read):
+            CandleService(None).merge_ticks([(self.stock.pk, Decimal("7"), self.at.replace(second=40))])
+
+        self.assertEqual(reads, [])
+
+        candle = PriceCandle.objects.get(stock=self.stock, resolution=CandleResolution.minute)
+        self.assertEqual((candle.open, candle.high, candle.close, candle.count), (5, 7, 7, 2))
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class QuoteServiceTests(TestCase):
+
+    def test_quotes_fall_back_to_the_latest_tick_without_redis(self):
+        stock = Stock.objects.create(symbol="Acme", name="Acme")
+        StockTracker.objects.create(stock=stock, price=Decimal("1"), created_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        StockTracker.objects.create(stock=stock, price=Decimal("2"), created_at=datetime(2024, 1, 2, tzinfo=dt_timezone.utc))
+
+        quotes, error = QuoteService(None).fetch_quotes(["acme", "none"])
+
+        self.assertIsNone(error)
+        self.assertEqual([quote["price"] for quote in quotes["data"]], [Decimal("2")])
+        self.assertEqual(quotes["missing"], ["NONE"])
+
+    @override_settings(CACHES={"default": dict(LOCAL_CACHES["default"], KEY_PREFIX="spt", VERSION=2)})
+    def test_latest_price_key_is_namespaced(self):
+        self.assertTrue(QuoteService(None).latest_price_key.startswith("spt:2:"))
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class SubscriptionServiceTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user("subscriber@example.com", "password")
+        stock = Stock.objects.create(symbol="ACME", name="Acme")
+        self.subscription = Subscription.objects.create(user=user, stock=stock, active=True)
+
+    def test_existing_subscription_is_backfilled_and_dispatched(self):
+        self.subscription.frequency.add(Frequency.objects.create(duration=1, duration_type=FrequencyDurationType.hours))
+        # saved before scheduling existed
+        Subscription.objects.filter(pk=self.subscription.pk).update(next_due_at=None)
+
+        self.assertEqual(SubscriptionService.schedule_unscheduled(), 1)
+        with mock.patch("stock.tasks.deliver_subscription_updates.delay") as delay:
+            self.assertEqual(SubscriptionService(None).dispatch_due(), 1)
+
+        delay.assert_called_once_with(self.subscription.stock_id, [self.subscription.pk])
+        self.subscription.refresh_from_db()
+        self.assertGreater(self.subscription.next_due_at, timezone.now())
+
+    def test_unknown_duration_type_is_logged(self):
+        self.subscription.frequency.add(Frequency.objects.create(duration=1, duration_type="fortnights"))
+
+        with mock.patch("stock.tasks.deliver_subscription_updates.delay"), \
+                mock.patch("stock.services.subscription_service.AppLogger.warning") as warning:
+            SubscriptionService(None).dispatch_due()
+
+        warning.assert_called_once()
+        self.subscription.refresh_from_db()
+        self.assertIsNone(self.subscription.next_due_at)
+
+
+class PriceStreamTests(SimpleTestCase):
+
+    async def test_ticks_reach_only_subscribed_clients(self):
+        broadcaster = PriceBroadcaster()
+        acme, other = broadcaster.subscribe(["ACME"]), broadcaster.subscribe(["OTHER"])
+        try:
+            broadcaster.dispatch([{"symbol": "ACME", "price": "1.5"}])
+
+            self.assertEqual(acme.queue.get_nowait(), {"symbol": "ACME", "price": "1.5"})
+            self.assertTrue(other.queue.empty())
+        finally:
+            broadcaster._listener.cancel()
+
+    async def test_published_tick_reaches_subscriber(self):
+        try:
+            get_redis_client().ping()
+        except Exception:
+            self.skipTest("Redis is not reachable")
+
+        broadcaster = PriceBroadcaster()
+        client = broadcaster.subscribe(["ACME"])
+        try:
+            # published until the listener has subscribed to the channel
+            for _ in range(50):
+                publish_quotes([{"symbol": "ACME", "price": "1.5"}])
+                try:
+                    quote = await asyncio.wait_for(client.queue.get(), timeout=0.1)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+            else:
+                self.fail("No tick received")
+
+            self.assertEqual(quote["price"], "1.5")
+        finally:
+            broadcaster._listener.cancel()
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class StreamTicketTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("stream@example.com", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ticket_opens_a_single_stream(self):
+        ticket = self.client.post("/api/v1/stocks/stream/ticket").json()["data"]["ticket"]
+        request = RequestFactory().get("/api/v1/stocks/stream", {"symbols": "ACME", "ticket": ticket})
+
+        self.assertEqual(authenticate_stream_request(request), self.user)
+        self.assertIsNone(authenticate_stream_request(request))
+
+    def test_access_token_is_not_accepted_in_the_query_string(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        request = RequestFactory().get("/api/v1/stocks/stream", {"symbols": "ACME", "token": token})
+
+        self.assertIsNone(authenticate_stream_request(request))
+        self.assertEqual(APIClient().post("/api/v1/stocks/stream/ticket").status_code, 401)
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class StockSearchIndexTests(TestCase):
+
+    def setUp(self):
+        stock_search_index.reset()
+
+    def test_symbols_are_ranked_before_the_limit_applies(self):
+        for symbol in ["AAAA", "AAB", "AZ"]:
+            Stock.objects.create(symbol=symbol, name=f"{symbol} Holdings")
+
+        results = stock_search_index.search("A", limit=2)
+        self.assertEqual([result.symbol for result in results], ["AZ", "AAB"])
+
+    def test_stock_created_by_another_process_is_found(self):
+        self.assertEqual(stock_search_index.search("ACME"), [])
+
+        # what another worker does: insert, then bump the tag
+        Stock.objects.bulk_create([Stock(symbol="ACME", name="Acme")])
+        CacheUtil.invalidate_tags(SEARCH_INDEX_TAG)
+
+        self.assertEqual([result.symbol for result in stock_search_index.search("ACME")], ["ACME"])
+
+    def test_misspelled_names_are_found(self):
+        Stock.objects.create(symbol="AAPL", name="Apple Inc")
+        Stock.objects.create(symbol="MSFT", name="Microsoft Corporation")
+        Stock.objects.create(symbol="AMZN", name="Amazon.com Inc")
+
+        self.assertEqual([result.symbol for result in stock_search_index.search("appel")], ["AAPL"])
+        self.assertEqual([result.symbol for result in stock_search_index.search("microsft")], ["MSFT"])
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class StockServiceTests(TestCase):
+
+    def test_batch_reads_the_tag_versions_once(self):
+        stocks = [Stock.objects.create(symbol=symbol, name=symbol) for symbol in ["AAA", "BBB", "CCC"]]
+
+        with mock.patch.object(CacheUtil, "get_tag_versions", wraps=CacheUtil.get_tag_versions) as versions:
+            found, error = StockService(None).fetch_many_by_ids([stock.pk for stock in reversed(stocks)])
+
+        self.assertIsNone(error)
+        self.assertEqual(found, list(reversed(stocks)))
+        versions.assert_called_once()
+
+    def test_batch_keys_match_single_keys(self):
+        stock = Stock.objects.create(symbol="ACME", name="Acme")
+        StockService(None).fetch_stock_by_id(stock.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(StockService(None).fetch_many_by_ids([stock.pk]), ([stock], None))
+
+    def test_symbols_match_whatever_their_stored_case(self):
+        stock = Stock.objects.create(symbol="Acme", name="Acme")
+
+        self.assertEqual(StockService(None).find_many_by_symbols(["acme", "none"]), ([stock], None))
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class ModelCacheSerializerTests(TestCase):
+
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol="ACME", name="Acme")
+
+    def test_instances_round_trip(self):
+        serializer = ModelCacheSerializer(compress_threshold=0)
+
+        self.assertEqual(serializer.loads(serializer.dumps(self.stock)).name, "Acme")
+        self.assertEqual(serializer.loads(serializer.dumps([self.stock, self.stock])), [self.stock, self.stock])
+
+    def test_payload_of_another_schema_is_a_miss(self):
+        serializer = ModelCacheSerializer()
+        data = serializer.dumps(self.stock)
+        CacheUtil.set_cache_value("stock:acme", self.stock, timeout=60)
+
+        # what a deploy that migrates the model's columns looks like to an old payload
+        with mock.patch.dict("services.cache_serializer._fingerprints", {Stock: b"\x00" * 8}):
+            with self.assertRaises(StaleCachePayloadError):
+                serializer.loads(data)
+
+            value, _ = CacheUtil.get_cache_value_or_default("stock:acme", lambda: ("fresh", None))
+
+        self.assertEqual(value, "fresh")
+
+
+@override_settings(CACHES=LOCAL_CACHES, CACHE_L1_ENABLED=False)
+class PriceIngestServiceTests(TestCase):
+
+    def setUp(self):
+        self.acme = Stock.objects.create(symbol="ACME", name="Acme")
+        Stock.objects.create(symbol="GONE", name="Gone", deleted_at=timezone.now())
+
+    def write_file(self, suffix, content):
+        file = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, encoding="utf-8")
+        with file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_rows_are_resolved_validated_and_counted(self):
+        rows = [
+            (" acme ", "1.2346", "2024-01-01T10:00:00Z"),
+            ("ACME", "2", 1704103200),
+            ("ACME", "3", None),
+            ("GONE", "1", None),
+            ("NONE", "1", None),
+            ("ACME", "abc", None),
+            ("ACME", "-1", None),
+            ("ACME", "1", "yesterday"),
+            None,
+        ]
+
+        stats = PriceIngestService(None).ingest_rows(rows, batch_size=2)
+
+        self.assertEqual((stats.accepted, stats.rejected, stats.batches), (3, 6, 2))
+        self.assertEqual(stats.rejections, {
+            RejectionReason.unknown_symbol: 2,
+            RejectionReason.invalid_price: 2,
+            RejectionReason.invalid_timestamp: 1,
+            RejectionReason.malformed_row: 1,
+        })
+        prices = StockTracker.objects.filter(stock=self.acme).order_by("id").values_list("price", flat=True)
+        self.assertEqual(list(prices), [Decimal("1.235"), Decimal("2"), Decimal("3")])
+
+    def test_every_full_batch_is_flushed_before_the_next_is_read(self):
+        inserted = []
+
+        def rows():
+            for index in range(5):
+                # batches of 2 are written as soon as they are complete
+                inserted.append(StockTracker.objects.count())
+                yield "ACME", str(index + 1), None
+
+        stats = PriceIngestService(None).ingest_rows(rows(), batch_size=2)
+
+        self.assertEqual(stats.batches, 3)
+        self.assertEqual(inserted, [0, 0, 2, 2, 4])
+        self.assertEqual(StockTracker.objects.count(), 5)
+
+    def test_command_ingests_csv(self):
+        path = self.write_file(".csv", "symbol,price,timestamp\nACME,1.5,2024-01-01T10:00:00Z\nNONE,1,\n")
+        out = io.StringIO()
+
+        call_command("ingest_prices", path, stdout=out)
+
+        self.assertIn("Ingested 1 rows, rejected 1", out.getvalue())
+        self.assertIn("unknown_symbol: 1", out.getvalue())
+
+    def test_malformed_jsonl_lines_are_rejected(self):
+        path = self.write_file(".jsonl", '{"symbol": "ACME", "price": 1.5}\nnot json\n[1, 2]\n\n')
+
+        stats, error = PriceIngestService(None).ingest_file(path)
+
+        self.assertIsNone(error)
+        self.assertEqual((stats.accepted, stats.rejections), (1, {RejectionReason.malformed_row: 2}))
+
+    def test_unsupported_file_is_an_error(self):
+        stats, error = PriceIngestService(None).ingest_file(self.write_file(".xml", ""))
+
+        self.assertIsNone(stats)
+        self.assertIsNotNone(error)